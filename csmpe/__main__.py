@@ -39,6 +39,8 @@ import textwrap
 import urlparse
 
 from csmpe.context import InstallContext
+from csmpe.storage import open_storage
+from csmpe.broker import DEFAULT_SOCKET
 from csmpe.csm_pm import CSMPluginManager
 from csmpe.csm_pm import install_phases
 
@@ -143,11 +145,37 @@ def plugin_list(platform, phase, os, detail, brief):
               help="Package for install operations. This package option can be repeated to provide multiple packages.")
 @click.option("--repository_url", default=None,
               help="The package repository URL. (i.e. tftp://server/dir")
+@click.option("--sessions", default=0, type=click.IntRange(0, 8),
+              help="Number of additional device sessions used to run the read-only plugins concurrently. "
+                   "If 0 (default) all plugins run sequentially.")
+@click.option("--cache_ttl", default=0, type=click.IntRange(0, None),
+              help="Cache the show command outputs for the number of seconds. "
+                   "Any other command clears the cache. If 0 (default) the cache is disabled.")
+@click.option("--artifact_dir", default=None, type=click.Path(file_okay=False),
+              help="Save the captured command outputs compressed and deduplicated in the artifact store directory "
+                   "instead of the log directory.")
+@click.option("--storage", default=None, type=click.Path(dir_okay=False),
+              help="The SQLite file storing the device data between the runs, i.e. the Pre-Upgrade data "
+                   "compared in the Post-Upgrade phase. If not specified the data is kept only in memory.")
+@click.option("--cached_discovery", is_flag=True,
+              help="Skip the device discovery if the prompt and show version output did not change "
+                   "since the last discovery.")
+@click.option("--log_max_bytes", default=0, type=click.IntRange(0, None),
+              help="Rotate the session and plugin logs when they exceed the size and collapse the repeated "
+                   "command outputs in the session log. If 0 (default) the size is not limited.")
+@click.option("--log_compress", is_flag=True, help="Compress the rotated log files.")
+@click.option("--broker", is_flag=True,
+              help="Run the plugins in the session broker reusing the device session of the previous run. "
+                   "See the broker command.")
+@click.option("--broker_socket", default=DEFAULT_SOCKET, type=click.Path(dir_okay=False),
+              help="The session broker socket.")
 @click.argument("plugin_name", required=False, default=None)
-def plugin_run(url, phase, cmd, log_dir, package, repository_url, plugin_name):
+def plugin_run(url, phase, cmd, log_dir, package, repository_url, sessions, cache_ttl, artifact_dir, storage,
+               cached_discovery, log_max_bytes, log_compress, broker, broker_socket, plugin_name):
 
-    ctx = InstallContext()
-    ctx.hostname = "Hostname"
+    ctx = InstallContext(open_storage(storage))
+    # the device data is stored in the target device namespace
+    ctx.hostname = urlparse.urlparse(url[-1]).hostname or "Hostname"
     ctx.host_urls = list(url)
     ctx.success = False
 
@@ -156,6 +184,7 @@ def plugin_run(url, phase, cmd, log_dir, package, repository_url, plugin_name):
     session_filename = os.path.join(log_dir, "session.log")
     plugins_filename = os.path.join(log_dir, "plugins.log")
     condoor_filename = os.path.join(log_dir, "condoor.log")
+    trace_filename = os.path.join(log_dir, "trace.json")
 
     if os.path.exists(session_filename):
         os.remove(session_filename)
@@ -163,25 +192,267 @@ def plugin_run(url, phase, cmd, log_dir, package, repository_url, plugin_name):
         os.remove(plugins_filename)
     if os.path.exists(condoor_filename):
         os.remove(condoor_filename)
+    if os.path.exists(trace_filename):
+        os.remove(trace_filename)
 
     ctx.log_level = logging.DEBUG
     ctx.software_packages = list(package)
     ctx.server_repository_url = repository_url
+    ctx.artifact_directory = artifact_dir
+    ctx.discovery_cache = cached_discovery
+    ctx.log_max_bytes = log_max_bytes
+    ctx.log_compress = log_compress
 
     if cmd:
         ctx.custom_commands = list(cmd)
 
-    pm = CSMPluginManager(ctx)
-    pm.set_name_filter(plugin_name)
-    results = pm.dispatch("run")
+    if broker:
+        ctx.storage.close()
+        results = run_in_broker(broker_socket, {
+            'command': "run",
+            'host': {
+                'hostname': ctx.hostname,
+                'urls': ctx.host_urls,
+                'packages': ctx.software_packages,
+                'repository_url': repository_url,
+                'custom_commands': ctx.custom_commands,
+            },
+            'phase': phase,
+            'plugin_name': plugin_name,
+            'log_dir': os.path.abspath(log_dir),
+            'sessions': sessions,
+            'cache_ttl': cache_ttl,
+            'artifact_dir': os.path.abspath(artifact_dir) if artifact_dir else None,
+            'storage': os.path.abspath(storage) if storage else None,
+            'cached_discovery': cached_discovery,
+            'log_max_bytes': log_max_bytes,
+            'log_compress': log_compress,
+        })
+    else:
+        pm = CSMPluginManager(ctx)
+        pm.set_name_filter(plugin_name)
+        pm.set_max_sessions(sessions)
+        pm.set_command_cache(cache_ttl)
+        try:
+            results = pm.dispatch("run")
+        finally:
+            ctx.storage.close()
 
     click.echo("\n Plugin execution finished.\n")
     click.echo("Log files dir: {}".format(log_dir))
     click.echo(" {} - device session log".format(session_filename))
     click.echo(" {} - plugin execution log".format(plugins_filename))
     click.echo(" {} - device connection debug log".format(condoor_filename))
+    click.echo(" {} - timing trace (chrome://tracing or ui.perfetto.dev)".format(trace_filename))
     click.echo("Results: {}".format(" ".join(map(str, results))))
 
 
+def run_in_broker(socket_path, message):
+    from csmpe.broker import request, BrokerError
+
+    try:
+        result = request(message, socket_path)
+    except BrokerError as e:
+        raise click.ClickException(str(e))
+    click.echo("Device session {} by the broker".format("reused" if result['session_reused'] else "created"))
+    if result['error']:
+        click.echo("Error: {}".format(result['error']))
+    return result['results']
+
+
+@cli.command("fleet", help="Run the phase or specific plugin on all the hosts from the inventory file.",
+             short_help="Run plugins on many hosts")
+@click.option("--inventory", required=True, type=click.Path(exists=True, dir_okay=False),
+              help="The YAML or JSON host inventory file.")
+@click.option("--phase", required=False, type=click.Choice(install_phases),
+              help="An install phase to run the plugins for.")
+@click.option("--log_dir", default="/tmp", type=click.Path(),
+              help="The directory for the host log directories and the results file. "
+                   "If not path specified then default /tmp directory is used.")
+@click.option("--concurrency", default=4, type=click.IntRange(1, 256),
+              help="Maximum number of hosts processed concurrently.")
+@click.option("--sessions", default=0, type=click.IntRange(0, 8),
+              help="Number of additional device sessions per host used to run the read-only plugins concurrently.")
+@click.option("--cache_ttl", default=0, type=click.IntRange(0, None),
+              help="Cache the show command outputs for the number of seconds. If 0 (default) the cache is disabled.")
+@click.option("--artifact_dir", default=None, type=click.Path(file_okay=False),
+              help="Save the captured command outputs compressed and deduplicated in the artifact store directory "
+                   "shared by all the hosts instead of the host log directories.")
+@click.option("--storage", default=None, type=click.Path(dir_okay=False),
+              help="The SQLite file storing the host data between the runs, i.e. the Pre-Upgrade data "
+                   "compared in the Post-Upgrade phase.")
+@click.option("--cached_discovery", is_flag=True,
+              help="Skip the device discovery if the prompt and show version output did not change "
+                   "since the last discovery.")
+@click.option("--log_max_bytes", default=0, type=click.IntRange(0, None),
+              help="Rotate the session and plugin logs when they exceed the size and collapse the repeated "
+                   "command outputs in the session log. If 0 (default) the size is not limited.")
+@click.option("--log_compress", is_flag=True, help="Compress the rotated log files.")
+@click.option("--results", default=None, type=click.Path(dir_okay=False),
+              help="The JSON results file. If not specified then fleet_results.json in the log directory is used.")
+@click.argument("plugin_name", required=False, default=None)
+def plugin_fleet(inventory, phase, log_dir, concurrency, sessions, cache_ttl, artifact_dir, storage, cached_discovery,
+                 log_max_bytes, log_compress, results, plugin_name):
+    from csmpe.fleet import load_inventory, run_fleet, InventoryError
+
+    try:
+        hosts = load_inventory(inventory)
+    except InventoryError as e:
+        raise click.BadParameter(str(e), param_hint="--inventory")
+
+    def progress(result):
+        status = "OK" if result['success'] else "FAILED"
+        click.echo("{}: {} ({:.1f}s) {}".format(result['hostname'], status, result['duration'],
+                                                result['error'] or ""))
+
+    fleet_results = run_fleet(hosts, phase, log_dir, plugin_name=plugin_name, concurrency=concurrency,
+                              sessions=sessions, cache_ttl=cache_ttl, artifact_dir=artifact_dir, storage=storage,
+                              cached_discovery=cached_discovery, log_max_bytes=log_max_bytes,
+                              log_compress=log_compress, results_file=results, callback=progress)
+
+    summary = fleet_results['summary']
+    click.echo("\n Fleet execution finished.\n")
+    click.echo("Hosts: {} succeeded, {} failed, {} total".format(
+        summary['succeeded'], summary['failed'], summary['total']))
+    click.echo("Log files dir: {}".format(log_dir))
+    click.echo("Results file: {}".format(fleet_results['results_file']))
+
+
+@cli.command("rollout", help="Run the sequence of phases on the hosts from the inventory file in widening waves. "
+                             "The canary wave runs first and the rollout stops when the failure rate "
+                             "exceeds the threshold.",
+             short_help="Rolling-wave upgrade")
+@click.option("--inventory", required=True, type=click.Path(exists=True, dir_okay=False),
+              help="The YAML or JSON host inventory file.")
+@click.option("--phase", required=True, multiple=True, type=click.Choice(install_phases),
+              help="An install phase. This option can be repeated to define the phase sequence.")
+@click.option("--log_dir", default="/tmp", type=click.Path(),
+              help="The directory for the host log directories and the results file. "
+                   "If not path specified then default /tmp directory is used.")
+@click.option("--canary", default=1, type=click.IntRange(1, None),
+              help="Number of hosts in the canary wave.")
+@click.option("--growth", default=2.0, type=click.FloatRange(1.0, None),
+              help="The wave size multiplier.")
+@click.option("--max_wave", default=None, type=click.IntRange(1, None),
+              help="Maximum number of hosts in the wave.")
+@click.option("--concurrency", default=8, type=click.IntRange(1, 256),
+              help="Maximum number of hosts processed concurrently.")
+@click.option("--group_key", default="site",
+              help="The inventory host key used to group the hosts. Default is site.")
+@click.option("--group_concurrency", default=0, type=click.IntRange(0, None),
+              help="Maximum number of hosts from the same group processed concurrently. 0 means no limit.")
+@click.option("--failure_threshold", default=0.1, type=click.FloatRange(0.0, 1.0),
+              help="The failure rate (0.0 - 1.0) which stops the rollout.")
+@click.option("--storage", default=None, type=click.Path(dir_okay=False),
+              help="The SQLite file storing the host data between the phases and runs.")
+@click.option("--cached_discovery", is_flag=True,
+              help="Skip the device discovery if the prompt and show version output did not change "
+                   "since the last discovery.")
+@click.option("--log_max_bytes", default=0, type=click.IntRange(0, None),
+              help="Rotate the session and plugin logs when they exceed the size and collapse the repeated "
+                   "command outputs in the session log. If 0 (default) the size is not limited.")
+@click.option("--log_compress", is_flag=True, help="Compress the rotated log files.")
+@click.option("--results", default=None, type=click.Path(dir_okay=False),
+              help="The JSON results file. If not specified then rollout_results.json in the log directory is used.")
+@click.argument("plugin_name", required=False, default=None)
+def plugin_rollout(inventory, phase, log_dir, canary, growth, max_wave, concurrency, group_key, group_concurrency,
+                   failure_threshold, storage, cached_discovery, log_max_bytes, log_compress, results, plugin_name):
+    from csmpe.fleet import load_inventory, InventoryError
+    from csmpe.rollout import run_rollout
+
+    try:
+        hosts = load_inventory(inventory)
+    except InventoryError as e:
+        raise click.BadParameter(str(e), param_hint="--inventory")
+
+    def progress(result):
+        status = "OK" if result['success'] else "FAILED"
+        click.echo("[wave {}] {}: {} ({:.1f}s) {}".format(result['wave'], result['hostname'], status,
+                                                          result['duration'], result['error'] or ""))
+
+    rollout_results = run_rollout(hosts, phase, log_dir, canary=canary, growth=growth, max_wave=max_wave,
+                                  concurrency=concurrency, group_key=group_key, group_limit=group_concurrency,
+                                  failure_threshold=failure_threshold, plugin_name=plugin_name,
+                                  storage=storage, cached_discovery=cached_discovery, log_max_bytes=log_max_bytes,
+                                  log_compress=log_compress, results_file=results, callback=progress)
+
+    summary = rollout_results['summary']
+    click.echo("\n Rollout finished.\n")
+    if rollout_results['stopped']:
+        click.echo("Rollout stopped: {}".format(rollout_results['stop_reason']))
+    click.echo("Hosts: {} succeeded, {} failed, {} skipped, {} total".format(
+        summary['succeeded'], summary['failed'], summary['skipped'], summary['total']))
+    click.echo("Log files dir: {}".format(log_dir))
+    click.echo("Results file: {}".format(rollout_results['results_file']))
+
+
+@cli.command("artifacts", help="List the artifact store entries or print the stored content.",
+             short_help="Artifact store")
+@click.argument("artifact_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--host", default=None, help="List the entries of the host only.")
+@click.option("--show", "digest", default=None, help="Print the content stored under the hash.")
+def plugin_artifacts(artifact_dir, host, digest):
+    from csmpe.artifacts import ArtifactStore
+
+    store = ArtifactStore(artifact_dir)
+    if digest:
+        matches = set(entry['digest'] for entry in store.entries() if entry['digest'].startswith(digest))
+        if len(matches) != 1:
+            raise click.BadParameter("No unique content for hash: {}".format(digest), param_hint="--show")
+        click.echo(store.get(matches.pop()), nl=False)
+        return
+
+    for entry in store.entries():
+        if host is None or entry['host'] == host:
+            click.echo("{} {} [{}] {} ({} bytes)".format(entry['digest'][:12], entry['host'], entry['phase'],
+                                                         entry['name'], entry['size']))
+    stats = store.stats()
+    click.echo("\n{} entries, {} blobs, {} bytes stored as {} bytes".format(
+        stats['entries'], stats['blobs'], stats['size'], stats['stored_size']))
+
+
+@cli.command("broker", help="Start the session broker keeping the device sessions between the runs. "
+                            "The run command with the --broker option uses the broker.",
+             short_help="Device session broker")
+@click.option("--socket", "socket_path", default=DEFAULT_SOCKET, type=click.Path(dir_okay=False),
+              help="The Unix socket the broker listens on.")
+@click.option("--log_dir", default="/tmp", type=click.Path(),
+              help="The directory for the logs of the idle sessions.")
+@click.option("--idle_timeout", default=900, type=click.IntRange(1, None),
+              help="Disconnect the session unused for the number of seconds.")
+@click.option("--health_interval", default=60, type=click.IntRange(1, None),
+              help="The number of seconds between the health checks of the idle sessions.")
+@click.option("--status", is_flag=True, help="Display the status of the running broker.")
+@click.option("--stop", is_flag=True, help="Stop the running broker.")
+def plugin_broker(socket_path, log_dir, idle_timeout, health_interval, status, stop):
+    from csmpe.broker import SessionBroker, BrokerError, request
+
+    try:
+        if status:
+            response = request({'command': "status"}, socket_path)
+            click.echo("Broker pid {} running for {:.0f}s".format(response['pid'], response['uptime']))
+            for session in response['sessions']:
+                click.echo("{} {}: {} job(s), idle {:.0f}s".format(session['key'][:12], session['hostname'],
+                                                                   session['jobs'], session['idle']))
+            return
+        if stop:
+            request({'command': "shutdown"}, socket_path)
+            click.echo("Broker stopped")
+            return
+        server = SessionBroker(socket_path, log_dir=log_dir, idle_timeout=idle_timeout,
+                               health_interval=health_interval)
+    except BrokerError as e:
+        raise click.ClickException(str(e))
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)-15s %(levelname)8s: %(message)s')
+    click.echo("Session broker listening on {}".format(socket_path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
 if __name__ == '__main__':
     cli()
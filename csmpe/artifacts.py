@@ -0,0 +1,206 @@
+# =============================================================================
+# Artifact store
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+INDEX_FILENAME = "index.jsonl"
+
+_EXTENSIONS = {
+    'zlib': ".zz",
+    'lzma': ".xz",
+}
+
+
+class ArtifactStore(object):
+    """Compressed, content-addressed store of the captured command outputs.
+
+    Each distinct content is stored once in the blobs directory under its SHA-256 hash, so
+    identical outputs captured in different phases or on different hosts share the same blob.
+    The append-only index maps the (host, phase, name) to the blob hash.
+    """
+    def __init__(self, root, compression="zlib"):
+        """
+        :param root: The store directory. It may be shared by many hosts and processes.
+        :param compression: The compression used for the new blobs: *zlib* or *lzma*.
+        """
+        if compression not in _EXTENSIONS:
+            raise ValueError("Unsupported compression: {}".format(compression))
+        if compression == "lzma" and lzma is None:
+            raise ValueError("The lzma compression is not available")
+        self.root = root
+        self.compression = compression
+        self._lock = threading.Lock()
+        if not os.path.exists(os.path.join(root, "blobs")):
+            try:
+                os.makedirs(os.path.join(root, "blobs"))
+            except OSError:
+                # created by the other process
+                pass
+
+    def _compressor(self):
+        if self.compression == "lzma":
+            return lzma.LZMACompressor()
+        return zlib.compressobj(9)
+
+    def _blob_path(self, digest, compression=None):
+        extension = _EXTENSIONS[compression or self.compression]
+        return os.path.join(self.root, "blobs", digest[:2], digest[2:] + extension)
+
+    def open(self, host, phase, name):
+        """Return the file-like object storing the written content on close."""
+        return ArtifactWriter(self, host, phase, name)
+
+    def put(self, data, host, phase, name):
+        """Store the data. Returns the content hash."""
+        writer = self.open(host, phase, name)
+        writer.write(data)
+        writer.close()
+        return writer.digest
+
+    def get(self, digest):
+        """Return the content stored under the hash or None if not found."""
+        for compression in _EXTENSIONS:
+            path = self._blob_path(digest, compression)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                if compression == "lzma":
+                    return lzma.decompress(data)
+                return zlib.decompress(data)
+        return None
+
+    def _commit(self, tmp_filename, digest, size, host, phase, name):
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_filename)
+        else:
+            directory = os.path.dirname(path)
+            if not os.path.exists(directory):
+                try:
+                    os.makedirs(directory)
+                except OSError:
+                    pass
+            os.rename(tmp_filename, path)
+
+        entry = {
+            'host': host,
+            'phase': phase,
+            'name': name,
+            'digest': digest,
+            'size': size,
+            'time': time.time(),
+        }
+        # the single short line appended at once is not interleaved with the other processes
+        with self._lock:
+            with open(os.path.join(self.root, INDEX_FILENAME), "a") as f:
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+    def entries(self):
+        """Return the list of the index entries in the order they were added."""
+        entries = []
+        try:
+            with open(os.path.join(self.root, INDEX_FILENAME), "r") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # the partially written line
+                        continue
+        except IOError:
+            pass
+        return entries
+
+    def lookup(self, host, name, phase=None):
+        """Return the hash of the latest content stored for the host, name and phase.
+        If phase is None the latest content from any phase is returned."""
+        for entry in reversed(self.entries()):
+            if entry['host'] == host and entry['name'] == name and (phase is None or entry['phase'] == phase):
+                return entry['digest']
+        return None
+
+    def stats(self):
+        """Return the dictionary with the number of entries and blobs, the logical size of
+        all the entries and the stored size of the compressed blobs."""
+        entries = self.entries()
+        blobs = stored = 0
+        for directory, _, filenames in os.walk(os.path.join(self.root, "blobs")):
+            for filename in filenames:
+                if not filename.startswith("."):
+                    blobs += 1
+                    stored += os.path.getsize(os.path.join(directory, filename))
+        return {
+            'entries': len(entries),
+            'blobs': blobs,
+            'size': sum(entry['size'] for entry in entries),
+            'stored_size': stored,
+        }
+
+
+class ArtifactWriter(object):
+    """Compresses and hashes the content as it is written. The blob and index entry are stored on close."""
+    def __init__(self, store, host, phase, name):
+        self.store = store
+        self.host = host
+        self.phase = phase
+        self.name = name
+        self.size = 0
+        self.digest = None
+        fd, self._tmp_filename = tempfile.mkstemp(dir=os.path.join(store.root, "blobs"), prefix=".blob")
+        self._file = os.fdopen(fd, "wb")
+        self._compressor = store._compressor()
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        if isinstance(data, unicode):
+            data = data.encode("utf-8")
+        self._hash.update(data)
+        self._file.write(self._compressor.compress(data))
+        self.size += len(data)
+
+    def close(self):
+        if self.digest is not None:
+            return
+        self._file.write(self._compressor.flush())
+        self._file.close()
+        self.digest = self._hash.hexdigest()
+        self.store._commit(self._tmp_filename, self.digest, self.size, self.host, self.phase, self.name)
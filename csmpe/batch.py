@@ -0,0 +1,202 @@
+# =============================================================================
+# Batch
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import re
+import time
+
+CHUNK_SIZE = 65536
+
+# The time in seconds the device is given to echo the type-ahead command after the prompt
+_TYPEAHEAD_GRACE = 2
+
+# The commands which do not change the device state and can be sent without waiting for the prompt
+_READ_ONLY_PATTERN = re.compile(r"^\s*(admin\s+)?show\s+\S", re.IGNORECASE)
+
+
+def read_only(cmd):
+    """Return True if the command can be sent in the batch."""
+    return bool(_READ_ONLY_PATTERN.match(cmd)) and "\n" not in cmd
+
+
+def _is_prompt(prompt_re, line):
+    return bool(prompt_re.search("\n" + line.rstrip()))
+
+
+def _is_prompt_echo(prompt_re, line, cmd):
+    """Return True if the line is the prompt followed by the echo of the command."""
+    line = line.rstrip()
+    cmd = cmd.strip()
+    return line.endswith(cmd) and _is_prompt(prompt_re, line[:len(line) - len(cmd)])
+
+
+class BatchParser(object):
+    """Splits the combined output of the commands written at once into the per command outputs.
+
+    The device prints the prompt followed by the echo of the next type-ahead command after each output,
+    so the output of the command ends with the line matching the prompt and the next command.
+    The output of the last command ends with the prompt.
+
+    :param cmds: The list of commands in the order they were sent.
+    :param prompt_re: The compiled device prompt regular expression.
+    """
+    def __init__(self, cmds, prompt_re):
+        self.cmds = cmds
+        self.prompt_re = prompt_re
+        self.outputs = []
+        self._lines = None
+        self._pending = ""
+
+    @property
+    def done(self):
+        return len(self.outputs) == len(self.cmds)
+
+    @property
+    def index(self):
+        """The index of the command the output is collected for."""
+        return len(self.outputs)
+
+    @property
+    def last(self):
+        """The incomplete last line received."""
+        return self._pending
+
+    def feed(self, data):
+        """Parse the data chunk. Returns True if the output of every command was received."""
+        lines = (self._pending + data.replace("\r", "")).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            if self.done:
+                break
+            self._line(line)
+        if not self.done and self._lines is not None and self.index == len(self.cmds) - 1 and \
+                _is_prompt(self.prompt_re, self._pending):
+            self._close()
+        return self.done
+
+    def prompt_pending(self):
+        """Return True if the device printed the prompt without the echo of the next command,
+        i.e. the type-ahead command was not received yet or was discarded by the device."""
+        return not self.done and self._lines is not None and _is_prompt(self.prompt_re, self._pending)
+
+    def discard(self, match):
+        """Drop the More prompt matched in the incomplete last line."""
+        self._pending = self._pending[:match.start()].rstrip()
+
+    def finish(self):
+        """Close the output of the command the prompt was received for."""
+        if self.prompt_pending():
+            self._close()
+
+    def _line(self, line):
+        cmd = self.cmds[self.index]
+        if self._lines is None:
+            # waiting for the echo of the command
+            if line.rstrip().endswith(cmd.strip()):
+                self._lines = []
+            return
+        if self.index + 1 < len(self.cmds):
+            next_cmd = self.cmds[self.index + 1]
+            if _is_prompt_echo(self.prompt_re, line, next_cmd):
+                self._close()
+                self._lines = []
+                return
+            if _is_prompt(self.prompt_re, line):
+                # the echo of the next command comes in the separate line
+                self._close()
+                return
+        self._lines.append(line)
+
+    def _close(self):
+        # the same format as returned by condoor send: the output starts after the command echo
+        self.outputs.append("\n" + "\n".join(self._lines) + "\n" if self._lines else "\n")
+        self._lines = None
+
+
+def send_batch(connection, cmds, timeout=300):
+    """Write the commands at once without waiting for the prompt and return the list of outputs.
+
+    The condoor connection internals are used to read the combined output, which is split
+    by the prompt detection. Returns None if the connection does not support batching or the current
+    prompt is not recognised and nothing was sent. If the device discards the type-ahead commands
+    the outputs of the commands received so far are returned and the remaining commands must be sent again.
+    """
+    import pexpect
+    from condoor import ConnectionError, CommandSyntaxError, CommandTimeoutError
+
+    try:
+        device = connection._chain.target_device
+        driver = device.driver
+        session = device.ctrl._session
+        prompt_re = device.prompt_re
+    except AttributeError:
+        return None
+    if not device.connected or prompt_re is None or not hasattr(session, "buffer"):
+        return None
+    # The outputs are split by the device prompt, so the batch is not sent if the last prompt
+    # received does not match, i.e. in the admin mode of the eXR devices (sysadmin-vm:0_RP0#).
+    last_prompt = getattr(session, "after", None)
+    if not isinstance(last_prompt, basestring) or not _is_prompt(prompt_re, last_prompt):
+        return None
+
+    parser = BatchParser(cmds, prompt_re)
+    session.send("".join(cmd + "\n" for cmd in cmds))
+
+    pending = session.buffer
+    session.buffer = session.string_type()
+    deadline = time.time() + timeout
+    while not parser.feed(pending):
+        pending = ""
+        match = driver.more_re.search(parser.last)
+        if match:
+            session.send(" ")
+            parser.discard(match)
+            continue
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise CommandTimeoutError("Timeout waiting for prompt", device.hostname,
+                                      command=cmds[parser.index])
+        wait = min(remaining, 10)
+        if parser.prompt_pending():
+            wait = min(remaining, _TYPEAHEAD_GRACE)
+        try:
+            pending = session.read_nonblocking(CHUNK_SIZE, timeout=wait)
+        except pexpect.TIMEOUT:
+            if parser.prompt_pending():
+                # the device did not keep the type-ahead commands
+                parser.finish()
+                break
+            continue
+        except pexpect.EOF:
+            raise ConnectionError("Unexpected device disconnect", device.hostname)
+
+    for cmd, output in zip(cmds, parser.outputs):
+        if driver.syntax_error_re.search(output):
+            raise CommandSyntaxError("Command unknown", device.hostname, command=cmd)
+    return parser.outputs
@@ -0,0 +1,300 @@
+# =============================================================================
+# Session broker
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+"""The local daemon keeping the authenticated device sessions between the csmpe invocations.
+
+The broker listens on the Unix socket accessible only by the owner. The client sends the phase
+request and the broker runs the plugins in the broker process using the device session
+connected by the previous phase, so the multi-phase job logs in through the jumphosts once.
+The idle sessions are checked periodically and disconnected after the idle timeout.
+
+The protocol is a single JSON request line answered by a single JSON response line.
+"""
+
+import json
+import logging
+import os
+import socket
+import SocketServer
+import threading
+import time
+
+from discovery import chain_key
+from manifest import default_cache_dir
+
+#: The default broker socket path.
+DEFAULT_SOCKET = os.path.join(default_cache_dir(), "broker.sock")
+
+logger = logging.getLogger("csmpe.broker")
+
+
+class BrokerError(Exception):
+    pass
+
+
+def _new_connection(hostname, urls, log_dir):
+    import condoor
+    return condoor.Connection(hostname, urls, log_dir=log_dir)
+
+
+def _redirect_logging(connection, log_dir):
+    """Point the condoor session and debug logs of the connection to the log directory."""
+    connection._log_dir = log_dir
+    if not _connected(connection):
+        # the logs are opened when connecting
+        return
+    try:
+        connection.finalize()
+        connection._enable_logging(None, None)
+        connection.resume_session_logging()
+    except Exception as e:
+        logger.info("Unable to redirect the session logs: %s", e)
+
+
+def _connected(connection):
+    try:
+        return connection.is_connected
+    except Exception:
+        return False
+
+
+def run_phase(request, connection):
+    """Run the phase from the request using the lent connection. Returns the phase result dictionary."""
+    from fleet import _run_phase
+    return _run_phase(request['host'], request.get('phase'), request['log_dir'], request, connection)
+
+
+class _Session(object):
+    def __init__(self, key, connection):
+        self.key = key
+        self.connection = connection
+        self.lock = threading.Lock()
+        self.created = self.last_used = time.time()
+        self.jobs = 0
+
+
+class _RequestHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            response = self.server.handle_request_message(request)
+        except Exception as e:
+            logger.exception("Request failed")
+            response = {'error': "{}: {}".format(e.__class__.__name__, e)}
+        self.wfile.write(json.dumps(response) + "\n")
+
+
+class SessionBroker(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    """The server lending the device sessions to the phase requests.
+
+    :param socket_path: The Unix socket path.
+    :param log_dir: The directory for the condoor logs of the idle sessions.
+    :param idle_timeout: The number of seconds after which the unused session is disconnected.
+    :param health_interval: The number of seconds between the health checks of the idle sessions.
+    :param connection_factory: The function creating the connection from the hostname, urls and log directory.
+    :param runner: The function running the phase request with the lent connection.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, log_dir="/tmp", idle_timeout=900, health_interval=60,
+                 connection_factory=_new_connection, runner=run_phase):
+        directory = os.path.dirname(socket_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        if os.path.exists(socket_path):
+            if ping(socket_path):
+                raise BrokerError("The session broker is already running: {}".format(socket_path))
+            os.remove(socket_path)
+
+        # the socket is accessible only by the owner as the sessions are authenticated
+        umask = os.umask(0o077)
+        try:
+            SocketServer.UnixStreamServer.__init__(self, socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+
+        self.socket_path = socket_path
+        self.log_dir = log_dir
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.connection_factory = connection_factory
+        self.runner = runner
+        self.started = time.time()
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._monitor = threading.Thread(target=self._monitor_sessions, name="broker-monitor")
+        self._monitor.daemon = True
+
+    def serve_forever(self, poll_interval=0.5):
+        self._monitor.start()
+        try:
+            SocketServer.UnixStreamServer.serve_forever(self, poll_interval)
+        finally:
+            self._stopped.set()
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        self._stopped.set()
+        with self._lock:
+            sessions = self._sessions.values()
+            self._sessions = {}
+        for session in sessions:
+            self._disconnect(session)
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+    def handle_request_message(self, request):
+        command = request.get('command')
+        if command == "run":
+            return self.run(request)
+        elif command == "status":
+            return self.status()
+        elif command == "shutdown":
+            threading.Thread(target=self.shutdown).start()
+            return {'stopping': True}
+        raise BrokerError("Unknown command: {}".format(command))
+
+    def _session(self, host):
+        key = chain_key(host['urls'])
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                connection = self.connection_factory(host['hostname'], host['urls'], self.log_dir)
+                session = self._sessions[key] = _Session(key, connection)
+            return session
+
+    def run(self, request):
+        """Run the phase request with the device session. The session is created if needed."""
+        session = self._session(request['host'])
+        with session.lock:
+            reused = _connected(session.connection)
+            _redirect_logging(session.connection, request['log_dir'])
+            result = self.runner(request, session.connection)
+            session.jobs += 1
+            session.last_used = time.time()
+            if _connected(session.connection):
+                _redirect_logging(session.connection, self.log_dir)
+            else:
+                self._drop(session)
+        result['session_reused'] = reused
+        return result
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            sessions = [{
+                'key': session.key,
+                'hostname': session.connection.hostname if _connected(session.connection) else None,
+                'jobs': session.jobs,
+                'age': now - session.created,
+                'idle': now - session.last_used,
+            } for session in self._sessions.values()]
+        return {'pid': os.getpid(), 'uptime': now - self.started, 'sessions': sessions}
+
+    def _drop(self, session):
+        with self._lock:
+            if self._sessions.get(session.key) is session:
+                del self._sessions[session.key]
+        self._disconnect(session)
+
+    @staticmethod
+    def _disconnect(session):
+        try:
+            session.connection.disconnect()
+            session.connection.finalize()
+        except Exception:
+            pass
+
+    def check_sessions(self):
+        """Disconnect the sessions idle for longer than the idle timeout and the broken sessions.
+
+        The healthy idle sessions receive the empty command which also keeps the device exec timeout from
+        closing the session.
+        """
+        with self._lock:
+            sessions = self._sessions.values()
+        for session in sessions:
+            # the session is in use
+            if not session.lock.acquire(False):
+                continue
+            try:
+                if time.time() - session.last_used > self.idle_timeout:
+                    logger.info("Session %s idle timeout", session.key)
+                    self._drop(session)
+                elif _connected(session.connection):
+                    try:
+                        session.connection.send("", timeout=30)
+                    except Exception as e:
+                        logger.info("Session %s health check failed: %s", session.key, e)
+                        self._drop(session)
+            finally:
+                session.lock.release()
+
+    def _monitor_sessions(self):
+        while not self._stopped.wait(self.health_interval):
+            try:
+                self.check_sessions()
+            except Exception:
+                logger.exception("Session health check failed")
+
+
+def request(message, socket_path=DEFAULT_SOCKET, timeout=None):
+    """Send the request message to the broker and return the response dictionary."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        try:
+            client.connect(socket_path)
+        except socket.error as e:
+            raise BrokerError("Unable to connect to the session broker {}: {}".format(socket_path, e))
+        f = client.makefile("rwb")
+        f.write(json.dumps(message) + "\n")
+        f.flush()
+        line = f.readline()
+        f.close()
+    finally:
+        client.close()
+    if not line:
+        raise BrokerError("No response from the session broker")
+    response = json.loads(line)
+    if 'error' in response and 'success' not in response:
+        raise BrokerError(response['error'])
+    return response
+
+
+def ping(socket_path=DEFAULT_SOCKET):
+    """Return True if the broker is listening on the socket."""
+    try:
+        request({'command': "status"}, socket_path, timeout=5)
+    except (BrokerError, socket.error, ValueError):
+        return False
+    return True
@@ -0,0 +1,152 @@
+# =============================================================================
+# Streaming command output capture
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import re
+import time
+from collections import deque
+
+CHUNK_SIZE = 65536
+
+# The number of the first output lines checked for the command syntax error
+_HEAD_LINES = 5
+
+
+class Capture(object):
+    """Writes the command output to the file line by line keeping only the last lines in memory.
+
+    :param output: The full path of the output file or the file-like object closed with the capture.
+    :param line_filter: The optional callable taking the line and returning True if the line is written
+        or the regular expression string the written lines must match.
+    :param tail: The number of the last written lines kept in memory.
+    """
+    def __init__(self, output, line_filter=None, tail=100):
+        if isinstance(line_filter, basestring):
+            line_filter = re.compile(line_filter).search
+        self.line_filter = line_filter
+        self.lines = 0
+        self.size = 0
+        self.head = []
+        self._tail = deque(maxlen=tail)
+        self._partial = ""
+        if isinstance(output, basestring):
+            self.filename = output
+            self._file = open(output, "w")
+        else:
+            self.filename = None
+            self._file = output
+
+    @property
+    def tail(self):
+        """The string with the last lines of the output."""
+        return "".join(self._tail)
+
+    def write(self, data):
+        """Write the output chunk. The chunk does not have to end with the new line."""
+        data = self._partial + data.replace("\r", "")
+        lines = data.split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._write_line(line + "\n")
+
+    def _write_line(self, line):
+        if len(self.head) < _HEAD_LINES:
+            self.head.append(line)
+        if self.line_filter is not None and not self.line_filter(line):
+            return
+        self._file.write(line)
+        self._tail.append(line)
+        self.lines += 1
+        self.size += len(line)
+
+    def close(self):
+        if self._partial:
+            self._write_line(self._partial)
+            self._partial = ""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def stream_command(connection, cmd, capture, timeout=300):
+    """Send the command and write the output to the capture as it arrives.
+
+    The condoor connection internals are used to read the output chunk by chunk instead of
+    waiting for the whole output. Returns False if the connection does not support streaming
+    and nothing was sent.
+    """
+    import pexpect
+    from condoor import ConnectionError, CommandSyntaxError, CommandTimeoutError
+
+    try:
+        device = connection._chain.target_device
+        driver = device.driver
+        session = device.ctrl._session
+        prompt_re = device.prompt_re
+    except AttributeError:
+        return False
+    if not device.connected or prompt_re is None or not hasattr(session, "buffer"):
+        return False
+
+    device.ctrl.send_command(cmd)
+    # the output already read by the command echo detection
+    pending = session.buffer
+    session.buffer = session.string_type()
+
+    deadline = time.time() + timeout
+    while True:
+        lines = pending.split("\n")
+        pending = lines.pop()
+        if lines:
+            capture.write("\n".join(lines) + "\n")
+
+        last = pending.replace("\r", "")
+        if prompt_re.search("\n" + last):
+            break
+        if driver.more_re.search(last):
+            session.send(" ")
+            pending = ""
+            continue
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise CommandTimeoutError("Timeout waiting for prompt", device.hostname)
+        try:
+            pending += session.read_nonblocking(CHUNK_SIZE, timeout=min(remaining, 10))
+        except pexpect.TIMEOUT:
+            continue
+        except pexpect.EOF:
+            raise ConnectionError("Unexpected device disconnect", device.hostname)
+
+    if driver.syntax_error_re.search("".join(capture.head)):
+        raise CommandSyntaxError("Command unknown", device.hostname, command=cmd)
+    return True
@@ -0,0 +1,101 @@
+# =============================================================================
+# Command output cache
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import re
+import threading
+import time
+
+# The commands which do not change the device state
+_CACHEABLE_PATTERN = re.compile(r"^\s*(admin\s+)?show\s+", re.IGNORECASE)
+
+
+class CommandCache(object):
+    """Read-through cache of the show command outputs.
+
+    The cache is shared by all the sessions to the same device. Any other command, i.e. install,
+    upgrade, reload, configuration or CLI mode change, clears the cache as it may change the device state
+    or the output of the next show command.
+    """
+    def __init__(self, ttl=300):
+        """
+        :param ttl: The number of seconds the command output is valid.
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._outputs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cacheable(cmd):
+        """Return True if the command output can be cached."""
+        return bool(_CACHEABLE_PATTERN.match(cmd))
+
+    @staticmethod
+    def _key(cmd):
+        return " ".join(cmd.split())
+
+    def get(self, cmd):
+        """Return the cached command output or None if not cached or expired."""
+        key = self._key(cmd)
+        with self._lock:
+            entry = self._outputs.get(key)
+            if entry is not None and time.time() - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[0]
+            self._outputs.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, cmd, output):
+        with self._lock:
+            self._outputs[self._key(cmd)] = (output, time.time())
+
+    def invalidate(self):
+        """Remove all cached outputs."""
+        with self._lock:
+            if self._outputs:
+                self.invalidations += 1
+                self._outputs.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    @property
+    def stats(self):
+        """The dictionary of the cache counters."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hit_rate,
+        }
@@ -30,33 +30,73 @@
 import logging
 import os
 import re
-from time import time
-
-import condoor
-from decorators import delegate
+from time import time, sleep
+from Queue import Queue
+
+from artifacts import ArtifactStore
+from batch import read_only, send_batch
+from capture import Capture, CHUNK_SIZE, stream_command
+from command_cache import CommandCache
+from decorators import delegate, clear_delegate_cache
+from discovery import DiscoveryCache, FINGERPRINT_COMMAND, version_hash
+from history import DurationHistory
+from queue_logging import QueueHandler, QueueListener, BatchedCall
+from session_log import RotatingFileHandler, SessionLog
+from storage import MemoryStorage, WriteBehindStorage
+from timing import Tracer, TRACE_FILENAME
 
 
 class PluginError(Exception):
     pass
 
 
+class _LogBuffer(logging.Handler):
+    """Log handler keeping the records in memory until they are taken."""
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def take(self):
+        records, self.records = self.records, []
+        return records
+
+
 class InstallContext(object):
-    _storage = {}
+    """The standalone CSM context used by the command line interface.
 
-    def __init__(self):
+    :param storage: The storage backend for the host data shared by the install phases,
+        i.e. :class:`csmpe.storage.SQLiteStorage` to keep the data between the runs.
+        The values are stored in the hostname namespace. Default is the in-memory storage.
+    """
+    def __init__(self, storage=None):
         self.hostname = "Hostname"
         self._custom_commands = []
+        self.storage = MemoryStorage() if storage is None else storage
+        self.discovery_cache = False
+        self.device_connection = None
+        self.log_max_bytes = 0
+        self.log_backups = 5
+        self.log_compress = False
+        # the job data is valid only for the current job
+        self._job_storage = MemoryStorage()
 
     def post_status(self, message):
         print("[CSM Status] {}".format(message))
 
     def save_data(self, key, value):
-        #  print("Saving [{}]={}".format(key, str(value[0])))
-        self._storage[key] = value
+        self.storage.set(self.hostname, key, value)
 
     def load_data(self, key):
-        #  print("Loading [{}]".format(key))
-        return self._storage.get(key, (None, None))
+        return self.storage.get(self.hostname, key)
+
+    def save_job_data(self, key, value):
+        self._job_storage.set(self.hostname, key, value)
+
+    def load_job_data(self, key):
+        return self._job_storage.get(self.hostname, key)
 
     @property
     def custom_commands(self):
@@ -76,28 +116,91 @@ class Host(object):
 @delegate("_csm", ("post_status",), ("custom_commands", "success", "get_operation_id", "set_operation_id",
                                      "server_repository_url", "software_packages", "hostname", "log_directory",
                                      "migration_directory", "get_server", "get_host"))
-@delegate("_connection", ("connect", "disconnect", "reconnect", "discovery", "send", "run_fsm", "reload",
-                          "pause_session_logging", "resume_session_logging"),
-          ("family", "prompt", "os_type", "os_version", "is_console"))
+@delegate("_connection", ("disconnect", "pause_session_logging", "resume_session_logging"),
+          ("family", "prompt", "os_type", "os_version", "is_console"),
+          cached_names=("family", "os_type", "os_version", "is_console"))
 class PluginContext(object):
     """ This is a class passed to the constructor during plugin instantiation.
     Thi class provides the API for the plugins to allow the communication with the CMS Server and device.
     """
-    def __init__(self, csm=None):
+    #: The maximum number of the log records waiting for the log file writer.
+    LOG_QUEUE_SIZE = 10000
+
+    def __init__(self, csm=None, session=None, parent=None):
+        """
+        :param csm: The CSM context object.
+        :param session: The name of the additional device session. If provided the context connects
+            to the device using the information discovered by the main session, logs the device session
+            to the session subdirectory of the log directory and buffers the plugin log records.
+            See :meth:`open_session`.
+        :param parent: The main session context. The additional session shares its timing trace,
+            command cache, CSM job info queue, storage and artifact store.
+        """
         self._csm = csm
         self._log_handler = None
+        self._log_listener = None
+        self._session = session
         self.current_plugin = ""
+        # the connection lent by the session broker is not disconnected in finalize()
+        self._borrowed = False
+        self._session_log = None
+        # set when the device discards the commands sent without waiting for the prompt
+        self._batch_disabled = False
+        if parent is not None:
+            self._tracer = parent._tracer
+            self._command_cache = parent._command_cache
+            self._job_info = parent._job_info
+            self._storage = parent._storage
+            self._artifacts = parent._artifacts
+            self._history = parent._history
+            self._produced = parent._produced
+        else:
+            self._tracer = Tracer(process_name=self._csm.hostname if csm is not None else "csmpe")
+            self._command_cache = None
+            self._job_info = None
+            self._storage = None
+            self._artifacts = None
+            self._history = DurationHistory()
+            # the job data keys saved by the plugins in this run
+            self._produced = set()
+            if csm is not None:
+                if hasattr(csm, "save_job_info"):
+                    self._job_info = BatchedCall(self._push_job_info)
+                self._storage = WriteBehindStorage(csm)
+                if getattr(csm, "artifact_directory", None):
+                    self._artifacts = ArtifactStore(csm.artifact_directory)
         if csm is not None:
-            self._connection = condoor.Connection(
-                self._csm.hostname,
-                self._csm.host_urls,
-                log_dir=self._csm.log_directory
-            )
-            self._set_logging(hostname=self._csm.hostname, log_dir=self._csm.log_directory, log_level=logging.DEBUG)
+            # condoor is imported only when connecting to the device so the plugin listing does not load it
+            import condoor
+            log_dir = self._csm.log_directory
+            if session is not None:
+                log_dir = os.path.join(log_dir, session)
+                if not os.path.exists(log_dir):
+                    os.makedirs(log_dir)
+            if session is None and getattr(self._csm, "device_connection", None) is not None:
+                self._connection = self._csm.device_connection
+                self._borrowed = True
+            else:
+                self._connection = condoor.Connection(
+                    self._csm.hostname,
+                    self._csm.host_urls,
+                    log_dir=log_dir
+                )
+                if self._log_max_bytes:
+                    self._session_log = SessionLog(os.path.join(log_dir, "session.log"), self._log_max_bytes,
+                                                   self._log_backups, self._log_compress)
+            if session is None:
+                self._set_logging(hostname=self._csm.hostname, log_dir=self._csm.log_directory,
+                                  log_level=logging.DEBUG)
+            else:
+                self._set_session_logging(hostname=self._csm.hostname, log_level=logging.DEBUG)
             self._connection.msg_callback = self._post_and_log
             self._connection.error_msg_callback = self._error_callback
 
-            self._device_detect()
+            if session is None:
+                self._device_detect()
+            else:
+                self._session_connect()
         else:
             self._connection = None
             self._set_logging()
@@ -108,6 +211,7 @@ class PluginContext(object):
         return
 
     def _error_callback(self, message):
+        self._full_session_log()
         self.save_job_info('ERROR:' + self._format_log(message))
         """Log ERROR message"""
         self._logger.error(self._format_log(message))
@@ -122,19 +226,76 @@ class PluginContext(object):
                 except IOError:
                     log_dir = "./"
             log_filename = os.path.join(log_dir, 'plugins.log')
-            handler = logging.FileHandler(log_filename)
+            if self._log_max_bytes:
+                file_handler = RotatingFileHandler(log_filename, self._log_max_bytes, self._log_backups,
+                                                   self._log_compress)
+            else:
+                file_handler = logging.FileHandler(log_filename)
+            file_handler.setFormatter(formatter)
+            # the log file is written by the background thread so the plugins do not wait for the disk
+            queue = Queue(self.LOG_QUEUE_SIZE)
+            handler = QueueHandler(queue)
+            self._log_listener = QueueListener(queue, file_handler)
+            self._log_listener.start()
 
         else:
             handler = logging.StreamHandler()
+            handler.setFormatter(formatter)
+
+        self._log_handler = handler
+        self._logger.addHandler(handler)
+        self._logger.setLevel(log_level)
+
+    @property
+    def _log_max_bytes(self):
+        """The size limit of the log files. See :class:`csmpe.session_log.SessionLog`."""
+        return getattr(self._csm, "log_max_bytes", 0)
 
-        handler.setFormatter(formatter)
+    @property
+    def _log_backups(self):
+        return getattr(self._csm, "log_backups", 5)
+
+    @property
+    def _log_compress(self):
+        return getattr(self._csm, "log_compress", False)
+
+    def _set_session_logging(self, hostname="host", log_level=logging.NOTSET):
+        self._logger = logging.getLogger("{}.plugin_manager.{}".format(hostname, self._session))
+        # the records are passed to the main session logger by the plugin manager
+        self._logger.propagate = False
+        handler = _LogBuffer()
         self._log_handler = handler
         self._logger.addHandler(handler)
         self._logger.setLevel(log_level)
 
+    def take_log_records(self):
+        """Return and clear the log records buffered by the additional session."""
+        if isinstance(self._log_handler, _LogBuffer):
+            return self._log_handler.take()
+        return []
+
+    def log_records(self, records):
+        """Log the records taken from the additional session."""
+        for record in records:
+            self._logger.handle(record)
+
+    def open_session(self, name):
+        """Open the additional session to the device. The session shares the CSM context and
+        the device information discovered by this context.
+
+        :param name: The session name used for the logger and the session log subdirectory.
+        :return: The :class:`PluginContext` object of the new session.
+        """
+        return PluginContext(self._csm, session=name, parent=self)
+
     def _reset_logging(self):
         self._logger.removeHandler(self._log_handler)
         self._log_handler.close()
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            for handler in self._log_listener.handlers:
+                handler.close()
+            self._log_listener = None
 
     def __del__(self):
         self.finalize()
@@ -142,17 +303,223 @@ class PluginContext(object):
     def finalize(self):
         """Clean up the the context."""
         if self._connection:
-            self._connection.disconnect()
+            if not self._borrowed:
+                self._connection.disconnect()
             self._connection.finalize()
+        if self._session_log is not None:
+            if self._session_log.collapsed:
+                self.info("Session log: {} repeated command output(s) collapsed".format(self._session_log.collapsed))
+            self._session_log.close()
+
+        if self._command_cache is not None and self._session is None:
+            stats = self._command_cache.stats
+            self.info("Command cache: {} hit(s), {} miss(es), {} invalidation(s), {:.0%} hit rate".format(
+                stats['hits'], stats['misses'], stats['invalidations'], stats['hit_rate']))
+            self._command_cache = None
+
+        if self._session is None:
+            try:
+                self.flush_storage()
+            except Exception as e:
+                self._logger.error("Unable to save data in CSM storage: {}".format(e))
+            if self._job_info is not None:
+                self._job_info.stop()
+            self._history.close()
+        self._job_info = None
 
         self._reset_logging()
+        if self._csm is not None and self._session is None:
+            self.save_trace()
+
+    # Timing API
+    def trace(self, name, category="plugin", **args):
+        """Return the context manager recording the duration of the with block in the timing trace."""
+        return self._tracer.span(name, category, **args)
+
+    def save_trace(self):
+        """Save the timing trace to the trace.json file in the log directory."""
+        try:
+            self._tracer.save(os.path.join(self._csm.log_directory, TRACE_FILENAME))
+        except (IOError, OSError, AttributeError):
+            pass
+
+    def sleep(self, seconds):
+        """Sleep and record the wait in the timing trace."""
+        with self.trace("sleep", "wait", seconds=seconds):
+            sleep(seconds)
+
+    # Duration history API
+    def operation(self, name, packages=None):
+        """Return the :class:`csmpe.history.Operation` predicting the duration of the operation on the device
+        from the durations recorded on the devices of the same family and platform.
+
+        :param name: The operation type, i.e. "Activate reload".
+        :param packages: The number of the packages. Default is the number of the packages selected in CSM.
+        """
+        if packages is None:
+            try:
+                packages = len(self.software_packages or [])
+            except (AttributeError, TypeError):
+                packages = 0
+        return self._history.operation(self.family, getattr(self._connection, "platform", None), name, packages)
+
+    # Command cache API
+    def enable_command_cache(self, ttl=300):
+        """Enable the cache of the show command outputs.
+
+        The output of the show command sent again within ttl seconds is returned from the cache.
+        Any other command sent to the device clears the cache.
+        """
+        self._command_cache = CommandCache(ttl)
+
+    @property
+    def command_cache_stats(self):
+        """The dictionary with the cache hits, misses, invalidations and hit rate or None if disabled."""
+        return self._command_cache.stats if self._command_cache is not None else None
+
+    def _invalidate_command_cache(self):
+        if self._command_cache is not None:
+            self._command_cache.invalidate()
+
+    # Device API
+    # The cached device facts may change when connecting, i.e. after the software upgrade
+    def connect(self, *args, **kwargs):
+        self._invalidate_command_cache()
+        clear_delegate_cache(self)
+        if self._session_log is not None:
+            kwargs.setdefault('logfile', self._session_log)
+        with self.trace("connect", "connection"):
+            return self._connection.connect(*args, **kwargs)
+
+    def reconnect(self, *args, **kwargs):
+        self._invalidate_command_cache()
+        clear_delegate_cache(self)
+        if self._session_log is not None:
+            kwargs.setdefault('logfile', self._session_log)
+        with self.trace("reconnect", "connection"):
+            return self._connection.reconnect(*args, **kwargs)
+
+    def reload(self, *args, **kwargs):
+        self._invalidate_command_cache()
+        clear_delegate_cache(self)
+        with self.trace("reload", "connection"):
+            return self._connection.reload(*args, **kwargs)
+
+    def discovery(self, *args, **kwargs):
+        self._invalidate_command_cache()
+        clear_delegate_cache(self)
+        with self.trace("discovery", "connection"):
+            return self._connection.discovery(*args, **kwargs)
+
+    def send(self, cmd="", timeout=300, wait_for_string=None, password=False, cache=True):
+        """Send the command to the device and return the output. The command is recorded in the timing trace.
+
+        If the command cache is enabled the show command output may be returned from the cache.
+        The polling loops pass cache=False to always read the current state from the device.
+        The output received is still cached.
+        """
+        command_cache = self._command_cache
+        cacheable = False
+        if command_cache is not None:
+            if not command_cache.cacheable(cmd):
+                command_cache.invalidate()
+            elif not password and wait_for_string is None:
+                cacheable = True
+                output = command_cache.get(cmd) if cache else None
+                if output is not None:
+                    with self.trace(cmd, "command", cached=True, bytes=len(output)):
+                        return output
+
+        with self.trace("<password>" if password else cmd or "<enter>", "command", timeout=timeout) as args:
+            if wait_for_string:
+                args['wait_for_string'] = wait_for_string
+            if self._session_log is not None:
+                try:
+                    with self._session_log.block("<password>" if password else cmd):
+                        output = self._connection.send(cmd, timeout=timeout, wait_for_string=wait_for_string,
+                                                       password=password)
+                except Exception:
+                    self._session_log.full_fidelity()
+                    raise
+            else:
+                output = self._connection.send(cmd, timeout=timeout, wait_for_string=wait_for_string,
+                                               password=password)
+            args['bytes'] = len(output) if output else 0
+
+        if cacheable and output is not None:
+            command_cache.put(cmd, output)
+        return output
+
+    def send_batch(self, cmds, timeout=300):
+        """Send the read-only commands at once and return the list of outputs in the same order.
+
+        The commands are written to the device without waiting for the prompt and the combined output
+        is split by the prompt detection, so the whole batch costs a single round trip. The commands are
+        sent one by one if any of them is not a show command, the device is connected over the console
+        or the device does not keep the type-ahead commands.
+
+        :param cmds: The list of commands.
+        :param timeout: The timeout in seconds for the whole batch.
+        :return: The list of the command outputs.
+        """
+        cmds = list(cmds)
+        if len(cmds) < 2 or self._batch_disabled or not all(read_only(cmd) for cmd in cmds) or \
+                self._connection.is_console:
+            return [self.send(cmd, timeout=timeout) for cmd in cmds]
+
+        outputs = {}
+        cache = self._command_cache
+        if cache is not None:
+            for cmd in cmds:
+                output = cache.get(cmd)
+                if output is not None:
+                    with self.trace(cmd, "command", cached=True, bytes=len(output)):
+                        outputs[cmd] = output
+        missing = [cmd for cmd in cmds if cmd not in outputs]
+        missing = sorted(set(missing), key=missing.index)
+
+        if len(missing) > 1:
+            with self.trace("; ".join(missing), "command", timeout=timeout, batch=len(missing)) as args:
+                if self._session_log is not None:
+                    try:
+                        with self._session_log.block("; ".join(missing)):
+                            received = send_batch(self._connection, missing, timeout=timeout)
+                    except Exception:
+                        self._session_log.full_fidelity()
+                        raise
+                else:
+                    received = send_batch(self._connection, missing, timeout=timeout)
+                args['bytes'] = sum(len(output) for output in received or [])
+            if received is None:
+                # not sent, i.e. the current prompt is not recognised
+                received = []
+            elif len(received) < len(missing):
+                self._batch_disabled = True
+                self.info("Device does not support type-ahead commands. Sending commands one by one.")
+            for cmd, output in zip(missing, received):
+                outputs[cmd] = output
+                if cache is not None:
+                    cache.put(cmd, output)
+
+        for cmd in cmds:
+            if cmd not in outputs:
+                outputs[cmd] = self.send(cmd, timeout=timeout)
+        return [outputs[cmd] for cmd in cmds]
+
+    def run_fsm(self, name, command, events, transitions, timeout, max_transitions=20):
+        self._invalidate_command_cache()
+        with self.trace(name, "command", command=command, timeout=timeout):
+            return self._connection.run_fsm(name, command, events, transitions, timeout,
+                                            max_transitions=max_transitions)
 
     @property
     def TIMEOUT(self):
+        import condoor
         return condoor.TIMEOUT
 
     @property
     def CommandTimeoutError(self):
+        import condoor
         return condoor.CommandTimeoutError
 
     @property
@@ -166,14 +533,59 @@ class PluginContext(object):
             pass
             # raise AssertionError("Requested action not provided")
 
+    def _is_connected(self):
+        try:
+            return self._connection.is_connected
+        except Exception:
+            # condoor raises the exception if the connection was never established
+            return False
+
+    def _fingerprint(self):
+        return self._connection.prompt, version_hash(self._connection.send(FINGERPRINT_COMMAND))
+
+    def _cached_connect(self, cache):
+        """Connect to the device and skip the discovery if the device fingerprint did not change.
+
+        The connection information cached by condoor is used if the prompt and the show version
+        output are the same as after the last full discovery of the host URL chain.
+        """
+        urls = self._csm.host_urls
+        entry = cache.get(urls)
+        with self.trace("discovery", "connection") as args:
+            begin = time()
+            if entry is not None:
+                try:
+                    self.connect()
+                    matches = cache.matches(entry, *self._fingerprint())
+                except Exception as e:
+                    self.info("Connection with the cached information failed: {}".format(e))
+                    matches = False
+                if matches:
+                    saved = max(0.0, entry['discovery_time'] - (time() - begin))
+                    args['saved'] = saved
+                    self.info("Device fingerprint not changed. Discovery skipped, time saved: {:.0f}s".format(saved))
+                    return
+                self.info("Device fingerprint changed. Starting the full discovery")
+                cache.invalidate(urls)
+                self.disconnect()
+                begin = time()
+            self.connect(force_discovery=True)
+            prompt, version = self._fingerprint()
+            cache.put(urls, prompt, version, time() - begin)
+            args['saved'] = 0
+
     def _device_detect(self):
         """Connect to device using condoor"""
         self.info("Phase: Connecting")
         self.post_status("Connecting to device")
 
-        # Use force discovery until we sort out all cache issues.
         try:
-            self.connect(force_discovery=True)
+            if self._borrowed and self._is_connected():
+                self.info("Using the device session lent by the session broker")
+            elif getattr(self._csm, "discovery_cache", False):
+                self._cached_connect(DiscoveryCache())
+            else:
+                self.connect(force_discovery=True)
         except Exception:
             self.finalize()
             raise
@@ -194,6 +606,14 @@ class PluginContext(object):
         self._csm.save_data("device_info", self._connection.device_info)
         self._csm.save_data("udi", self._connection.udi)
 
+    def _session_connect(self):
+        """Connect the additional session using the cached device discovery information"""
+        try:
+            self.connect()
+        except Exception:
+            self.finalize()
+            raise
+
     def _format_log(self, message):
         return "[{}] {}".format(self.current_plugin, message) if self.current_plugin else "{}".format(message)
 
@@ -202,12 +622,17 @@ class PluginContext(object):
         self._logger.info(self._format_log(message))
 
     def error(self, message):
+        self._full_session_log()
         self.save_job_info('ERROR:' + self._format_log(message))
 
         """Log ERROR message"""
         self._logger.error(self._format_log(message))
         raise PluginError
 
+    def _full_session_log(self):
+        if self._session_log is not None:
+            self._session_log.full_fidelity()
+
     def warning(self, message):
         self.save_job_info('WARNING: ' + self._format_log(message))
 
@@ -215,32 +640,32 @@ class PluginContext(object):
         self._logger.warning(self._format_log(message))
 
     def save_job_info(self, message):
+        """Push the message to the CSM job info. The messages are sent in batches by the background thread."""
+        if self._job_info is not None:
+            self._job_info.put(message)
+            return
         try:
             self._csm.save_job_info(message)
         except AttributeError:
             pass
 
+    def _push_job_info(self, messages):
+        self._csm.save_job_info("\n".join(messages))
+
     # Storage API
+    # The values are written to CSM in batches by flush_storage() called after each plugin.
     def save_data(self, key, data):
         """
         Stores (data, timestamp) tuple for key adding timestamp
         This tuple is saved to host context data
         """
-        self._csm.save_data(key, [data, time()])
-        self.info("Key '{}' saved in CSM storage".format(key))
+        self._storage.save("data", key, [data, time()])
 
     def load_data(self, key):
         """
         Loads (data, timestamp) tuple for the key from host context data
         """
-        result = self._csm.load_data(key)
-        if result:
-            self.info("Key '{}' loaded from CSM storage".format(key))
-            if isinstance(result, list):
-                return tuple(result)
-            else:
-                return result, None
-        return None, None
+        return self._load("data", key)
 
     # Storage API
     def save_job_data(self, key, data):
@@ -248,22 +673,44 @@ class PluginContext(object):
         Stores (data, timestamp) tuple for key adding timestamp
         This tuple is saved to install job data
         """
-        self._csm.save_job_data(key, [data, time()])
-        self.info("Key '{}' saved in CSM storage".format(key))
+        self._storage.save("job_data", key, [data, time()])
+        self._produced.add(key)
 
     def load_job_data(self, key):
         """
         Loads (data, timestamp) tuple for the key
         """
-        result = self._csm.load_job_data(key)
+        return self._load("job_data", key)
+
+    def _load(self, scope, key):
+        result, cached = self._storage.load(scope, key)
         if result:
-            self.info("Key '{}' loaded from CSM storage".format(key))
+            if not cached:
+                self.info("Key '{}' loaded from CSM storage".format(key))
             if isinstance(result, list):
                 return tuple(result)
             else:
                 return result, None
         return None, None
 
+    def has_job_data(self, key):
+        """Return True if the key is stored in the install job data."""
+        try:
+            return bool(self._storage.load("job_data", key)[0])
+        except AttributeError:
+            return False
+
+    def produced_job_data(self, key):
+        """Return True if the key was saved to the install job data in this run. The job data
+        stored by the previous runs may not reflect the current device state."""
+        return key in self._produced
+
+    def flush_storage(self):
+        """Write the saved data and job data to CSM."""
+        if self._storage is not None and self._storage.pending:
+            keys = self._storage.flush()
+            self.info("Keys saved in CSM storage: {}".format(", ".join("'{}'".format(key) for key in keys)))
+
     def normalize_filename(self, name):
         filename = re.sub(r"\W+", '-', name)
         filename += ".txt"
@@ -272,10 +719,18 @@ class PluginContext(object):
     def save_to_file(self, name, data):
         """
         Save data to filename in the log_directory provided by CSM
+
+        If the CSM context provides the artifact_directory the data is saved compressed
+        in the :class:`csmpe.artifacts.ArtifactStore` instead. See :meth:`load_from_file`.
         """
 
         store_dir = self._csm.log_directory
         file_name = self.normalize_filename(name)
+        if self._artifacts is not None:
+            digest = self._artifacts.put(data, self._csm.hostname, self.phase, file_name)
+            self.info("File '{}' saved in artifact store ({})".format(file_name, digest[:12]))
+            return file_name
+
         full_path = os.path.join(store_dir, file_name)
         with open(full_path, "w") as f:
             f.write(data)
@@ -283,11 +738,54 @@ class PluginContext(object):
             return file_name
         return None
 
-    def load_from_file(self, file_name):
+    def capture(self, cmd, timeout=300, line_filter=None, tail=100, name=None):
+        """Send the command and write the output to the file in the log_directory provided by CSM
+        as it arrives from the device, so the whole output is never kept in memory.
+
+        :param cmd: The show command.
+        :param timeout: The command timeout in seconds.
+        :param line_filter: The optional callable taking the output line and returning True if the line
+            is saved or the regular expression string the saved lines must match.
+        :param tail: The number of the last saved lines kept in memory.
+        :param name: The name used for the file name. Default is the command.
+        :return: The :class:`csmpe.capture.Capture` object with the filename, lines, size and tail attributes.
+        """
+        file_name = self.normalize_filename(name or cmd)
+        if self._artifacts is not None:
+            output = self._artifacts.open(self._csm.hostname, self.phase, file_name)
+        else:
+            output = os.path.join(self._csm.log_directory, file_name)
+        with self.trace(cmd, "command", timeout=timeout, streamed=True) as args:
+            with Capture(output, line_filter=line_filter, tail=tail) as capture:
+                if self._command_cache is not None and not self._command_cache.cacheable(cmd):
+                    self._command_cache.invalidate()
+                if not stream_command(self._connection, cmd, capture, timeout=timeout):
+                    # the connection does not support streaming
+                    output = self._connection.send(cmd, timeout=timeout)
+                    for start in range(0, len(output), CHUNK_SIZE):
+                        capture.write(output[start:start + CHUNK_SIZE])
+            args['bytes'] = capture.size
+        self.info("File '{}' saved in {} ({} lines)".format(
+            file_name, "CSM log directory" if self._artifacts is None else "artifact store", capture.lines))
+        return capture
+
+    def load_from_file(self, file_name, phase=None):
         """
         Load data from file where full path is provided as file_name
+
+        If the file does not exist and the artifact store is enabled the content saved for the file name
+        in the phase is loaded from the store. If phase is None the most recently saved content is loaded.
         """
         full_path = file_name
+        if self._artifacts is not None and not os.path.exists(full_path):
+            name = os.path.basename(file_name)
+            digest = self._artifacts.lookup(self._csm.hostname, name, phase)
+            if digest is None:
+                return None
+            data = self._artifacts.get(digest)
+            self.info("File '{}' loaded from artifact store ({})".format(name, digest[:12]))
+            return data
+
         with open(full_path, "r") as f:
             data = f.read()
             self.info("File '{}' loaded from CSM directory".format(os.path.basename(file_name)))
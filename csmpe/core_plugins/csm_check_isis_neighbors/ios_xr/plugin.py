@@ -36,6 +36,7 @@ class Plugin(CSMPlugin):
     platforms = {'ASR9K', 'XR12K', 'CRS', 'NCS1K', 'NCS1001', 'NCS4K', 'NCS5K', 'NCS540',
                  'NCS5500', 'NCS6K', 'IOSXRv-9K', 'IOSXRv-X64'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
+    readonly = True
 
     def run(self):
         """
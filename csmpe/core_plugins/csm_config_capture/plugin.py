@@ -36,11 +36,12 @@ class Plugin(CSMPlugin):
     platforms = {'ASR9K', 'XR12K', 'CRS', 'NCS1K', 'NCS1001', 'NCS4K', 'NCS5K', 'NCS540',
                  'NCS5500', 'NCS6K', 'ASR900', 'N6K', 'IOSXRv-9K', 'IOSXRv-X64'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
+    readonly = True
 
     def run(self):
         cmd = "show running-config"
-        output = self.ctx.send(cmd, timeout=2200)
-        file_name = self.ctx.save_to_file(cmd, output)
-        if file_name is None:
-            self.ctx.error("Unable to save device configuration to file: {}".format(file_name))
+        try:
+            self.ctx.capture(cmd, timeout=2200)
+        except IOError as e:
+            self.ctx.error("Unable to save device configuration to file: {}".format(e))
             return False
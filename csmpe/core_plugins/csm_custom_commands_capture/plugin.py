@@ -43,11 +43,10 @@ class Plugin(CSMPlugin):
             for cmd in command_list:
                 self.ctx.info("Capturing output of '{}'".format(cmd))
                 try:
-                    output = self.ctx.send(cmd, timeout=2200)
-                    file_name = self.ctx.save_to_file(cmd, output)
-                    if file_name is None:
-                        self.ctx.error("Unable to save '{}' output to file: {}".format(cmd, file_name))
-                        return False
+                    self.ctx.capture(cmd, timeout=2200)
+                except IOError as e:
+                    self.ctx.error("Unable to save '{}' output to file: {}".format(cmd, e))
+                    return False
                 except CommandSyntaxError:
                     self.ctx.error("Command Syntax Error: '" + cmd + "'")
 
@@ -34,6 +34,7 @@ class Plugin(CSMPlugin):
     platforms = {'ASR9K', 'XR12K', 'CRS', 'NCS1K', 'NCS1001', 'NCS4K', 'NCS540',
                  'NCS5K', 'NCS5500', 'NCS6K', 'IOSXRv-9K', 'IOSXRv-X64'}
     phases = {'Post-Upgrade'}
+    readonly = True
 
     # matching any errors, core and traceback
     _string_to_check_re = re.compile(
@@ -28,6 +28,10 @@ import time
 from csmpe.plugins import CSMPlugin
 
 
+PACKAGE_KEYS = ("show_install_inactive", "show_install_active", "show_install_committed")
+PACKAGE_COMMANDS = ("show install inactive", "show install active", "show install committed")
+
+
 class Plugin(CSMPlugin):
     """This plugin retrieves software information from the device."""
     name = "Get Inventory Plugin"
@@ -35,6 +39,9 @@ class Plugin(CSMPlugin):
                  'NCS5500', 'NCS6K', 'IOSXRv-9K', 'IOSXRv-X64'}
     phases = {'Get-Inventory'}
     os = {'eXR'}
+    provides = {'cli_show_inventory', 'cli_admin_show_inventory', 'cli_admin_show_install_inactive',
+                'cli_admin_show_install_active', 'cli_admin_show_install_committed',
+                'cli_show_install_inactive', 'cli_show_install_active', 'cli_show_install_committed'}
 
     def run(self):
         get_package(self.ctx)
@@ -54,21 +61,17 @@ def get_package(ctx):
     Convenient method, it may be called by outside of the plugin
     """
 
-    # Get the admin packages
-    ctx.save_job_data("cli_admin_show_install_inactive",
-                      get_output_in_admin_mode(ctx, "show install inactive"))
-    ctx.save_job_data("cli_admin_show_install_active",
-                      get_output_in_admin_mode(ctx, "show install active"))
-    ctx.save_job_data("cli_admin_show_install_committed",
-                      get_output_in_admin_mode(ctx, "show install committed"))
+    # Get the admin packages. The commands are sent one by one as the batch outputs are split
+    # by the XR prompt, not the admin mode prompt.
+    for key, cmd in zip(PACKAGE_KEYS, PACKAGE_COMMANDS):
+        ctx.save_job_data("cli_admin_" + key, get_output_in_admin_mode(ctx, cmd))
 
     # Get the non-admin packages
-    ctx.save_job_data("cli_show_install_inactive",
-                      get_output_in_admin_mode(ctx, "show install inactive", admin=False))
-    ctx.save_job_data("cli_show_install_active",
-                      get_output_in_admin_mode(ctx, "show install active", admin=False))
-    ctx.save_job_data("cli_show_install_committed",
-                      get_output_in_admin_mode(ctx, "show install committed", admin=False))
+    outputs = ctx.send_batch(PACKAGE_COMMANDS)
+    for key, cmd, output in zip(PACKAGE_KEYS, PACKAGE_COMMANDS, outputs):
+        if 'Please try command later' in output:
+            output = get_output_in_admin_mode(ctx, cmd, admin=False)
+        ctx.save_job_data("cli_" + key, output)
 
 
 def get_output_in_admin_mode(ctx, cmd, admin=True):
@@ -102,7 +105,7 @@ def get_output_in_admin_mode(ctx, cmd, admin=True):
         if 'Please try command later' in output:
             x += 1
             time.sleep(10)
-            output = ctx.send(cmd)
+            output = ctx.send(cmd, cache=False)
         else:
             break
 
@@ -33,6 +33,7 @@ class Plugin(CSMPlugin):
     platforms = {'ASR900'}
     phases = {'Get-Inventory'}
     os = {'IOS'}
+    provides = {'cli_show_inventory', 'cli_show_install_inactive', 'cli_show_install_committed'}
 
     def run(self):
         get_package(self.ctx)
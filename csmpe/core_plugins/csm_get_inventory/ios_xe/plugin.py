@@ -34,6 +34,7 @@ class Plugin(CSMPlugin):
     platforms = {'ASR900', 'ASR1K'}
     phases = {'Get-Inventory'}
     os = {'XE'}
+    provides = {'cli_show_inventory', 'cli_show_install_inactive', 'cli_show_install_committed'}
 
     def run(self):
         get_package(self.ctx)
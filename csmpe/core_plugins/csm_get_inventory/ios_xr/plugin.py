@@ -33,6 +33,8 @@ class Plugin(CSMPlugin):
     platforms = {'ASR9K', 'XR12K', 'CRS'}
     phases = {'Get-Inventory'}
     os = {'XR'}
+    provides = {'cli_show_inventory', 'cli_show_install_inactive', 'cli_show_install_active',
+                'cli_show_install_committed', 'cli_show_nv_satellite'}
 
     def run(self):
         get_package(self.ctx)
@@ -47,12 +49,12 @@ def get_inventory(ctx):
 
 
 def get_package(ctx):
-    ctx.save_job_data("cli_show_install_inactive",
-                      ctx.send("admin show install inactive summary"))
-    ctx.save_job_data("cli_show_install_active",
-                      ctx.send("admin show install active summary"))
-    ctx.save_job_data("cli_show_install_committed",
-                      ctx.send("admin show install committed summary"))
+    inactive, active, committed = ctx.send_batch(["admin show install inactive summary",
+                                                  "admin show install active summary",
+                                                  "admin show install committed summary"])
+    ctx.save_job_data("cli_show_install_inactive", inactive)
+    ctx.save_job_data("cli_show_install_active", active)
+    ctx.save_job_data("cli_show_install_committed", committed)
 
 
 def get_satellite(ctx):
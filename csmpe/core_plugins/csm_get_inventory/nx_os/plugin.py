@@ -33,6 +33,7 @@ class Plugin(CSMPlugin):
     platforms = {'N9K'}
     phases = {'Get-Inventory'}
     os = {'NX-OS'}
+    provides = {'cli_show_install_inactive', 'cli_show_install_committed'}
 
     def run(self):
         get_package(self.ctx)
@@ -28,8 +28,6 @@
 import time
 import re
 
-plugin_ctx = None
-
 
 def send_yes(fsm_ctx):
     fsm_ctx.ctrl.sendline('yes')
@@ -79,7 +77,7 @@ def fpd_needs_upgd(ctx, fpd_location, fpd_type):
     sl = ['Card', 'FPD', 'ATR', 'Status', 'Running']
     dl = {}
 
-    output = ctx.send("show hw-module fpd", timeout=600)
+    output = ctx.send("show hw-module fpd", timeout=600, cache=False)
     lines = output.split('\n')
     lines = [x for x in lines if x]
     for line in lines:
@@ -169,7 +167,7 @@ def fpd_is_current(ctx, fpd_location, fpd_type):
     sl = ['Card', 'FPD', 'ATR', 'Status', 'Running']
     dl = {}
 
-    output = ctx.send("show hw-module fpd", timeout=600)
+    output = ctx.send("show hw-module fpd", timeout=600, cache=False)
     lines = output.split('\n')
     lines = [x for x in lines if x]
     for line in lines:
@@ -361,7 +359,7 @@ def fpd_needs_reload(ctx, fpd_location, fpd_type):
     sl = ['Card', 'FPD', 'ATR', 'Status', 'Running']
     dl = {}
 
-    output = ctx.send("show hw-module fpd", timeout=600)
+    output = ctx.send("show hw-module fpd", timeout=600, cache=False)
     lines = output.split('\n')
     lines = [x for x in lines if x]
     for line in lines:
@@ -484,7 +482,7 @@ def fpd_check_status(ctx, fpd_location, fpd_type):
     sl = ['Card', 'FPD', 'ATR', 'Status', 'Running']
     dl = {}
 
-    output = ctx.send("show hw-module fpd", timeout=600)
+    output = ctx.send("show hw-module fpd", timeout=600, cache=False)
     lines = output.split('\n')
     lines = [x for x in lines if x]
     for line in lines:
@@ -584,9 +582,6 @@ def hw_fpd_reload(ctx, location):
     yes
     result Card graceful reload request on all succeeded.
     """
-    global plugin_ctx
-    plugin_ctx = ctx
-
     cmd = 'admin hw-module location ' + location + ' reload'
 
     # Seeing this message without the reboot prompt indicates a non-reload situation
@@ -31,6 +31,9 @@ import time
 from condoor import ConnectionError, CommandError, CommandSyntaxError
 from csmpe.core_plugins.csm_node_status_check.exr.plugin_lib import parse_show_platform
 from csmpe.core_plugins.csm_install_operations.actions import a_error
+from csmpe.core_plugins.csm_install_operations.reload import ReloadWaiter
+from csmpe.core_plugins.csm_install_operations.watch import InstallWatcher
+from csmpe.timing import traced
 
 # match for:
 # Error! Not enough free disk space for installation.
@@ -38,8 +41,6 @@ from csmpe.core_plugins.csm_install_operations.actions import a_error
 # ERROR!! failed while handling validate reply
 install_error_pattern = re.compile("E[Rr][Rr][Oo][Rr]:?!* *(.*)", re.MULTILINE)
 
-plugin_ctx = None
-
 
 def log_install_errors(ctx, output):
         errors = re.findall(install_error_pattern, output)
@@ -75,6 +76,7 @@ def check_ncs4k_release(ctx):
                         ctx.error('Abort: Software package earlier than release 6.0.2 for NCS4K is not supported.')
 
 
+@traced("wait")
 def watch_operation(ctx, op_id=0):
     """
     Watch for the non-reload situation.  Upon issuing add/activate/commit/remove/deactivate, the install operation
@@ -117,62 +119,13 @@ def watch_operation(ctx, op_id=0):
 
     RP/0/RP0/CPU0:Deploy#May 24 22:25:43 Install operation 17 finished successfully
     """
-    no_install = r"No install operation in progress"
     # In ASR9K eXR, the output to show install request may be "The install prepare operation 9 is 40% complete"
     # or "The install service operation 9 is 40% complete" or "The install add operation 9 is 40% complete" and etc.
-    op_progress = r"The install \w*?\s?operation {} is (\d+)% complete".format(op_id)
-    success = "Install operation {} finished successfully".format(op_id)
-
-    cmd_show_install_request = "show install request"
-    ctx.info("Watching the operation {} to complete".format(op_id))
-
-    propeller = itertools.cycle(["|", "/", "-", "\\", "|", "/", "-", "\\"])
-
-    last_status = None
-    finish = False
-    time_tried = 0
-    op_id = str(op_id)
-    while not finish:
-        try:
-            try:
-                # this is to catch the successful operation as soon as possible
-                ctx.send("", wait_for_string=success, timeout=20)
-                finish = True
-            except ctx.CommandTimeoutError:
-                pass
-
-            message = ""
-            try:
-                output = ctx.send(cmd_show_install_request, timeout=300)
-            except (CommandError, CommandSyntaxError) as e:
-                ctx.info("{} received an error".format(cmd_show_install_request))
-                time.sleep(10)
-                output = ctx.send(cmd_show_install_request, timeout=300)
-            if op_id in output:
-                result = re.search(op_progress, output)
-                if result:
-                    status = result.group(0)
-                    message = "{} {}".format(propeller.next(), status)
-
-                if message != last_status:
-                    ctx.post_status(message)
-                    last_status = message
-        except (ConnectionError, ctx.CommandTimeoutError) as e:
-            if time_tried > 2:
-                raise e
-
-            time_tried += 1
-            ctx.disconnect()
-            time.sleep(60)
-            ctx.reconnect(force_discovery=True)
-
-        # ctx.send returns with an empty output from 'show install request'. go back to loop
-        if output is None:
-            continue
-
-        # ctx.send returns and no active install action in progress. terminate the loop
-        if no_install in output:
-            break
+    watcher = InstallWatcher(ctx, op_id, "show install request",
+                             idle=r"No install operation in progress",
+                             progress=[r"The install \w*?\s?operation {} is (\d+)% complete".format(op_id)],
+                             reconnect=dict(force_discovery=True), operation="{} install".format(ctx.phase))
+    watcher.watch()
 
     report_install_status(ctx, op_id)
 
@@ -203,61 +156,26 @@ def validate_node_state(inventory):
     return False
 
 
+def all_nodes_up(ctx):
+    # show platform can take more than 1 minute after router reload. Issue No. 47
+    output = ctx.send("show platform", timeout=600, cache=False)
+    return "IOS XR RUN" in output and validate_node_state(parse_show_platform(ctx, output)), output
+
+
+@traced("wait")
 def wait_for_reload(ctx):
     """
-     Wait for system to come up with max timeout as 25 Minutes
+     Wait for system to come up with max timeout as 120 Minutes
 
     """
-    begin = time.time()
-    if not ctx.is_console:
-        ctx.disconnect()
-        ctx.post_status("Waiting for device boot to reconnect")
-        ctx.info("Waiting for device boot to reconnect")
-        # it may take up to 10 minutes before Fretta actually reboots
-        time.sleep(600)
-        ctx.reconnect(max_timeout=3600, force_discovery=True)  # 60 * 60 = 3600
-
-    else:
-        ctx.info("Keeping console connected")
-        ctx.post_status("Boot process started")
-        ctx.info("Boot process started")
-        if not ctx.reload(reload_timeout=1500, no_reload_cmd=True):
-            ctx.error("Encountered error when attempting to reload device.")
-        ctx.info("Boot process finished")
-
-    ctx.info("Device connected successfully")
-
-    timeout = 7200
-    poll_time = 30
-    time_waited = 0
-    xr_run = "IOS XR RUN"
-
-    cmd = "show platform"
-    ctx.info("Waiting for all nodes to come up")
-    ctx.post_status("Waiting for all nodes to come up")
-
-    time.sleep(100)
-
-    while 1:
-        # Wait till all nodes are in XR run state
-        time_waited += poll_time
-        if time_waited >= timeout:
-            break
-
-        time.sleep(poll_time)
-
-        # show platform can take more than 1 minute after router reload. Issue No. 47
-        output = ctx.send(cmd, timeout=600)
-        if xr_run in output:
-            inventory = parse_show_platform(ctx, output)
-            if validate_node_state(inventory):
-                ctx.info("All nodes in desired state")
-                elapsed = time.time() - begin
-                ctx.info("Overall outage time: {} minute(s) {:.0f} second(s)".format(elapsed // 60, elapsed % 60))
-                return True
+    # it may take up to 10 minutes before Fretta actually reboots
+    waiter = ReloadWaiter(ctx, all_nodes_up, down_timeout=900, up_timeout=3600, ready_timeout=7200,
+                          console_reload=True, operation="{} reload".format(ctx.phase))
+    if waiter.wait():
+        return True
 
     # Some nodes did not come to run state
-    ctx.error("Not all nodes have came up: {}".format(output))
+    ctx.error("Not all nodes have came up: {}".format(waiter.output))
     # this will never be executed
     return False
 
@@ -339,26 +257,24 @@ def report_install_status(ctx, op_id):
     ctx.info("Operation {} finished successfully".format(op_id))
 
 
-def handle_aborted(fsm_ctx):
+def handle_aborted(plugin_ctx, fsm_ctx):
     """
-    :param ctx: FSM Context
+    :param plugin_ctx: Plugin Context
+    :param fsm_ctx: FSM Context
     :return: True if successful other False
     """
-    global plugin_ctx
-
     report_install_status(ctx=plugin_ctx, op_id=get_op_id(fsm_ctx.ctrl.before))
 
     # Indicates the failure
     return False
 
 
-def handle_non_reload_activate_deactivate(fsm_ctx):
+def handle_non_reload_activate_deactivate(plugin_ctx, fsm_ctx):
     """
-    :param ctx: FSM Context
+    :param plugin_ctx: Plugin Context
+    :param fsm_ctx: FSM Context
     :return: True if successful other False
     """
-    global plugin_ctx
-
     op_id = get_op_id(fsm_ctx.ctrl.before)
     if op_id == -1:
         return False
@@ -368,13 +284,12 @@ def handle_non_reload_activate_deactivate(fsm_ctx):
     return True
 
 
-def handle_reload_activate_deactivate(fsm_ctx):
+def handle_reload_activate_deactivate(plugin_ctx, fsm_ctx):
     """
-    :param ctx: FSM Context
+    :param plugin_ctx: Plugin Context
+    :param fsm_ctx: FSM Context
     :return: True if successful other False
     """
-    global plugin_ctx
-
     op_id = get_op_id(fsm_ctx.ctrl.before)
     if op_id == -1:
         return False
@@ -395,18 +310,17 @@ def handle_reload_activate_deactivate(fsm_ctx):
     return True
 
 
-def no_impact_warning(fsm_ctx):
+def no_impact_warning(plugin_ctx, fsm_ctx):
     plugin_ctx.warning("This was a NO IMPACT OPERATION. Packages are already active on device.")
     return True
 
 
-def handle_not_start(fsm_ctx):
+def handle_not_start(plugin_ctx, fsm_ctx):
     """
-    :param ctx: FSM Context
+    :param plugin_ctx: Plugin Context
+    :param fsm_ctx: FSM Context
     :return: False
     """
-    global plugin_ctx
-
     plugin_ctx.error("Could not start this install operation because an install operation is still in progress")
     return False
 
@@ -482,9 +396,6 @@ def install_activate_deactivate(ctx, cmd):
     RP/0/RSP0/CPU0:ios#Jun 09 15:53:51 Install operation 27 finished successfully
 
     """
-    global plugin_ctx
-    plugin_ctx = ctx
-
     ABORTED = re.compile("aborted")
 
     # REBOOT_PROMP for eXR reload response:
@@ -507,14 +418,14 @@ def install_activate_deactivate(ctx, cmd):
     #                  0                    1              2           3          4         5          6
     events = [CONTINUE_IN_BACKGROUND, REBOOT_PROMPT, RELOAD_PROMPT, ABORTED, NO_IMPACT, RUN_PROMPT, ERROR, NOT_START]
     transitions = [
-        (CONTINUE_IN_BACKGROUND, [0], -1, handle_non_reload_activate_deactivate, 300),
-        (REBOOT_PROMPT, [0], -1, handle_reload_activate_deactivate, 300),
-        (RELOAD_PROMPT, [0], -1, handle_reload_activate_deactivate, 300),
-        (NO_IMPACT, [0], -1, no_impact_warning, 60),
-        (RUN_PROMPT, [0], -1, handle_non_reload_activate_deactivate, 300),
-        (ABORTED, [0], -1, handle_aborted, 300),
+        (CONTINUE_IN_BACKGROUND, [0], -1, partial(handle_non_reload_activate_deactivate, ctx), 300),
+        (REBOOT_PROMPT, [0], -1, partial(handle_reload_activate_deactivate, ctx), 300),
+        (RELOAD_PROMPT, [0], -1, partial(handle_reload_activate_deactivate, ctx), 300),
+        (NO_IMPACT, [0], -1, partial(no_impact_warning, ctx), 60),
+        (RUN_PROMPT, [0], -1, partial(handle_non_reload_activate_deactivate, ctx), 300),
+        (ABORTED, [0], -1, partial(handle_aborted, ctx), 300),
         (ERROR, [0], -1, partial(a_error, ctx), 0),
-        (NOT_START, [0], -1, handle_not_start, 300),
+        (NOT_START, [0], -1, partial(handle_not_start, ctx), 300),
     ]
 
     if not ctx.run_fsm("ACTIVATE-OR-DEACTIVATE", cmd, events, transitions, timeout=300):
@@ -611,11 +522,11 @@ def observe_install_remove_all(ctx, cmd, prompt):
 
             message = ""
             try:
-                output = ctx.send(cmd_show_install_request, timeout=300)
+                output = ctx.send(cmd_show_install_request, timeout=300, cache=False)
             except (CommandError, CommandSyntaxError) as e:
                 ctx.info("{} received an error".format(cmd_show_install_request))
                 time.sleep(10)
-                output = ctx.send(cmd_show_install_request, timeout=300)
+                output = ctx.send(cmd_show_install_request, timeout=300, cache=False)
             if op_id in output:
                 result = re.search(op_progress, output)
                 if result:
@@ -24,9 +24,8 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
 import re
-import time
-
-plugin_ctx = None
+from csmpe.core_plugins.csm_install_operations.reload import ReloadWaiter
+from csmpe.timing import traced
 
 
 install_error_pattern = re.compile(r"Error:    (.*)$", re.MULTILINE)
@@ -79,62 +78,30 @@ def send_newline(fsm_ctx):
     return True
 
 
-def issu_error_state(fsm_ctx):
+def issu_error_state(plugin_ctx, fsm_ctx):
     plugin_ctx.warning("Error in ISSU. Please see session.log for details")
     return False
 
 
+def device_up(ctx):
+    output = ctx.send('show version | include ^System image', cache=False)
+    ctx.info("output = {}".format(output))
+    return bool(re.search(r'(asr.*\.bin)', output)), output
+
+
+@traced("wait")
 def wait_for_reload(ctx):
     """
-     Wait for system to come up with max timeout as 25 Minutes
+     Wait for system to come up with max timeout as 30 Minutes
 
     """
-    begin = time.time()
-    ctx.disconnect()
-    ctx.post_status("Waiting for device boot to reconnect")
-    ctx.info("Waiting for device boot to reconnect")
-    time.sleep(1500)   # 25 * 60 = 1500
-    ctx.reconnect(force_discovery=True)   # default max_timeout=360
-    ctx.info("Boot process finished")
-    ctx.info("Device connected successfully")
-
-    timeout = 3600
-    poll_time = 30
-    time_waited = 0
-
-    ctx.info("Waiting for the device to come up")
-    ctx.post_status("Waiting for the device to come up")
-    time.sleep(30)
-
-    output = None
-
-    ncnt = 0
-    while 1:
-
-        ncnt += 1
-        if ncnt > 20:
-            break
-
-        # Wait till all nodes are in XR run state
-        time_waited += poll_time
-        if time_waited >= timeout:
-            break
-
-        time.sleep(poll_time)
-
-        output = ctx.send('show version | include ^System image')
-
-        ctx.info("output = {}".format(output))
-
-        m = re.search(r'(asr.*\.bin)', output)
-        if m:
-            ctx.info("The device is in the desired state")
-            elapsed = time.time() - begin
-            ctx.info("Overall outage time: {} minute(s) {:.0f} second(s)".format(elapsed // 60, elapsed % 60))
-            return True
+    waiter = ReloadWaiter(ctx, device_up, down_timeout=600, up_timeout=1800, ready_timeout=600,
+                          operation="{} reload".format(ctx.phase))
+    if waiter.wait():
+        return True
 
     # Some nodes did not come to run state
-    ctx.error("Not all nodes have came up: {}".format(output))
+    ctx.error("Not all nodes have came up: {}".format(waiter.output))
     # this will never be executed
     return False
 
@@ -153,9 +120,6 @@ def install_activate_write_memory(ctx, cmd, hostname):
     Overwrite the previous NVRAM configuration?[confirm]
 
     """
-    global plugin_ctx
-    plugin_ctx = ctx
-
     # Seeing this message without the reboot prompt indicates a non-reload situation
     Build_config = re.compile(r"\[OK\]")
 
@@ -25,11 +25,12 @@
 # =============================================================================
 import re
 import time
+from functools import partial
 
 from csmpe.core_plugins.csm_node_status_check.ios_xe.plugin_lib import parse_show_platform
+from csmpe.core_plugins.csm_install_operations.reload import ReloadWaiter
 from utils import install_add_remove
-
-plugin_ctx = None
+from csmpe.timing import traced
 
 
 def send_newline(fsm_ctx):
@@ -39,15 +40,15 @@ def send_newline(fsm_ctx):
     return True
 
 
-def issu_error_state(fsm_ctx):
+def issu_error_state(plugin_ctx, fsm_ctx):
     plugin_ctx.warning("Error in ISSU. Please see session.log for details")
     return False
 
 
-def issu_connection_closed(fsm_ctx):
+def issu_connection_closed(plugin_ctx, fsm_ctx):
     plugin_ctx.info("Connection closed by foreign host during ISSU")
     # sleep until both standby and active RSP's are upgraded
-    time.sleep(3600)
+    plugin_ctx.sleep(3600)
     return True
 
 
@@ -68,58 +69,26 @@ def validate_node_state(inventory):
     return False
 
 
+def all_nodes_up(ctx):
+    # show platform can take more than 1 minute after router reload. Issue No. 47
+    output = ctx.send('show platform', timeout=600, cache=False)
+    ctx.info("show platform = {}".format(output))
+    return validate_node_state(parse_show_platform(ctx, output)), output
+
+
+@traced("wait")
 def wait_for_reload(ctx):
     """
-     Wait for system to come up with max timeout as 25 Minutes
+     Wait for system to come up with max timeout as 30 Minutes
 
     """
-    begin = time.time()
-    ctx.disconnect()
-    ctx.post_status("Waiting for device boot to reconnect")
-    ctx.info("Waiting for device boot to reconnect")
-    time.sleep(1500)   # 25 * 60 = 1500
-    ctx.reconnect(force_discovery=True)
-    ctx.info("Boot process finished")
-    ctx.info("Device connected successfully")
-
-    timeout = 3600
-    poll_time = 30
-    time_waited = 0
-
-    ctx.info("Waiting for all nodes to come up")
-    ctx.post_status("Waiting for all nodes to come up")
-    time.sleep(30)
-
-    output = None
-
-    ncnt = 0
-    while 1:
-
-        ncnt += 1
-        if ncnt > 20:
-            break
-
-        # Wait till all nodes are in XR run state
-        time_waited += poll_time
-        if time_waited >= timeout:
-            break
-
-        time.sleep(poll_time)
-
-        # show platform can take more than 1 minute after router reload. Issue No. 47
-        output = ctx.send('show platform', timeout=600)
-
-        ctx.info("show platform = {}".format(output))
-
-        inventory = parse_show_platform(ctx, output)
-        if validate_node_state(inventory):
-            ctx.info("All nodes in desired state")
-            elapsed = time.time() - begin
-            ctx.info("Overall outage time: {} minute(s) {:.0f} second(s)".format(elapsed // 60, elapsed % 60))
-            return True
+    waiter = ReloadWaiter(ctx, all_nodes_up, down_timeout=600, up_timeout=1800, ready_timeout=600,
+                          operation="{} reload".format(ctx.phase))
+    if waiter.wait():
+        return True
 
     # Some nodes did not come to run state
-    ctx.error("Not all nodes have came up: {}".format(output))
+    ctx.error("Not all nodes have came up: {}".format(waiter.output))
     # this will never be executed
     return False
 
@@ -138,8 +107,6 @@ def install_activate_write_memory(ctx, cmd):
     Overwrite the previous NVRAM configuration?[confirm]
 
     """
-    global plugin_ctx
-    plugin_ctx = ctx
 
     # Seeing this message without the reboot prompt indicates a non-reload situation
     Build_config = re.compile(r'\[OK\]')
@@ -252,9 +219,6 @@ def install_activate_issu(ctx, cmd):
     :return: nothing
     """
 
-    global plugin_ctx
-    plugin_ctx = ctx
-
     # Seeing a message without STAGE 4 is an error
     Phase_one = re.compile("Starting disk space verification")
     Stage_one = re.compile("STAGE 1: Installing software on standby RP")
@@ -276,9 +240,9 @@ def install_activate_issu(ctx, cmd):
         (Stage_three, [3], 4, None, 1800),
         (Stage_four, [4], 5, None, 1800),
         (Load_on_reboot, [5], -1, None, 1800),
-        (Missing_conf, [0, 1, 2, 3, 4, 5], -1, issu_error_state, 60),
-        (Failed, [0, 1, 2, 3, 4, 5], -1, issu_error_state, 60),
-        (Connection_closed, [1, 2, 3, 4], -1, issu_connection_closed, 4200)
+        (Missing_conf, [0, 1, 2, 3, 4, 5], -1, partial(issu_error_state, ctx), 60),
+        (Failed, [0, 1, 2, 3, 4, 5], -1, partial(issu_error_state, ctx), 60),
+        (Connection_closed, [1, 2, 3, 4], -1, partial(issu_connection_closed, ctx), 4200)
     ]
 
     if not ctx.run_fsm("ISSU", cmd, events, transitions, timeout=4200):
@@ -27,8 +27,6 @@
 
 import re
 
-plugin_ctx = None
-
 
 def send_yes(fsm_ctx):
     fsm_ctx.ctrl.sendline('yes')
@@ -140,7 +138,7 @@ def fpd_needs_upgd(ctx, location, fpd_type):
     check = False
     cmd = 'admin show hw-module fpd location ' + location
 
-    output = ctx.send(cmd)
+    output = ctx.send(cmd, cache=False)
     lines = output.split('\n')
     lines = [x for x in lines if x]
     xlen = len(lines)
@@ -388,9 +386,6 @@ def hw_fpd_upgd(ctx, location, type):
 
     FPD upgrade has ended.
     """
-    global plugin_ctx
-    plugin_ctx = ctx
-
     cmd = 'admin upgrade hw-module fpd ' + type + ' location ' + location
 
     # There can be two different prompts
@@ -481,7 +476,7 @@ def fpd_check_status(ctx, location, type):
     if fpd_needs_upgd(ctx, location, type):
         upgd_result = False
         cmd = 'admin show hw-module fpd location ' + location
-        output = ctx.send(cmd)
+        output = ctx.send(cmd, cache=False)
         ctx.warning("FPD Upgrade result for {}".format(cmd))
         ctx.warning("{}".format(output))
 
@@ -505,9 +500,6 @@ def hw_fpd_reload(ctx, location):
     [Done]
     Proceed with reload? [confirm]RP/0/RSP0/CPU0::This node received reload command. Reloading in 5 secs
     """
-    global plugin_ctx
-    plugin_ctx = ctx
-
     cmd = 'admin reload location ' + location
     fsm_name = 'Reload location ' + location
 
@@ -616,7 +608,7 @@ def cbc_pwr_only(ctx):
     check = False
     cmd = 'admin show hw-module fpd location all'
 
-    output = ctx.send(cmd)
+    output = ctx.send(cmd, cache=False)
     lines = output.split('\n')
     lines = [x for x in lines if x]
     for line in lines:
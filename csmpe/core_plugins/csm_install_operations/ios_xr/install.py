@@ -28,15 +28,18 @@
 import re
 import time
 import itertools
+from functools import partial
 from condoor import ConnectionError, CommandError
 from csmpe.core_plugins.csm_node_status_check.ios_xr.plugin_lib import parse_show_platform
+from csmpe.core_plugins.csm_install_operations.reload import ReloadWaiter
+from csmpe.core_plugins.csm_install_operations.watch import InstallWatcher
+from satellite_lib import SatelliteIdSet, collect_satellite_status, diff_satellite_status, format_satellite_status
+from csmpe.timing import traced
 
 install_error_pattern = re.compile(r"Error:    (.*)$", re.MULTILINE)
 
-plugin_ctx = None
 
-
-def send_yes(fsm_ctx):
+def send_yes(plugin_ctx, fsm_ctx):
     plugin_ctx.send('Y')
     return True
 
@@ -47,73 +50,20 @@ def log_install_errors(ctx, output):
         ctx.warning(line)
 
 
+@traced("wait")
 def watch_operation(ctx, op_id=0):
     """
     Function to keep watch on progress of operation
     and report KB downloaded.
 
     """
-    no_install = r"There are no install requests in operation"
-    op_progress = r"The operation is (\d+)% complete"
-    op_download = r"(.*)KB downloaded: Download in progress"
-    success = "Install operation {} completed successfully".format(op_id)
-
-    cmd_show_install_request = "admin show install request"
-
-    ctx.info("Watching the operation {} to complete".format(op_id))
-
-    propeller = itertools.cycle(["|", "/", "-", "\\", "|", "/", "-", "\\"])
-
-    output = None
-    last_status = None
-    finish = False
-    time_tried = 0
-    op_id = str(op_id)
-    while not finish:
-        try:
-            try:
-                # this is to catch the successful operation as soon as possible
-                ctx.send("", wait_for_string=success, timeout=20)
-                finish = True
-            except ctx.CommandTimeoutError:
-                pass
-
-            message = ""
-            # on CRS, it is observed that during Add, any command typed hangs for a while
-            output = ctx.send(cmd_show_install_request, timeout=300)
-            if op_id in output:
-                # FIXME reconsider the logic here
-                result = re.search(op_progress, output)
-                if result:
-                    status = result.group(0)
-                    message = "{} {}".format(propeller.next(), status)
-
-                result = re.search(op_download, output)
-                if result:
-                    status = result.group(0)
-                    message += "\r\n<br>{}".format(status)
-
-                if message != last_status:
-                    ctx.post_status(message)
-                    last_status = message
-        except (ConnectionError, ctx.CommandTimeoutError) as e:
-            if time_tried > 2:
-                raise e
-
-            time_tried += 1
-            ctx.disconnect()
-            time.sleep(60)
-            ctx.reconnect()
-
-        # ctx.send returns with an empty output from 'show install request'. go back to loop
-        if output is None:
-            continue
-
-        # ctx.send returns and no active install action in progress. terminate the loop
-        if no_install in output:
-            break
-
-    return output
+    watcher = InstallWatcher(ctx, op_id, "admin show install request",
+                             idle=r"There are no install requests in operation",
+                             progress=[r"The operation is (\d+)% complete",
+                                       r"(.*)KB downloaded: Download in progress"],
+                             completed=r"Install operation {} completed successfully".format(op_id),
+                             operation="{} install".format(ctx.phase))
+    return watcher.watch()
 
 
 def validate_node_state(inventory):
@@ -139,68 +89,32 @@ def validate_node_state(inventory):
     return False
 
 
+def all_nodes_up(ctx):
+    # show platform can take more than 1 minute after router reload. Issue No. 47
+    output = ctx.send("admin show platform", timeout=600, cache=False)
+    return "IOS XR RUN" in output and validate_node_state(parse_show_platform(ctx, output)), output
+
+
+@traced("wait")
 def wait_for_reload(ctx):
     """
-     Wait for system to come up with max timeout as 25 Minutes
+     Wait for system to come up with max timeout as 60 Minutes
 
     """
-    begin = time.time()
-    if not ctx.is_console:
-        # wait a little bit before disconnect so that newline character can reach the router
-        # XR ddts CSCvb67386 workaround - reload is aborted after a confirmation is received from
-        # the router if disconnect too soon (less than 6 seconds)
-        time.sleep(10)
-        ctx.disconnect()
-        ctx.post_status("Waiting for device boot to reconnect")
-        ctx.info("Waiting for device boot to reconnect")
-        time.sleep(60)
-        ctx.reconnect(max_timeout=3600, force_discovery=True)  # 60 * 60 = 3600
-    else:
-        ctx.info("Keeping console connected")
-        ctx.post_status("Boot process started")
-        ctx.info("Boot process started")
-        if not ctx.reload(reload_timeout=1500, no_reload_cmd=True):
-            ctx.error("Encountered error when attempting to reload device.")
-        ctx.info("Boot process finished")
-
-    ctx.info("Device connected successfully")
-
-    timeout = 3600
-    poll_time = 30
-    time_waited = 0
-    xr_run = "IOS XR RUN"
-
-    cmd = "admin show platform"
-    ctx.info("Waiting for all nodes to come up")
-    ctx.post_status("Waiting for all nodes to come up")
-    time.sleep(100)
-
-    output = None
-
-    while 1:
-        # Wait till all nodes are in XR run state
-        time_waited += poll_time
-        if time_waited >= timeout:
-            break
-
-        time.sleep(poll_time)
-
-        # show platform can take more than 1 minute after router reload. Issue No. 47
-        output = ctx.send(cmd, timeout=600)
-        if xr_run in output:
-            inventory = parse_show_platform(ctx, output)
-            if validate_node_state(inventory):
-                ctx.info("All nodes in operational state")
-                elapsed = time.time() - begin
-                ctx.info("Overall outage time: {} minute(s) {:.0f} second(s)".format(elapsed // 60, elapsed % 60))
-                return True
+    # XR ddts CSCvb67386 workaround - reload is aborted after a confirmation is received from
+    # the router if the session is touched or disconnected too soon (less than 6 seconds)
+    waiter = ReloadWaiter(ctx, all_nodes_up, down_timeout=300, up_timeout=3600, ready_timeout=3600,
+                          console_reload=True, min_delay=10, operation="{} reload".format(ctx.phase))
+    if waiter.wait():
+        return True
 
     # Some nodes did not come to run state
-    ctx.error("Not all nodes have came up: {}".format(output))
+    ctx.error("Not all nodes have came up: {}".format(waiter.output))
     # this will never be executed
     return False
 
 
+@traced("wait")
 def watch_install(ctx, cmd, op_id=0):
     success_oper = r'Install operation (\d+) completed successfully'
     completed_with_failure = r'Install operation (\d+) completed with failure'
@@ -479,9 +393,6 @@ def install_remove_all(ctx, cmd, hostname):
     Error:     - re-issue the command when the current operation has completed.
     """  # noqa: W605
 
-    global plugin_ctx
-    plugin_ctx = ctx
-
     # no op_id is returned from XR for install remove inactive
     # need to figure out the last op_id first
 
@@ -513,7 +424,7 @@ def install_remove_all(ctx, cmd, hostname):
     transitions = [
         (Error1, [0], -1, CommandError("Another install command is currently in operation", hostname), 1800),
         (Error2, [0], -1, CommandError("No packages can be removed", hostname), 1800),
-        (Proceed_removing, [0], 2, send_yes, 1800),
+        (Proceed_removing, [0], 2, partial(send_yes, ctx), 1800),
         (Host_prompt, [2], -1, None, 1800),
     ]
 
@@ -545,7 +456,7 @@ def install_remove_all(ctx, cmd, hostname):
 
             message = ""
             # on CRS, it is observed that during Add, any command typed hangs for a while
-            output = ctx.send(cmd_show_install_request, timeout=300)
+            output = ctx.send(cmd_show_install_request, timeout=300, cache=False)
             if op_id in output:
                 result = re.search(op_progress, output)
                 if result:
@@ -577,75 +488,100 @@ def install_remove_all(ctx, cmd, hostname):
         ctx.error("Remove All Inactive Package(s) failed")
 
 
-def build_satellite_list(satellite_ids):
-    """
-    :param satellite_ids: a string of satellite IDs with comma delimiter and range
-    For example, satellite_ids = '100-102,105,106-109,110,160-164,319-320'
-    :return: a list of satellite IDs in string
+def select_satellites(ctx, ids, satellites, transferred=False):
     """
+    Filter out the satellites which are not ready or already have the new image
 
-    L = []
-    input_list = satellite_ids.split(',')
-    for item in input_list:
-        if '-' in item:
-            m = re.search(r'(\w+)-(\w+)', item)
-            arg1 = int(m.group(1))
-            arg2 = int(m.group(2)) + 1
-            ilist = range(arg1, arg2)
-            slist = []
-            for i in ilist:
-                slist.append(str(i))
-            L = L + slist
+    :param ids: the SatelliteIdSet
+    :param satellites: the satellite status snapshot
+    :param transferred: True to filter out the satellites with the new image transferred
+    :return: the SatelliteIdSet of the selected satellites and False if any satellite is not ready
+    """
+    command_success = True
+    skipped = []
+    for satellite_id in ids:
+        satellite = satellites.get(satellite_id)
+        if satellite is None:
+            ctx.warning("There is no information for Satellite ID {}.".format(satellite_id))
+            command_success = False
+        elif not satellite.connected:
+            ctx.warning("Satellite ID {} Status is not Connected.".format(satellite_id))
+            ctx.warning("{}".format(satellite.text))
+            command_success = False
+        elif transferred and 'New image transferred' in satellite.status:
+            ctx.info("Satellite ID {} Status: {}".format(satellite_id, satellite.status))
+        elif not satellite.new_image_available:
+            ctx.info("Satellite ID {} Remote version: Compatible (latest version)".format(satellite_id))
         else:
-            L.append(item)
+            continue
+        skipped.append(satellite_id)
+    return ids - SatelliteIdSet.from_ids(skipped), command_success
+
+
+def start_satellite_operation(ctx, name, cmd):
+    Warning = re.compile(r"Do you wish to continue\? \[confirm\(y/n\)\]")
+    Host_prompt = re.compile(ctx._connection.hostname)
 
-    return L
+    events = [Host_prompt, Warning]
+    transitions = [
+        (Warning, [0], -1, partial(send_yes, ctx), 30),
+        (Host_prompt, [0], -1, None, 30),
+    ]
+
+    if not ctx.run_fsm(name, cmd, events, transitions, timeout=30):
+        ctx.warning("Failed: {}".format(cmd))
+        return False
+    return True
 
 
-def build_new_argument(L):
+def wait_for_satellites(ctx, name, title, ids, satellites, done, command_success, timeout):
     """
-    :param L: a list of satellite id in string
-    :return: a string of satellite id that includes comma delimiter and range
+    Poll the status of all satellites with a single command until the operation is done for every satellite
+
+    :param name: the operation name, i.e. Satellite-Transfer
+    :param title: the status table title
+    :param ids: the SatelliteIdSet
+    :param satellites: the satellite status snapshot taken before the operation
+    :param done: a callable taking the Satellite and returning True if the operation is done
+    :param command_success: False if some satellites were not ready
+    :param timeout: the default timeout in seconds
+    :return: True if the operation is done for all satellites
     """
+    ctx.info("Waiting for {} to complete".format(name))
+    ctx.post_status("Waiting for {} to complete".format(name))
 
-    LI = [int(x) for x in L]
-    LI.sort()
+    operation = ctx.operation(name, packages=len(ids))
+    timeout = operation.timeout(timeout)
+    poll_time = operation.interval(180, 30, 180)
+    pending = ids
+    begin = time.time()
+    ctx.sleep(3)
 
-    lrange = len(LI) - 1
+    while time.time() - begin < timeout:
+        previous, satellites = satellites, collect_satellite_status(ctx)
+        for satellite_id, old, new in diff_satellite_status(previous, satellites):
+            if satellite_id in pending:
+                ctx.info("Satellite ID {} Status: {}".format(satellite_id, new))
 
-    if lrange == 0:
-        arg = str(LI[0])
-    else:
-        # walk thru the list to construct the new string argument
-        arg = str(LI[0])
-        id = 1
-        nexts = ''
-        while id < lrange:
-            if LI[id - 1] + 1 == LI[id]:
-                if nexts != '-':
-                    nexts = '-'
+        pending -= SatelliteIdSet.from_ids(x for x in pending if x in satellites and done(satellites[x]))
+        if not pending:
+            elapsed = time.time() - begin
+            operation.record(elapsed)
+            ctx.info("{} time: {} minute(s) {:.0f} second(s)".format(name, elapsed // 60, elapsed % 60))
+            if command_success:
+                ctx.info("{} completed for all the satellites".format(name))
+                ctx.post_status("{} completed for all the satellites".format(name))
             else:
-                if nexts == '-':
-                    arg = arg + '-' + str(LI[id - 1]) + ',' + str(LI[id])
-                    nexts = ''
-                else:
-                    arg = arg + ',' + str(LI[id])
-            id += 1
+                ctx.warning("{} completed but some satellites were not ready.".format(name))
+                ctx.post_status("{} completed but some satellites were not ready.".format(name))
+            return True
 
-        id = lrange
-        if LI[id - 1] + 1 == LI[id]:
-            if nexts == '-':
-                arg = arg + '-' + str(LI[id])
-            else:
-                arg = arg + ',' + str(LI[id])
-        else:
-            if nexts == '-':
-                arg = arg + '-' + str(LI[id - 1]) + ',' + str(LI[id])
-                nexts = ''
-            else:
-                arg = arg + ',' + str(LI[id])
+        ctx.post_status(format_satellite_status(title, satellites, pending) + operation.eta(time.time() - begin))
+        ctx.sleep(poll_time)
 
-    return arg
+    # Some operation did not complete
+    ctx.warning("{} did not complete for satellites {}.".format(name, pending))
+    return False
 
 
 def install_satellite_transfer(ctx, satellite_ids):
@@ -706,46 +642,17 @@ def install_satellite_transfer(ctx, satellite_ids):
           Remote ports: TenGigE0/0/0-70
     """
 
-    global plugin_ctx
-    plugin_ctx = ctx
-
     # satellite_ids = '100-102,105,106-109,110,160-164,319-320'
-    L = build_satellite_list(satellite_ids)
-    ctx.info("Checking satellite status: {}".format(','.join(L)))
-
-    # filter invalid cases
-    command_success = True
-    for id in range(len(L)):
-        show_cmd = 'show nv satellite status satellite ' + L[id]
-        output = ctx.send(show_cmd)
-
-        if 'No information for satellite' in output:
-            ctx.warning("There is no information for Satellite ID {}.".format(L[id]))
-            ctx.warning("{}".format(output))
-            L[id] = None
-            command_success = False
-
-        if 'Status: Connected' not in output:
-            ctx.warning("Satellite ID {} Status is not Connected.".format(L[id]))
-            ctx.warning("{}".format(output))
-            L[id] = None
-            command_success = False
-
-        if 'Status: Connected (New image transferred)' in output:
-            ctx.info("Satellite ID {} Status: Connected (New image transferred)".format(L[id]))
-            L[id] = None
-
-        # Replace 'Remote version: Compatible (latest version)' in output with
-        # 'Available' not in output to workaround XR 5.1.3 bug that even when there is a
-        # new satellite software available it will display Compatible (latest version).
-        # if 'Remote version: Compatible (latest version)' in output:
-        if 'Available' not in output:
-            ctx.info("Satellite ID {} Remote version: Compatible (latest version)".format(L[id]))
-            L[id] = None
-
-    L = [x for x in L if x is not None]
+    try:
+        ids = SatelliteIdSet.parse(satellite_ids)
+    except ValueError as e:
+        ctx.warning("{}: {}".format("Satellite-Transfer", e))
+        return False
+    ctx.info("Checking satellite status: {}".format(ids))
+    satellites = collect_satellite_status(ctx)
 
-    if not L:
+    ids, command_success = select_satellites(ctx, ids, satellites, transferred=True)
+    if not ids:
         if command_success:
             ctx.info("Satellite-Transfer: all satellites are up to date. No action is required.")
             return True
@@ -754,99 +661,16 @@ def install_satellite_transfer(ctx, satellite_ids):
             return False
 
     # construct the new argument
-    ctx.info("Satellite-Transfer satellites {}".format(','.join(L)))
-    arg = build_new_argument(L)
+    ctx.info("Satellite-Transfer satellites {}".format(ids))
+    arg = ids.format()
 
     cmd = 'install nv satellite ' + arg + ' transfer'
-    Warning = re.compile(r"Do you wish to continue\? \[confirm\(y/n\)\]")
-    Host_prompt = re.compile(ctx._connection.hostname)
-
-    events = [Host_prompt, Warning]
-    transitions = [
-        (Warning, [0], -1, send_yes, 30),
-        (Host_prompt, [0], -1, None, 30),
-    ]
-
-    if not ctx.run_fsm("Satellite-Transfer ", cmd, events, transitions, timeout=30):
-        ctx.warning("Failed: {}".format(cmd))
+    if not start_satellite_operation(ctx, "Satellite-Transfer ", cmd):
         return False
 
-    ctx.info("Waiting for Satellite-Transfer to complete")
-    ctx.post_status("Waiting for Satellite-Transfer to complete")
-
-    timeout = 3600
-    poll_time = 180
-    time_waited = 3
-    begin = time.time()
-    time.sleep(time_waited)
-
-    header = "Transferring Satellite Image <br>" + \
-             "<pre>" + \
-             "Sat-ID  Type       Status\n" + \
-             "------  --------   ----------------\n"
-
-    while 1:
-        # Waiting for transfer to complete for all satellites
-        if time_waited >= timeout:
-            break
-
-        status = header
-        show_cmd = 'show nv satellite status brief'
-        output = ctx.send(show_cmd)
-        lines = output.split('\n')
-        lines = [x for x in lines if x]
-
-        for line in lines:
-
-            if not line[0].isdigit():
-                continue
-
-            sl = line.split()
-            elements = len(sl)
-            if elements > 5:
-                i = 5
-                while i < elements:
-                    sl[4] = sl[4] + ' ' + sl[i]
-                    i += 1
-
-            for id in range(len(L)):
-                if L[id] == sl[0]:
-                    if 'Transferred' in sl[4]:
-                        L[id] = None
-                    else:
-                        length = len(sl[0])
-                        space = 8 - length
-                        sat_id = sl[0] + ' ' * space
-                        length = len(sl[1])
-                        space = 11 - length
-                        type = sl[1] + ' ' * space
-                        status = status + sat_id + type + sl[4] + '\n'
-
-                    break
-
-        L = [x for x in L if x is not None]
-
-        if not L:
-            elapsed = time.time() - begin
-            ctx.info("Satellite-Transfer time: {} minute(s) {:.0f} "
-                     "second(s)".format(elapsed // 60, elapsed % 60))
-            if command_success:
-                ctx.info("Satellite-Transfer completed for all the satellites")
-                ctx.post_status("Satellite-Transfer completed for all the satellites")
-                return True
-            else:
-                ctx.warning("Satellite-Transfer completed but some satellites were not ready.")
-                ctx.post_status("Satellite-Transfer completed but some satellites were not ready.")
-                return True
-        else:
-            status += "</pre>"
-            ctx.post_status(status)
-            time_waited += poll_time
-            time.sleep(poll_time)
-
-    # Some transfer did not ccomplete
-    ctx.warning("Satellite-Transfer did not complete for satellites {}.:".format(','.join(L)))
-    return False
+    return wait_for_satellites(ctx, "Satellite-Transfer", "Transferring Satellite Image", ids, satellites,
+                               lambda satellite: 'transferred' in satellite.status.lower(),
+                               command_success, timeout=3600)
 
 
 def install_satellite_activate(ctx, satellite_ids):
@@ -925,42 +749,17 @@ def install_satellite_activate(ctx, satellite_ids):
           Remote ports: TenGigE0/0/0-70
     """
 
-    global plugin_ctx
-    plugin_ctx = ctx
-
     # satellite_ids = '100-102,105,106-109,110,160-164,319-320'
-    L = build_satellite_list(satellite_ids)
-    ctx.info("Checking satellite status: {}".format(','.join(L)))
-
-    # filter invalid cases
-    command_success = True
-    for id in range(len(L)):
-        show_cmd = 'show nv satellite status satellite ' + L[id]
-        output = ctx.send(show_cmd)
-
-        if 'No information for satellite' in output:
-            ctx.warning("There is no information for Satellite ID {}.".format(L[id]))
-            ctx.warning("{}".format(output))
-            L[id] = None
-            command_success = False
-
-        if 'Status: Connected' not in output:
-            ctx.warning("Satellite ID {} Status is not Connected.".format(L[id]))
-            ctx.warning("{}".format(output))
-            L[id] = None
-            command_success = False
-
-        # Replace 'Remote version: Compatible (latest version)' in output with
-        # 'Available' not in output to workaround XR 5.1.3 bug that even when there is a
-        # new satellite software available it will display Compatible (latest version).
-        # if 'Remote version: Compatible (latest version)' in output:
-        if 'Available' not in output:
-            ctx.info("Satellite ID {} Remote version: Compatible (latest version)".format(L[id]))
-            L[id] = None
-
-    L = [x for x in L if x is not None]
+    try:
+        ids = SatelliteIdSet.parse(satellite_ids)
+    except ValueError as e:
+        ctx.warning("{}: {}".format("Satellite-Activate", e))
+        return False
+    ctx.info("Checking satellite status: {}".format(ids))
+    satellites = collect_satellite_status(ctx)
 
-    if not L:
+    ids, command_success = select_satellites(ctx, ids, satellites)
+    if not ids:
         if command_success:
             ctx.info("Satellite-Activate: all satellites are up to date. No action is required.")
             return True
@@ -969,99 +768,16 @@ def install_satellite_activate(ctx, satellite_ids):
             return False
 
     # construct the new argument
-    ctx.info("Satellite-Activate satellites {}".format(','.join(L)))
-    arg = build_new_argument(L)
+    ctx.info("Satellite-Activate satellites {}".format(ids))
+    arg = ids.format()
 
     cmd = 'install nv satellite ' + arg + ' activate'
-    Warning = re.compile(r"Do you wish to continue\? \[confirm\(y/n\)\]")
-    Host_prompt = re.compile(ctx._connection.hostname)
-
-    events = [Host_prompt, Warning]
-    transitions = [
-        (Warning, [0], -1, send_yes, 30),
-        (Host_prompt, [0], -1, None, 30),
-    ]
-
-    if not ctx.run_fsm("Satellite-Activate", cmd, events, transitions, timeout=30):
-        ctx.warning("Failed: {}".format(cmd))
+    if not start_satellite_operation(ctx, "Satellite-Activate", cmd):
         return False
 
-    ctx.info("Waiting for Satellite-Activate to complete")
-    ctx.post_status("Waiting for Satellite-Activate to complete")
-
-    timeout = 5400
-    poll_time = 180
-    time_waited = 3
-    begin = time.time()
-    time.sleep(time_waited)
-
-    header = "Activating Satellite Image <br>" + \
-             "<pre>" + \
-             "Sat-ID  Type       Status\n" + \
-             "------  --------   ----------------\n"
-
-    while 1:
-        # Waiting for transfer to complete for all satellites
-        if time_waited >= timeout:
-            break
-
-        status = header
-        show_cmd = 'show nv satellite status brief'
-        output = ctx.send(show_cmd)
-        lines = output.split('\n')
-        lines = [x for x in lines if x]
-
-        for line in lines:
-
-            if not line[0].isdigit():
-                continue
-
-            sl = line.split()
-            elements = len(sl)
-            if elements > 5:
-                i = 5
-                while i < elements:
-                    sl[4] = sl[4] + ' ' + sl[i]
-                    i += 1
-
-            for id in range(len(L)):
-                if L[id] == sl[0]:
-                    if sl[4] == 'Connected' or sl[4] == 'Connected (Act)' or sl[4] == 'Connected (Stby)':
-                        L[id] = None
-                    else:
-                        length = len(sl[0])
-                        space = 8 - length
-                        sat_id = sl[0] + ' ' * space
-                        length = len(sl[1])
-                        space = 11 - length
-                        type = sl[1] + ' ' * space
-                        status = status + sat_id + type + sl[4] + '\n'
-
-                    break
-
-        L = [x for x in L if x is not None]
-
-        if not L:
-            elapsed = time.time() - begin
-            ctx.info("Satellite-Activate time: {} minute(s) {:.0f} "
-                     "second(s)".format(elapsed // 60, elapsed % 60))
-            if command_success:
-                ctx.info("Satellite-Activate completed for all the satellites")
-                ctx.post_status("Satellite-Activate completed for all the satellites")
-                return True
-            else:
-                ctx.warning("Satellite-Activate completed but some satellites were not ready.")
-                ctx.post_status("Satellite-Activate completed but some satellites were not ready.")
-                return True
-        else:
-            status += "</pre>"
-            ctx.post_status(status)
-            time_waited += poll_time
-            time.sleep(poll_time)
-
-    # Some transfer did not ccomplete
-    ctx.warning("Satellite-Activate did not complete for satellites {}.".format(','.join(L)))
-    return False
+    return wait_for_satellites(ctx, "Satellite-Activate", "Activating Satellite Image", ids, satellites,
+                               lambda satellite: satellite.connected and not satellite.new_image_available,
+                               command_success, timeout=5400)
 
 
 def parse_pkg_list(output):
@@ -124,8 +124,11 @@ class Plugin(CSMPlugin):
 
     def _reload_all(self):
         """Reload all nodes to boot eXR image."""
+        operation = self.ctx.operation("Migrate reload")
+        timeout = operation.timeout(MIGRATION_TIME_OUT)
+        begin = time.time()
         if self.ctx.is_console:
-            if not self.ctx.reload(reload_timeout=MIGRATION_TIME_OUT):
+            if not self.ctx.reload(reload_timeout=timeout):
                 self.ctx.error("Encountered error when attempting to reload device.")
         else:
             def send_newline(fsm_ctx):
@@ -149,11 +152,12 @@ class Plugin(CSMPlugin):
             # wait a little bit before disconnect so that newline character can reach the router
             time.sleep(5)
             self.ctx.disconnect()
-            self.ctx.post_status("Waiting for device boot to reconnect")
+            self.ctx.post_status("Waiting for device boot to reconnect" + operation.eta(time.time() - begin))
             self.ctx.info("Waiting for device boot to reconnect")
             time.sleep(300)
-            self.ctx.reconnect(max_timeout=MIGRATION_TIME_OUT, force_discovery=True)  # 60 * 60 = 3600
+            self.ctx.reconnect(max_timeout=timeout, force_discovery=True)  # 60 * 60 = 3600
 
+        operation.record(time.time() - begin)
         return check_exr_final_band(self.ctx)
 
     def run(self):
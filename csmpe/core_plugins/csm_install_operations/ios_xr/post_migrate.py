@@ -90,7 +90,7 @@ class Plugin(CSMPlugin):
             if time_waited >= timeout:
                 break
             time.sleep(poll_time)
-            output = self.ctx.send("show hw-module fpd")
+            output = self.ctx.send("show hw-module fpd", cache=False)
             num_need_reload = len(re.findall("RLOAD REQ", output))
             if len(re.findall("CURRENT|UPGD SKIP", output)) + num_need_reload >= num_fpds:
                 if num_need_reload > 0:
@@ -101,7 +101,7 @@ class Plugin(CSMPlugin):
                 self.ctx.send("exit")
                 return True
 
-        output = self.ctx.send("show hw-module fpd")
+        output = self.ctx.send("show hw-module fpd", cache=False)
         if len(re.findall(r"\d+% UPGD|IN QUEUE|NEED UPGD", output)) == 0:
             if len(re.findall("RLOAD REQ", output)) > 0:
                 log_and_post_status(self.ctx, "Reloading device to complete the upgrade.")
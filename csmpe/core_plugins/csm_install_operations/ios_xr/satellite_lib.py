@@ -0,0 +1,314 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import re
+from bisect import bisect_right
+
+"""
+The output of 'show nv satellite status' lists every configured satellite:
+
+Satellite 161
+-------------
+  Status: Connected (Transferring new image)
+  Redundancy: Active (Group: 100)
+  Type: ncs5002
+  ...
+  Remote version: Compatible (older version)
+    ...
+    XR: 6.2.25.03I (Available: 6.2.25.05I)
+  ...
+  Configured satellite fabric links:
+    HundredGigE0/18/0/5
+    -------------------
+      Status: Satellite Ready
+      Remote ports: TenGigE0/0/0-70
+
+Satellite 162
+-------------
+  ...
+"""
+
+SATELLITE_STATUS_COMMAND = "show nv satellite status"
+
+_SATELLITE_RE = re.compile(r"^Satellite (\d+)\s*$")
+# the satellite attributes are indented by two spaces, the fabric link attributes are indented deeper
+_FIELD_RE = re.compile(r"^  (\S[^:]*):\s*(.*?)\s*$")
+
+
+class SatelliteIdSet(object):
+    """
+    The set of satellite IDs stored as the sorted list of the disjoint inclusive (first, last) ranges
+
+    The set operations merge the range lists in linear time, so the thousands of IDs given
+    in the CLI range syntax, i.e. '100-102,105,106-109', are never expanded.
+    """
+    def __init__(self, ranges=()):
+        """
+        :param ranges: an iterable of (first, last) tuples in any order, may overlap
+        """
+        self._ranges = self._normalize(ranges)
+
+    @staticmethod
+    def _normalize(ranges):
+        ranges = list(ranges)
+        if any(ranges[i] > ranges[i + 1] for i in range(len(ranges) - 1)):
+            ranges.sort()
+        merged = []
+        for first, last in ranges:
+            if first > last:
+                raise ValueError("Invalid satellite ID range: {}-{}".format(first, last))
+            if merged and first <= merged[-1][1] + 1:
+                if last > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], last)
+            else:
+                merged.append((first, last))
+        return merged
+
+    @classmethod
+    def _from_normalized(cls, ranges):
+        result = cls()
+        result._ranges = ranges
+        return result
+
+    @classmethod
+    def parse(cls, text):
+        """
+        :param text: satellite IDs with comma delimiter and range, i.e. '100-102,105,106-109'
+        :return: the SatelliteIdSet
+        """
+        ranges = []
+        for item in str(text).split(','):
+            item = item.strip()
+            if not item:
+                continue
+            first, separator, last = item.partition('-')
+            try:
+                ranges.append((int(first), int(last) if separator else int(first)))
+            except ValueError:
+                raise ValueError("Invalid satellite ID: {}".format(item))
+        return cls(ranges)
+
+    @classmethod
+    def from_ids(cls, ids):
+        """
+        :param ids: an iterable of satellite IDs in int or string
+        :return: the SatelliteIdSet
+        """
+        return cls((int(x), int(x)) for x in ids)
+
+    @property
+    def ranges(self):
+        return list(self._ranges)
+
+    def __iter__(self):
+        for first, last in self._ranges:
+            for satellite_id in xrange(first, last + 1):
+                yield satellite_id
+
+    def __len__(self):
+        return sum(last - first + 1 for first, last in self._ranges)
+
+    def __nonzero__(self):
+        return bool(self._ranges)
+
+    def __contains__(self, satellite_id):
+        index = bisect_right(self._ranges, (satellite_id, float('inf'))) - 1
+        return index >= 0 and self._ranges[index][1] >= satellite_id
+
+    def __eq__(self, other):
+        return isinstance(other, SatelliteIdSet) and self._ranges == other._ranges
+
+    def __ne__(self, other):
+        return not self == other
+
+    def union(self, other):
+        merged = []
+        i = j = 0
+        a, b = self._ranges, other._ranges
+        while i < len(a) or j < len(b):
+            if j == len(b) or (i < len(a) and a[i] < b[j]):
+                first, last = a[i]
+                i += 1
+            else:
+                first, last = b[j]
+                j += 1
+            if merged and first <= merged[-1][1] + 1:
+                if last > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], last)
+            else:
+                merged.append((first, last))
+        return self._from_normalized(merged)
+
+    def intersection(self, other):
+        result = []
+        i = j = 0
+        a, b = self._ranges, other._ranges
+        while i < len(a) and j < len(b):
+            first = max(a[i][0], b[j][0])
+            last = min(a[i][1], b[j][1])
+            if first <= last:
+                result.append((first, last))
+            if a[i][1] < b[j][1]:
+                i += 1
+            else:
+                j += 1
+        return self._from_normalized(result)
+
+    def difference(self, other):
+        result = []
+        j = 0
+        b = other._ranges
+        for first, last in self._ranges:
+            # skip the ranges ending before this range
+            while j < len(b) and b[j][1] < first:
+                j += 1
+            k = j
+            while k < len(b) and b[k][0] <= last:
+                if b[k][0] > first:
+                    result.append((first, b[k][0] - 1))
+                first = max(first, b[k][1] + 1)
+                if b[k][1] > last:
+                    break
+                k += 1
+            if first <= last:
+                result.append((first, last))
+            j = k
+        return self._from_normalized(result)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def format(self):
+        """
+        :return: the satellite IDs in the CLI syntax, i.e. '100-102,105-110'
+        """
+        return ','.join(str(first) if first == last else "{}-{}".format(first, last)
+                        for first, last in self._ranges)
+
+    __str__ = format
+
+    def __repr__(self):
+        return "SatelliteIdSet('{}')".format(self.format())
+
+
+class Satellite(object):
+    """The satellite block of the 'show nv satellite status' output."""
+    def __init__(self, satellite_id):
+        self.id = satellite_id
+        self.fields = {}
+        self.lines = []
+
+    @property
+    def status(self):
+        return self.fields.get('Status', '')
+
+    @property
+    def type(self):
+        return self.fields.get('Type', '')
+
+    @property
+    def connected(self):
+        return self.status.startswith('Connected')
+
+    @property
+    def new_image_available(self):
+        # 'Available' is checked instead of 'Remote version: Compatible (latest version)' to workaround
+        # XR 5.1.3 bug that even when there is a new satellite software available it will display
+        # Compatible (latest version).
+        return 'Available' in self.text
+
+    @property
+    def text(self):
+        return "\n".join(self.lines)
+
+    def __repr__(self):
+        return "Satellite({}, {!r})".format(self.id, self.status)
+
+
+def parse_satellite_status(output):
+    """
+    :param output: the output of 'show nv satellite status'
+    :return: a dictionary of Satellite objects indexed by the satellite ID in int
+    """
+    satellites = {}
+    satellite = None
+    for line in output.splitlines():
+        match = _SATELLITE_RE.match(line)
+        if match:
+            satellite = Satellite(int(match.group(1)))
+            satellites[satellite.id] = satellite
+        if satellite is None:
+            continue
+        satellite.lines.append(line)
+        match = _FIELD_RE.match(line)
+        if match:
+            satellite.fields.setdefault(match.group(1), match.group(2))
+    return satellites
+
+
+def collect_satellite_status(ctx):
+    """
+    Collect the status of all satellites with a single command
+
+    :param ctx: the plugin context
+    :return: a dictionary of Satellite objects indexed by the satellite ID in int
+    """
+    return parse_satellite_status(ctx.send(SATELLITE_STATUS_COMMAND, timeout=600, cache=False))
+
+
+def diff_satellite_status(previous, current):
+    """
+    :param previous: the previous satellite status snapshot
+    :param current: the current satellite status snapshot
+    :return: a list of (satellite ID, previous status, current status) tuples sorted by the satellite ID
+        for the satellites which status has changed. The status of the missing satellite is None.
+    """
+    changes = []
+    for satellite_id in sorted(set(previous) | set(current)):
+        old = previous[satellite_id].status if satellite_id in previous else None
+        new = current[satellite_id].status if satellite_id in current else None
+        if old != new:
+            changes.append((satellite_id, old, new))
+    return changes
+
+
+def format_satellite_status(title, satellites, satellite_ids):
+    """
+    :param title: the status table title
+    :param satellites: the satellite status snapshot
+    :param satellite_ids: the satellite IDs in the table
+    :return: the status table for the CSM post_status
+    """
+    rows = ["{} <br><pre>Sat-ID  Type       Status".format(title),
+            "------  --------   ----------------"]
+    for satellite_id in sorted(satellite_ids):
+        satellite = satellites.get(satellite_id)
+        if satellite is None:
+            rows.append("{:<8}{:<11}{}".format(satellite_id, "", "No information"))
+        else:
+            rows.append("{:<8}{:<11}{}".format(satellite_id, satellite.type, satellite.status))
+    return "\n".join(rows) + "\n</pre>"
@@ -0,0 +1,225 @@
+# =============================================================================
+# Reload waiter
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import socket
+import time
+from urlparse import urlparse
+
+from condoor import ConnectionError, CommandError
+
+DEFAULT_PORTS = {'telnet': 23, 'ssh': 22}
+
+
+def endpoint(url):
+    """Return the (host, port) tuple of the device url or None if unknown."""
+    parsed = urlparse(url)
+    try:
+        port = parsed.port or DEFAULT_PORTS.get(parsed.scheme)
+    except ValueError:
+        return None
+    if not parsed.hostname or not port:
+        return None
+    return parsed.hostname, port
+
+
+def reachable(address, timeout=5):
+    """Return True if the TCP connection to the (host, port) address can be established."""
+    try:
+        sock = socket.create_connection(address, timeout)
+    except (socket.error, socket.timeout):
+        return False
+    sock.close()
+    return True
+
+
+def backoff(initial, factor, maximum):
+    """Generate the exponentially growing intervals."""
+    interval = initial
+    while True:
+        yield interval
+        interval = min(maximum, interval * factor)
+
+
+class ReloadWaiter(object):
+    """Waits for the device reload to finish without the fixed sleeps.
+
+    The session stays open until the device drops it, so the reload is detected as soon as the device
+    goes down. The device vty endpoint is probed with the TCP connection attempts in the growing
+    intervals and the session reconnects as soon as the device answers. The endpoint is probed only if
+    the device is connected directly over vty, otherwise the reconnect itself retries until the device
+    is reachable. Finally the check is called in the growing intervals until the device is ready.
+
+    :param ctx: The plugin context.
+    :param check: The callable taking the plugin context and returning the tuple: True if the device
+        is ready and the command output.
+    :param down_timeout: The maximum time in seconds the device is given to go down after the reload
+        was requested.
+    :param up_timeout: The maximum time in seconds the device is given to become reachable.
+    :param ready_timeout: The maximum time in seconds the device is given to be ready after reconnect.
+    :param console_reload: If True and the device is connected over console the session is kept
+        and the boot process is followed on the console.
+    :param initial: The initial probe interval in seconds.
+    :param factor: The probe interval multiplier.
+    :param max_interval: The maximum probe interval in seconds.
+    :param min_delay: The time in seconds the session is kept untouched after the reload was requested,
+        before it is probed or disconnected for the first time.
+    :param operation: The operation type, i.e. "Activate reload". If provided the overall outage time is
+        recorded and the durations recorded on the devices of the same platform are used to extend
+        the timeouts, to choose the initial probe interval and to report the ETA.
+    """
+    def __init__(self, ctx, check, down_timeout=600, up_timeout=3600, ready_timeout=3600, console_reload=False,
+                 initial=5, factor=1.5, max_interval=60, min_delay=0, operation=None):
+        self.operation = ctx.operation(operation) if operation else None
+        if self.operation is not None:
+            up_timeout = self.operation.timeout(up_timeout)
+            ready_timeout = self.operation.timeout(ready_timeout)
+            initial = self.operation.interval(initial, initial, max_interval, fraction=0.05)
+        self.ctx = ctx
+        self.check = check
+        self.down_timeout = down_timeout
+        self.up_timeout = up_timeout
+        self.ready_timeout = ready_timeout
+        self.console_reload = console_reload
+        self.initial = initial
+        self.factor = factor
+        self.max_interval = max_interval
+        self.min_delay = min_delay
+        self.clock = time.time
+        self.output = None
+        # the seconds since the reload was requested
+        self.report = {}
+        self._begin = None
+
+    @property
+    def eta(self):
+        if self.operation is None:
+            return ""
+        return self.operation.eta(self.clock() - self._begin)
+
+    def _mark(self, name):
+        self.report[name] = self.clock() - self._begin
+
+    def _intervals(self, timeout):
+        """Generate the probe intervals until the timeout expires."""
+        deadline = self.clock() + timeout
+        for interval in backoff(self.initial, self.factor, self.max_interval):
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                return
+            yield min(interval, remaining)
+
+    @property
+    def endpoint(self):
+        """The (host, port) tuple of the device vty or None if the device is not connected directly."""
+        urls = getattr(self.ctx._csm, "host_urls", None)
+        if not urls or len(urls) != 1 or self.ctx.is_console:
+            return None
+        return endpoint(urls[0])
+
+    def wait_down(self):
+        """Keep the session open until the device drops it. Returns True if the drop was detected."""
+        if self.min_delay:
+            self.ctx.sleep(self.min_delay)
+        for interval in self._intervals(self.down_timeout):
+            self.ctx.sleep(interval)
+            try:
+                self.ctx.send("", timeout=30)
+            except (ConnectionError, CommandError):
+                self._mark('down')
+                return True
+        return False
+
+    def wait_reachable(self):
+        """Probe the device endpoint until it accepts the TCP connection.
+        Returns True if the device is reachable."""
+        address = self.endpoint
+        if address is None:
+            return True
+        for interval in self._intervals(self.up_timeout):
+            if reachable(address):
+                self._mark('reachable')
+                return True
+            self.ctx.sleep(interval)
+        return False
+
+    def wait_ready(self):
+        """Call the check until the device is ready. Returns True if ready."""
+        for interval in self._intervals(self.ready_timeout):
+            ready, self.output = self.check(self.ctx)
+            if ready:
+                self._mark('ready')
+                return True
+            self.ctx.sleep(interval)
+        return False
+
+    def wait(self):
+        """Wait for the device to reload and report the outage. Returns True if the device is ready."""
+        self._begin = self.clock()
+        self.report = {}
+        if self.console_reload and self.ctx.is_console:
+            self.ctx.info("Keeping console connected")
+            self.ctx.post_status("Boot process started")
+            self.ctx.info("Boot process started")
+            if not self.ctx.reload(reload_timeout=1500, no_reload_cmd=True):
+                self.ctx.error("Encountered error when attempting to reload device.")
+            self.ctx.info("Boot process finished")
+        else:
+            self.ctx.post_status("Waiting for device to go down")
+            if not self.wait_down():
+                self.ctx.warning("The session was not dropped within {} seconds".format(self.down_timeout))
+            self.ctx.disconnect()
+            self.ctx.post_status("Waiting for device boot to reconnect" + self.eta)
+            self.ctx.info("Waiting for device boot to reconnect")
+            if not self.wait_reachable():
+                self.ctx.warning("The device is not reachable after {} seconds".format(self.up_timeout))
+            self.ctx.reconnect(max_timeout=self.up_timeout, force_discovery=True)
+        self._mark('connected')
+        self.ctx.info("Device connected successfully")
+
+        self.ctx.info("Waiting for all nodes to come up")
+        self.ctx.post_status("Waiting for all nodes to come up" + self.eta)
+        if not self.wait_ready():
+            return False
+
+        self.ctx.info("All nodes in desired state")
+        self.report_outage()
+        if self.operation is not None:
+            self.operation.record(self.report['ready'])
+        return True
+
+    def report_outage(self):
+        report = self.report
+        stages = [(name, report[name]) for name in ('down', 'reachable', 'connected', 'ready') if name in report]
+        self.ctx.info("Reload timeline: {}".format(", ".join(
+            "{} after {:.0f} second(s)".format(name, elapsed) for name, elapsed in stages)))
+        if 'down' in report:
+            outage = report['ready'] - report['down']
+            self.ctx.info("Device outage time: {:.0f} minute(s) {:.0f} second(s)".format(outage // 60, outage % 60))
+        elapsed = report['ready']
+        self.ctx.info("Overall outage time: {:.0f} minute(s) {:.0f} second(s)".format(elapsed // 60, elapsed % 60))
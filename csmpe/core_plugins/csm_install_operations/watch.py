@@ -0,0 +1,188 @@
+# =============================================================================
+# Install operation watcher
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import itertools
+import re
+import time
+
+from condoor import ConnectionError, CommandError
+
+
+class InstallWatcher(object):
+    """Watches the install operation running in the background until it ends.
+
+    The device prints the asynchronous syslog message, i.e. "Install operation 3 finished successfully",
+    when the operation ends. The watcher waits for this message and sends the status command only when
+    the message does not arrive within the poll interval. The interval starts short, so the short
+    operations are reported in seconds, and grows with the estimated remaining time of the operation,
+    so the long operations are polled rarely.
+
+    :param ctx: The plugin context.
+    :param op_id: The install operation id.
+    :param status_cmd: The command reporting the operation in progress, i.e. "show install request".
+    :param idle: The regular expression matching the status output when no operation is in progress.
+    :param progress: The list of the regular expressions matching the progress in the status output.
+        The first group of the first pattern is the completion percentage.
+    :param completed: The regular expression matching the syslog message of the ended operation.
+        Default matches "Install operation <op_id> completed/finished/failed/aborted".
+    :param min_interval: The minimum time in seconds the syslog message is waited for between the polls.
+    :param max_interval: The maximum time in seconds between the polls.
+    :param backoff: The interval multiplier used when the operation progress does not change.
+    :param retries: The number of the reconnect attempts when the device stops responding.
+    :param reconnect: The keyword arguments of the reconnect, i.e. dict(force_discovery=True).
+    :param on_progress: The callable taking the percentage (or None) and the progress message.
+        Default posts the message to CSM.
+    :param on_complete: The callable taking the end reason: 'syslog' or 'idle'.
+    :param operation: The operation type, i.e. "Activate". If provided the duration of the operation
+        is recorded and the durations recorded on the devices of the same platform are used to choose
+        the first poll interval and to report the ETA.
+    """
+    def __init__(self, ctx, op_id, status_cmd, idle, progress=(), completed=None,
+                 min_interval=10, max_interval=300, backoff=2, retries=3, reconnect=None,
+                 on_progress=None, on_complete=None, operation=None):
+        self.ctx = ctx
+        self.op_id = str(op_id)
+        self.status_cmd = status_cmd
+        self.idle_re = re.compile(idle)
+        self.progress_re = [re.compile(pattern) for pattern in progress]
+        if completed is None:
+            completed = r"Install operation {} (completed|finished|failed|aborted)".format(self.op_id)
+        self.completed_re = re.compile(completed)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.retries = retries
+        self.reconnect = reconnect or {}
+        self.on_progress = on_progress or self._post_progress
+        self.on_complete = on_complete
+        self.operation = ctx.operation(operation) if operation else None
+        self.polls = 0
+        self.elapsed = 0
+        self.percent = None
+        self.message = None
+        self._propeller = itertools.cycle(["|", "/", "-", "\\", "|", "/", "-", "\\"])
+        self._begin = None
+
+    def _post_progress(self, percent, message):
+        if self.operation is not None:
+            message += self.operation.eta(time.time() - self._begin)
+        self.ctx.post_status("{} {}".format(self._propeller.next(), message))
+
+    def next_interval(self, interval, percent, elapsed):
+        """Return the time to wait for the syslog message before the next poll.
+
+        :param interval: The last interval.
+        :param percent: The completion percentage reported by the last poll or None.
+        :param elapsed: The time in seconds since the operation watch started.
+        """
+        if percent is None or self.percent is None or percent <= self.percent or elapsed <= 0:
+            interval *= self.backoff
+        else:
+            # the half of the remaining time estimated from the average progress rate
+            interval = (100 - percent) * elapsed / percent / 2.0
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def listen(self, timeout):
+        """Wait for the syslog message reporting the operation end. Returns True if received."""
+        try:
+            self.ctx.send("", wait_for_string=self.completed_re, timeout=timeout)
+            return True
+        except self.ctx.CommandTimeoutError:
+            return False
+
+    def poll(self):
+        """Send the status command and report the progress. Returns the command output."""
+        self.polls += 1
+        try:
+            output = self.ctx.send(self.status_cmd, timeout=300, cache=False)
+        except CommandError as e:
+            if isinstance(e, self.ctx.CommandTimeoutError):
+                raise
+            self.ctx.info("{} received an error".format(self.status_cmd))
+            self.ctx.sleep(10)
+            output = self.ctx.send(self.status_cmd, timeout=300, cache=False)
+
+        if output and self.op_id in output:
+            statuses = [match.group(0) for match in (pattern.search(output) for pattern in self.progress_re)
+                        if match]
+            percent = None
+            if self.progress_re:
+                match = self.progress_re[0].search(output)
+                if match and match.groups():
+                    percent = int(match.group(1))
+            message = "\r\n<br>".join(statuses)
+            if message and message != self.message:
+                self.on_progress(percent, message)
+                self.message = message
+            return output, percent
+        return output, None
+
+    def watch(self):
+        """Watch the operation until it ends. Returns the last status command output."""
+        self.ctx.info("Watching the operation {} to complete".format(self.op_id))
+        begin = self._begin = time.time()
+        interval = self.min_interval
+        if self.operation is not None:
+            interval = self.operation.interval(interval, self.min_interval, self.max_interval, fraction=0.25)
+        output = None
+        reason = None
+        time_tried = 0
+        with self.ctx.trace("install operation {}".format(self.op_id), "wait") as args:
+            while reason is None:
+                try:
+                    if self.listen(interval):
+                        reason = 'syslog'
+                        break
+                    output, percent = self.poll()
+                    if output is not None and self.completed_re.search(output):
+                        reason = 'syslog'
+                    elif output is not None and self.idle_re.search(output):
+                        reason = 'idle'
+                    interval = self.next_interval(interval, percent, time.time() - begin)
+                    if percent is not None:
+                        self.percent = percent
+                except (ConnectionError, self.ctx.CommandTimeoutError) as e:
+                    if time_tried >= self.retries:
+                        raise e
+                    time_tried += 1
+                    self.ctx.disconnect()
+                    self.ctx.sleep(60)
+                    self.ctx.reconnect(**self.reconnect)
+            self.elapsed = time.time() - begin
+            args['polls'] = self.polls
+            args['reason'] = reason
+
+        self.ctx.info("Operation {} ended ({}) after {:.0f} second(s) and {} status poll(s)".format(
+            self.op_id, "syslog message" if reason == 'syslog' else "no operation in progress",
+            self.elapsed, self.polls))
+        if self.operation is not None:
+            self.operation.record(self.elapsed)
+        if self.on_complete is not None:
+            self.on_complete(reason)
+        return output
@@ -35,6 +35,7 @@ class Plugin(CSMPlugin):
                  'NCS5500', 'NCS6K', 'IOSXRv-9K', 'IOSXRv-X64'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
     os = {'eXR'}
+    readonly = True
 
     def run(self):
         # show platform can take more than 1 minute after router reload. Issue No. 47
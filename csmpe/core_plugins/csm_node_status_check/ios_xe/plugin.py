@@ -34,6 +34,7 @@ class Plugin(CSMPlugin):
     platforms = {'ASR900', 'ASR1K'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
     os = {'XE'}
+    readonly = True
 
     def run(self):
         # show platform can take more than 1 minute after router reload. Issue No. 47
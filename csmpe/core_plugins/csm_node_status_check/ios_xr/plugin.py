@@ -34,6 +34,7 @@ class Plugin(CSMPlugin):
     platforms = {'ASR9K', 'XR12K', 'CRS'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
     os = {'XR'}
+    readonly = True
 
     def run(self):
         # show platform can take more than 1 minute after router reload. Issue No. 47
@@ -38,6 +38,7 @@ class Plugin(CSMPlugin):
     name = "Node Redundancy Check Plugin"
     platforms = {'ASR900', 'ASR1K'}
     phases = {'Pre-Upgrade', 'Post-Upgrade'}
+    readonly = True
 
     def run(self):
         """
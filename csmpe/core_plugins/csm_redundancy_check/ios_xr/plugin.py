@@ -37,6 +37,7 @@ class Plugin(CSMPlugin):
     name = "Node Redundancy Check Plugin"
     platforms = {'ASR9K', 'XR12K', 'CRS'}
     phases = {'Pre-Upgrade', 'Pre-Activate'}
+    readonly = True
 
     def run(self):
         """
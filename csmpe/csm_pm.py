@@ -27,12 +27,19 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
 
+import itertools
+import sys
+import threading
+from Queue import Queue, Empty
+
 import pkginfo
-from stevedore.dispatch import DispatchExtensionManager
+import pkg_resources
+from stevedore.dispatch import NameDispatchExtensionManager
 from stevedore.exception import NoMatches
 
 
 from context import PluginContext
+from manifest import PluginManifest, extract_plugin_metadata
 
 install_phases = ['Pre-Upgrade', 'Pre-Add', 'Add', 'Pre-Activate', 'Activate', 'Pre-Deactivate', 'Deactivate',
                   'Rollback', 'Pre-Remove', 'Remove', 'Remove All Inactive', 'Commit', 'Get-Inventory',
@@ -40,6 +47,22 @@ install_phases = ['Pre-Upgrade', 'Pre-Add', 'Add', 'Pre-Activate', 'Activate', '
 
 auto_pre_phases = ["Add", "Activate", "Deactivate"]
 
+# The dispatch index key for the family or os type not listed by any plugin
+_OTHER = "*"
+
+
+class _NamedDispatchExtensionManager(NameDispatchExtensionManager):
+    """Dispatch extension manager importing only the entry points listed in names."""
+    def __init__(self, names, *args, **kwargs):
+        self._names = set(names)
+        super(_NamedDispatchExtensionManager, self).__init__(*args, **kwargs)
+
+    def _load_one_plugin(self, ep, *args, **kwargs):
+        # Check the name before loading to avoid importing the plugin module at all
+        if ep.name not in self._names:
+            return None
+        return super(_NamedDispatchExtensionManager, self)._load_one_plugin(ep, *args, **kwargs)
+
 
 class CSMPluginManager(object):
 
@@ -59,70 +82,360 @@ class CSMPluginManager(object):
         self._phase = None
         self._name = None
 
+        self._manifest = PluginManifest("csm.plugin")
+        self._entries = {}
+        self._index = {}
+
+        self._max_sessions = 0
+        self._sessions = []
+
         self.load(invoke_on_load=invoke_on_load)
 
     def load(self, invoke_on_load=True):
-        self._manager = DispatchExtensionManager(
-            "csm.plugin",
-            self._check_plugin,
-            invoke_on_load=invoke_on_load,
-            invoke_args=(self._ctx,),
-            propagate_map_exceptions=True,
-            on_load_failure_callback=self._on_load_failure,
-        )
+        # Only the plugins matching the current filters are imported. The metadata of all
+        # installed plugins comes from the manifest which is rebuilt if the installed
+        # distributions changed.
+        self._entries = self._manifest.entries(self._scan_plugins)
+        self._build_index()
+        self._names = [name for name, metadata in self._entries.items() if self._match_metadata(metadata)]
+        self._invoke_on_load = invoke_on_load
+        self._extension_manager = None
         self._build_plugin_list()
 
+    @property
+    def _manager(self):
+        # The plugin modules are imported on first use, so listing the plugins does not import them.
+        # The manager is shared by the automatic pre-phase and the main phase, so the plugins of
+        # all the phases are loaded and the phase is matched at dispatch time.
+        if self._extension_manager is None:
+            names = [name for name, metadata in self._entries.items() if self._match_metadata(metadata, any_phase=True)]
+            self._extension_manager = _NamedDispatchExtensionManager(
+                names,
+                "csm.plugin",
+                self._check_plugin,
+                invoke_on_load=self._invoke_on_load,
+                invoke_args=(self._ctx,),
+                propagate_map_exceptions=True,
+                on_load_failure_callback=self._on_load_failure,
+            )
+        return self._extension_manager
+
+    def refresh(self):
+        """Rebuild the plugin manifest and reload the plugins."""
+        self._manifest.invalidate()
+        self.load(invoke_on_load=self._invoke_on_load)
+
     def __getitem__(self, item):
         return self._manager.__getitem__(item)
 
+    def _scan_plugins(self):
+        """Return the metadata of all the installed plugins.
+
+        The metadata is read from the plugin source code. The plugin module is imported only
+        if its metadata can not be extracted statically.
+        """
+        entries = {}
+        for ep in pkg_resources.iter_entry_points("csm.plugin"):
+            metadata = extract_plugin_metadata(ep)
+            if metadata is None:
+                metadata = self._import_plugin_metadata(ep)
+            if metadata is not None:
+                entries[ep.name] = metadata
+        return entries
+
+    def _import_plugin_metadata(self, ep):
+        try:
+            plugin = ep.resolve()
+        except Exception as exc:
+            self._on_load_failure(None, ep, exc)
+            return None
+
+        if not self._has_attributes(plugin, ep.module_name):
+            return None
+
+        return {
+            #  'package_name': ep.dist.project_name,
+            'package_name': ep.module_name.split(".")[0],
+            'module': ep.module_name,
+            'attr': ".".join(ep.attrs),
+            'name': plugin.name,
+            'description': plugin.__doc__,
+            'phases': set(plugin.phases),
+            'platforms': set(plugin.platforms),
+            'os': set(plugin.os),
+            'readonly': bool(getattr(plugin, 'readonly', False)),
+            'requires': set(getattr(plugin, 'requires', ())),
+            'provides': set(getattr(plugin, 'provides', ())),
+        }
+
     def _build_plugin_list(self):
         self.plugins = {}
-        for ext in self._manager:
-            self.plugins[ext.name] = {
-                #  'package_name': ext.entry_point.dist.project_name,
-                'package_name': ext.entry_point.module_name.split(".")[0],
-                'name': ext.plugin.name,
-                'description': ext.plugin.__doc__,
-                'phases': ext.plugin.phases,
-                'platforms': ext.plugin.platforms,
-                'os': ext.plugin.os
+        for name in self._names:
+            metadata = self._entries[name]
+            self.plugins[name] = {
+                'package_name': metadata['package_name'],
+                'name': metadata['name'],
+                'description': metadata['description'],
+                'phases': metadata['phases'],
+                'platforms': metadata['platforms'],
+                'os': metadata['os']
             }
 
-    def _filter_func(self, ext, *args, **kwargs):
-        if self._platform and bool(ext.plugin.platforms) and self._platform not in ext.plugin.platforms:
+    @property
+    def entries(self):
+        """The dictionary of all installed plugins metadata indexed by the entry point name."""
+        return self._entries
+
+    def _build_index(self):
+        """Build the (phase, family, os_type) -> ordered tuple of entry point names dispatch index.
+
+        The None key element matches any value as the unset filter does. The plugins with no platforms
+        or os specified are also indexed under the _OTHER key used for the values not listed by any plugin.
+        """
+        self._families = set()
+        self._os_types = set()
+        for metadata in self._entries.values():
+            self._families.update(metadata['platforms'])
+            self._os_types.update(metadata['os'])
+
+        index = {}
+        for name in sorted(self._entries, key=lambda n: (self._entries[n]['name'], n)):
+            metadata = self._entries[name]
+            families = metadata['platforms'] or self._families | {_OTHER}
+            os_types = metadata['os'] or self._os_types | {_OTHER}
+            for phase in metadata['phases'] | {None}:
+                for family in families | {None}:
+                    for os_type in os_types | {None}:
+                        index.setdefault((phase, family, os_type), []).append(name)
+
+        self._index = dict((key, tuple(names)) for key, names in index.items())
+
+    def plugins_for(self, phase, family=None, os_type=None):
+        """Return the ordered tuple of entry point names of the plugins dispatched for the phase,
+        device family and os type. The plugin metadata is available in :attr:`entries`.
+
+        None matches any phase, family or os type.
+        """
+        if family is not None and family not in self._families:
+            family = _OTHER
+        if os_type is not None and os_type not in self._os_types:
+            os_type = _OTHER
+        return self._index.get((phase, family, os_type), ())
+
+    def _match(self, name, phases, platforms, os, any_phase=False):
+        if self._platform and bool(platforms) and self._platform not in platforms:
             return False
-        if self._phase and self._phase not in ext.plugin.phases:
+        if self._phase and not any_phase and self._phase not in phases:
             return False
-        if self._name and ext.plugin.name not in self._name:
+        if self._name and name not in self._name:
             return False
         # if detected os is set and plugin os set is not empty and detected os is not in plugin os then
         # plugin does not match
-        if self._os and bool(ext.plugin.os) and self._os not in ext.plugin.os:
+        if self._os and bool(os) and self._os not in os:
             return False
         return True
 
-    def _dispatch(self, ext, *args, **kwargs):
-        if self._filter_func(ext):
-            self._ctx.current_plugin = None
-            self._ctx.info("Dispatching: '{}'".format(ext.plugin.name))
-            self._ctx.post_status(ext.plugin.name)
-            self._ctx.current_plugin = ext.plugin.name
+    def _match_metadata(self, metadata, any_phase=False):
+        return self._match(metadata['name'], metadata['phases'], metadata['platforms'], metadata['os'],
+                           any_phase=any_phase)
+
+    def _filter_func(self, ext, *args, **kwargs):
+        return self._match(ext.plugin.name, ext.plugin.phases, ext.plugin.platforms, ext.plugin.os,
+                           any_phase=True)
+
+    def _dispatch(self, ext, func):
+        self._ctx.current_plugin = None
+        self._ctx.info("Dispatching: '{}'".format(ext.plugin.name))
+        self._ctx.post_status(ext.plugin.name)
+        self._ctx.current_plugin = ext.plugin.name
+        try:
+            with self._ctx.trace(ext.plugin.name, "plugin", phase=self._phase):
+                return getattr(ext.obj, func)()
+        finally:
+            self._ctx.flush_storage()
+
+    def _dispatch_phase(self, func):
+        with self._ctx.trace(self._phase or "Phase", "phase"):
+            return self._dispatch_phase_plugins(func)
+
+    def _dispatch_phase_plugins(self, func):
+        self._ctx.info("Phase: {}".format(self._phase))
+        if not self._manager.extensions:
+            raise NoMatches("No csm.plugin extensions found")
+
+        names = self.plugins_for(self._phase, self._platform, self._os)
+        if self._name:
+            names = [name for name in names if self._entries[name]['name'] in self._name]
+        names = [name for name in names if name in self._manager.by_name]
+        names = [name for name in names if not self._outputs_available(name)]
+
+        levels = self.schedule(names)
+        if not self._concurrency_enabled():
+            return self._manager.map(list(itertools.chain(*levels)), self._dispatch, func)
+
+        # The consecutive read-only plugins from the same level are dispatched concurrently.
+        # The remaining plugins are dispatched sequentially in order.
+        results = []
+        for level in levels:
+            for readonly, group in itertools.groupby(level, key=lambda n: self._entries[n].get('readonly', False)):
+                group = list(group)
+                if readonly and len(group) > 1:
+                    results += self._dispatch_concurrently(group, func)
+                else:
+                    results += self._manager.map(group, self._dispatch, func)
+        return results
+
+    def schedule(self, names):
+        """Return the plugins ordered by the declared requires and provides keys.
+
+        The plugins are split into levels. Each plugin is placed in the first level following
+        the levels of all the plugins providing the keys it requires, so the independent plugins
+        are dispatched first. The order within the level follows the order of names. The required
+        keys not provided by any of the plugins are expected to be already stored in the job data.
+
+        :param names: The ordered list of the entry point names.
+        :return: The list of levels, each being the ordered list of entry point names.
+        """
+        providers = {}
+        for name in names:
+            for key in self._entries[name].get('provides', ()):
+                providers.setdefault(key, set()).add(name)
+
+        dependencies = {}
+        for name in names:
+            dependencies[name] = set()
+            for key in self._entries[name].get('requires', ()):
+                dependencies[name].update(providers.get(key, set()) - {name})
+
+        levels = []
+        scheduled = set()
+        remaining = list(names)
+        while remaining:
+            level = [name for name in remaining if dependencies[name] <= scheduled]
+            if not level:
+                self._ctx.warning("Circular plugin dependencies: {}".format(
+                    ", ".join(self._entries[name]['name'] for name in remaining)))
+                level = remaining
+            levels.append(level)
+            scheduled.update(level)
+            remaining = [name for name in remaining if name not in scheduled]
+        return levels
+
+    def _outputs_available(self, name):
+        """Return True if all the keys provided by the plugin were already saved to the job data in this run."""
+        provides = self._entries[name].get('provides')
+        if not provides or self._ctx is None:
+            return False
+        if all(self._ctx.produced_job_data(key) for key in provides):
+            self._ctx.info("Skipping: '{}'. Job data already collected: {}".format(
+                self._entries[name]['name'], ", ".join(sorted(provides))))
             return True
         return False
 
+    def _concurrency_enabled(self):
+        if self._max_sessions < 1 or self._ctx._connection is None:
+            return False
+        if self._ctx.is_console:
+            self._ctx.info("Console connection. The read-only plugins are dispatched sequentially.")
+            return False
+        return True
+
+    def _open_sessions(self, count):
+        """Open up to count additional device sessions. Returns the list of the open sessions."""
+        # The sessions are opened one by one as condoor updates the shared discovery cache file
+        while len(self._sessions) < min(count, self._max_sessions):
+            name = "session-{}".format(len(self._sessions) + 1)
+            try:
+                self._sessions.append(self._ctx.open_session(name))
+            except Exception as e:
+                self._ctx.warning("Unable to open the additional device session {}: {}".format(name, e))
+                # do not try to open more sessions
+                self._max_sessions = len(self._sessions)
+                break
+            self._ctx.info("Additional device session {} opened".format(name))
+        return self._sessions[:count]
+
+    def _close_sessions(self):
+        for session in self._sessions:
+            session.finalize()
+        self._sessions = []
+
+    def _run_in_session(self, session, ext, func):
+        session.current_plugin = None
+        session.info("Dispatching: '{}' ({})".format(ext.plugin.name, session._session))
+        session.post_status(ext.plugin.name)
+        session.current_plugin = ext.plugin.name
+        try:
+            with session.trace(ext.plugin.name, "plugin", phase=self._phase):
+                return getattr(ext.plugin(session), func)()
+        finally:
+            session.flush_storage()
+            session.current_plugin = None
+
+    def _dispatch_concurrently(self, names, func):
+        """Dispatch the read-only plugins over the additional device sessions.
+
+        The log records of each plugin are logged after all the plugins finished, in the plugin order.
+        If any plugin raised an exception the first one in the plugin order is re-raised.
+        """
+        sessions = self._open_sessions(len(names))
+        if not sessions:
+            return self._manager.map(names, self._dispatch, func)
+
+        self._ctx.info("Dispatching concurrently over {} session(s): {}".format(
+            len(sessions), ", ".join(self._entries[name]['name'] for name in names)))
+
+        queue = Queue()
+        for index, name in enumerate(names):
+            queue.put((index, self._manager.by_name[name]))
+
+        results = [None] * len(names)
+        records = [[] for _ in names]
+        errors = [None] * len(names)
+
+        def worker(session):
+            while True:
+                try:
+                    index, ext = queue.get_nowait()
+                except Empty:
+                    return
+                try:
+                    results[index] = self._run_in_session(session, ext, func)
+                except Exception:
+                    errors[index] = sys.exc_info()
+                finally:
+                    records[index] = session.take_log_records()
+
+        threads = [threading.Thread(target=worker, args=(session,), name=session._session) for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for index in range(len(names)):
+            self._ctx.log_records(records[index])
+
+        for error in errors:
+            if error is not None:
+                exc_type, exc_value, exc_traceback = error
+                raise exc_type, exc_value, exc_traceback
+
+        return results
+
     def _on_load_failure(self, manager, entry_point, exc):
         self._ctx.warning("Plugin load error: {}".format(entry_point))
         self._ctx.warning("Exception: {}".format(exc))
 
-    def _check_plugin(self, ext, *args, **kwargs):
+    def _has_attributes(self, plugin, module_name):
         attributes = ['name', 'phases', 'platforms', 'os']
-        plugin = ext.plugin
         for attribute in attributes:
             if not hasattr(plugin, attribute):
-                self._ctx.warning("Attribute '{}' missing in plugin class: {}".format(
-                    attribute, ext.entry_point.module_name))
+                self._ctx.warning("Attribute '{}' missing in plugin class: {}".format(attribute, module_name))
                 return False
-        return self._filter_func(ext)
+        return True
+
+    def _check_plugin(self, ext, *args, **kwargs):
+        return self._has_attributes(ext.plugin, ext.entry_point.module_name) and self._filter_func(ext)
 
     def get_package_metadata(self, name):
         try:
@@ -142,21 +455,20 @@ class CSMPluginManager(object):
         if self._ctx.phase in auto_pre_phases:
             phase = "Pre-{}".format(self._ctx.phase)
             self.set_phase_filter(phase)
-            self._ctx.info("Phase: {}".format(self._phase))
             try:
-                results = self._manager.map_method(self._dispatch, func)
+                results = self._dispatch_phase(func)
             except NoMatches:
                 self._ctx.warning("No {} plugins found".format(phase))
             self._ctx.current_plugin = None
 
         self.set_phase_filter(current_phase)
-        self._ctx.info("Phase: {}".format(self._phase))
         try:
-            results += self._manager.map_method(self._dispatch, func)
+            results += self._dispatch_phase(func)
         except NoMatches:
             self._ctx.post_status("No plugins found for phase {}".format(self._phase))
             self._ctx.error("No plugins found for phase {}".format(self._phase))
         finally:
+            self._close_sessions()
             self._ctx.info("CSM Plugin Manager Finished")
             self._ctx.finalize()
 
@@ -165,6 +477,19 @@ class CSMPluginManager(object):
 
         return results
 
+    def set_max_sessions(self, sessions):
+        """Set the maximum number of the additional device sessions used to dispatch
+        the read-only plugins concurrently. Zero disables the concurrent dispatching.
+        """
+        self._max_sessions = int(sessions) if sessions else 0
+
+    def set_command_cache(self, ttl):
+        """Enable the show command output cache with the ttl in seconds. Zero disables the cache.
+        See :meth:`PluginContext.enable_command_cache`.
+        """
+        if ttl:
+            self._ctx.enable_command_cache(ttl)
+
     def set_platform_filter(self, platform):
         self._platform = platform
 
@@ -27,36 +27,74 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
 
-from functools import partial
+_METHOD_TEMPLATE = """
+def {name}(self, *args, **kwargs):
+    return self.{delegate}.{name}(*args, **kwargs)
+"""
 
+_GETTER_TEMPLATE = """
+def {name}(self):
+    return self.{delegate}.{name}
+"""
 
-def delegate(attribute_name, method_names, attribute_names=()):
-    """Passes the call to the attribute called attribute_name for
-    every method listed in method_names.
-    """
-    # hack for python 2.7 as nonlocal is not available
-    d = {
-        'delegate': attribute_name,
-        'methods': method_names,
-        'attributes': attribute_names,
-    }
+_SETTER_TEMPLATE = """
+def {name}(self, value):
+    self.{delegate}.{name} = value
+"""
+
+# The cached value is stored in the instance dictionary. None means not known yet, i.e. before discovery.
+_CACHED_GETTER_TEMPLATE = """
+def {name}(self):
+    value = self.__dict__.get("{key}")
+    if value is None:
+        value = self.{delegate}.{name}
+        self.__dict__["{key}"] = value
+    return value
+"""
+
+_CACHED_SETTER_TEMPLATE = """
+def {name}(self, value):
+    self.__dict__.pop("{key}", None)
+    self.{delegate}.{name} = value
+"""
+
+_CACHE_PREFIX = "_delegate_cache_"
 
-    def setter(attribute, name, instance, value):
-        setattr(getattr(instance, attribute), name, value)
 
-    def getter(attribute, name, instance):
-        return getattr(getattr(instance, attribute), name)
+def _compile(template, **names):
+    namespace = {}
+    exec(template.format(**names), namespace)
+    return namespace[names['name']]
 
-    def caller(attribute, name):
-        return lambda self, *args, **kwargs: getter(attribute, name, self)(*args, **kwargs)
 
+def clear_delegate_cache(instance):
+    """Clear the attribute values cached by the :func:`delegate` decorator, i.e. after the device reload."""
+    for key in [key for key in instance.__dict__ if key.startswith(_CACHE_PREFIX)]:
+        del instance.__dict__[key]
+
+
+def delegate(attribute_name, method_names, attribute_names=(), cached_names=()):
+    """Passes the call to the attribute called attribute_name for
+    every method listed in method_names.
+
+    The accessors are generated as plain functions reading the delegate attribute directly.
+    The attributes listed in cached_names are read from the delegate once and cached in the
+    instance until :func:`clear_delegate_cache` is called. The None value is not cached.
+    """
     def decorator(cls):
-        delegate_name = d['delegate']
+        delegate_name = attribute_name
         if delegate_name.startswith("__"):
             delegate_name = "_" + cls.__name__ + delegate_name
-        for name in d['methods']:
-            setattr(cls, name, caller(delegate_name, name))
-        for name in d['attributes']:
-            setattr(cls, name, property(partial(getter, delegate_name, name), partial(setter, delegate_name, name)))
+        for name in method_names:
+            setattr(cls, name, _compile(_METHOD_TEMPLATE, name=name, delegate=delegate_name))
+        for name in attribute_names:
+            if name in cached_names:
+                key = _CACHE_PREFIX + name
+                getter = _compile(_CACHED_GETTER_TEMPLATE, name=name, delegate=delegate_name, key=key)
+                setter = _compile(_CACHED_SETTER_TEMPLATE, name=name, delegate=delegate_name, key=key)
+            else:
+                getter = _compile(_GETTER_TEMPLATE, name=name, delegate=delegate_name)
+                setter = _compile(_SETTER_TEMPLATE, name=name, delegate=delegate_name)
+            setattr(cls, name, property(getter, setter))
         return cls
     return decorator
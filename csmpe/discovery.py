@@ -0,0 +1,120 @@
+# =============================================================================
+# Device discovery cache
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+from manifest import default_cache_dir
+
+#: The command used to fingerprint the device.
+FINGERPRINT_COMMAND = "show version"
+
+# The show version lines changing between the runs on the same device
+_VOLATILE_RE = re.compile(r"uptime|restarted|reload|\d{1,2}:\d{2}:\d{2}", re.IGNORECASE)
+
+
+def chain_key(urls):
+    """Return the cache key for the host URL chain."""
+    return hashlib.sha1("\n".join(urls).encode("utf-8")).hexdigest()
+
+
+def version_hash(output):
+    """Return the hash of the show version output without the uptime and timestamp lines."""
+    digest = hashlib.sha1()
+    for line in output.splitlines():
+        line = line.strip()
+        if line and not _VOLATILE_RE.search(line):
+            digest.update(line.encode("utf-8"))
+            digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class DiscoveryCache(object):
+    """On-disk cache of the device fingerprints keyed by the host URL chain.
+
+    The entry stores the prompt and the show version hash of the discovered device and
+    the duration of the full discovery. If the device still has the same fingerprint,
+    the connection information cached by condoor is valid and the discovery can be skipped.
+    Each URL chain is stored in the separate file, so the fleet workers do not overwrite
+    the entries of the other hosts.
+    """
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.path.join(default_cache_dir(), "discovery")
+        self.cache_dir = cache_dir
+
+    def _filename(self, urls):
+        return os.path.join(self.cache_dir, chain_key(urls) + ".json")
+
+    def get(self, urls):
+        """Return the cache entry dictionary for the URL chain or None."""
+        try:
+            with open(self._filename(urls), "r") as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get('key') != chain_key(urls):
+            return None
+        return entry
+
+    def put(self, urls, prompt, version, discovery_time):
+        """Store the device fingerprint and the discovery duration for the URL chain.
+        The URLs carrying the credentials are not stored, only their hash."""
+        entry = {
+            'key': chain_key(urls),
+            'prompt': prompt,
+            'version_hash': version,
+            'discovery_time': discovery_time,
+            'timestamp': time.time(),
+        }
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            fd, tmp_filename = tempfile.mkstemp(dir=self.cache_dir, prefix=".discovery")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f, indent=2, sort_keys=True)
+            os.rename(tmp_filename, self._filename(urls))
+        except (IOError, OSError):
+            return False
+        return True
+
+    def invalidate(self, urls):
+        try:
+            os.remove(self._filename(urls))
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def matches(entry, prompt, version):
+        """Return True if the device fingerprint matches the cache entry."""
+        return entry is not None and entry.get('prompt') == prompt and entry.get('version_hash') == version
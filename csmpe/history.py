@@ -0,0 +1,161 @@
+# =============================================================================
+# Duration history
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import os
+import sqlite3
+
+from manifest import default_cache_dir
+from storage import SQLiteStorage
+
+HISTORY_FILENAME = "history.db"
+
+# The storage namespace of the operation durations
+_NAMESPACE = "durations"
+
+
+def percentile(samples, fraction):
+    """Return the sample at the fraction of the sorted samples."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class DurationHistory(object):
+    """The durations of the device operations measured in the past, kept in the local database.
+
+    The durations are recorded per hardware family, platform, operation type and number of packages,
+    i.e. an ASR9K RSP880 parallel reload, and used to predict how long the same operation takes.
+
+    :param filename: The database file. Default is history.db in the csmpe cache directory.
+    :param samples: The number of the most recent durations kept per operation.
+    """
+    def __init__(self, filename=None, samples=20):
+        if filename is None:
+            filename = os.path.join(default_cache_dir(), HISTORY_FILENAME)
+        self.filename = filename
+        self.samples = samples
+        self._storage = None
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            # the other processes record the durations too, so the values are not cached
+            self._storage = SQLiteStorage(self.filename, cache_size=0)
+        return self._storage
+
+    @staticmethod
+    def key(family, platform, operation, packages=0):
+        return "{}/{}/{}/{}".format(family, platform, operation, packages or 0)
+
+    def record(self, family, platform, operation, duration, packages=0):
+        """Record the operation duration in seconds. Returns False if the database is not available."""
+        key = self.key(family, platform, operation, packages)
+        try:
+            durations = self.storage.get(_NAMESPACE, key, [])
+            durations.append(round(duration, 1))
+            self.storage.set(_NAMESPACE, key, durations[-self.samples:])
+        except (sqlite3.Error, IOError, OSError):
+            return False
+        return True
+
+    def durations(self, family, platform, operation, packages=0):
+        """Return the recorded durations of the operation.
+
+        If the operation was never recorded with the number of packages the durations recorded
+        with the closest number of packages are returned.
+        """
+        try:
+            durations = self.storage.get(_NAMESPACE, self.key(family, platform, operation, packages))
+            if durations:
+                return durations
+            prefix = self.key(family, platform, operation, "")[:-1]
+            counts = [int(key[len(prefix):]) for key in self.storage.keys(_NAMESPACE)
+                      if key.startswith(prefix) and key[len(prefix):].isdigit()]
+            if not counts:
+                return []
+            closest = min(counts, key=lambda count: (abs(count - (packages or 0)), count))
+            return self.storage.get(_NAMESPACE, self.key(family, platform, operation, closest), [])
+        except (sqlite3.Error, IOError, OSError):
+            return []
+
+    def operation(self, family, platform, operation, packages=0):
+        """Return the :class:`Operation` predicting and recording the durations of the operation."""
+        return Operation(self, family, platform, operation, packages)
+
+    def close(self):
+        if self._storage is not None:
+            self._storage.close()
+            self._storage = None
+
+
+class Operation(object):
+    """The prediction of the operation duration based on the recorded durations.
+
+    :param history: The :class:`DurationHistory`.
+    """
+    #: The timeout is the longest recorded duration multiplied by the margin.
+    TIMEOUT_MARGIN = 1.5
+
+    def __init__(self, history, family, platform, operation, packages=0):
+        self.history = history
+        self.family = family
+        self.platform = platform
+        self.name = operation
+        self.packages = packages
+        self.durations = history.durations(family, platform, operation, packages)
+
+    @property
+    def estimate(self):
+        """The median of the recorded durations in seconds or None if never recorded."""
+        if not self.durations:
+            return None
+        return percentile(self.durations, 0.5)
+
+    def timeout(self, default):
+        """Return the timeout long enough for the longest recorded duration, at least the default."""
+        if not self.durations:
+            return default
+        return max(default, int(max(self.durations) * self.TIMEOUT_MARGIN))
+
+    def interval(self, default, minimum, maximum, fraction=0.1):
+        """Return the poll interval being the fraction of the estimated duration within the limits."""
+        estimate = self.estimate
+        if estimate is None:
+            return default
+        return max(minimum, min(maximum, estimate * fraction))
+
+    def eta(self, elapsed=0):
+        """Return the ETA message for the post_status or the empty string if not known."""
+        estimate = self.estimate
+        if estimate is None:
+            return ""
+        remaining = max(0, estimate - elapsed)
+        return " (ETA {:.0f} minute(s) {:.0f} second(s))".format(remaining // 60, remaining % 60)
+
+    def record(self, duration):
+        self.history.record(self.family, self.platform, self.name, duration, self.packages)
@@ -0,0 +1,275 @@
+# =============================================================================
+# PluginManifest
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import ast
+import hashlib
+import json
+import os
+import tempfile
+
+import pkg_resources
+
+MANIFEST_VERSION = 3
+MANIFEST_FILENAME = "plugin_manifest.json"
+
+# metadata attributes stored as sets on the plugin classes
+_SET_ATTRIBUTES = ('phases', 'platforms', 'os', 'requires', 'provides')
+
+# The class attribute defaults inherited from csmpe.plugins.base.CSMPlugin
+_CSMPLUGIN_DEFAULTS = {
+    'name': "Plugin Template",
+    'phases': set(),
+    'platforms': set(),
+    'os': set(),
+}
+
+# The optional class attributes and their defaults
+_OPTIONAL_ATTRIBUTES = {
+    'readonly': False,
+    'requires': set(),
+    'provides': set(),
+}
+
+
+def default_cache_dir():
+    """Return the directory where the plugin manifest is stored.
+
+    The CSMPE_CACHE_DIR environment variable overrides the default ~/.csmpe directory.
+    """
+    return os.environ.get("CSMPE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".csmpe"))
+
+
+def distributions_fingerprint(namespace, working_set=None):
+    """Return the hash describing the installed distributions and the plugin entry points.
+
+    The fingerprint changes whenever a distribution is installed, removed, upgraded or
+    the entry points registered in the namespace change.
+    """
+    if working_set is None:
+        working_set = pkg_resources.working_set
+
+    items = []
+    for dist in working_set:
+        items.append("{}=={}@{}".format(dist.project_name, dist.version, dist.location))
+    for ep in working_set.iter_entry_points(namespace):
+        items.append("{}@{}".format(str(ep), ep.dist))
+
+    digest = hashlib.sha1()
+    for item in sorted(items):
+        digest.update(item.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _literal(node):
+    """Evaluate the literal expression node. Raises ValueError if node is not a literal.
+
+    The set literals are handled here as ast.literal_eval does not support them in Python 2.7.
+    """
+    if isinstance(node, ast.Set):
+        return set(_literal(element) for element in node.elts)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ('set', 'frozenset') \
+            and not node.args and not node.keywords:
+        return set()
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_literal(element) for element in node.elts]
+    return ast.literal_eval(node)
+
+
+def _base_name(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _module_source_path(entry_point):
+    """Return the path to the source file of the entry point module without importing it."""
+    dist = entry_point.dist
+    if dist is None or not dist.location or not os.path.isdir(dist.location):
+        return None
+    path = os.path.join(dist.location, *entry_point.module_name.split("."))
+    for filename in (path + ".py", os.path.join(path, "__init__.py")):
+        if os.path.isfile(filename):
+            return filename
+    return None
+
+
+def extract_plugin_metadata(entry_point):
+    """Return the plugin metadata read from the plugin source code without importing the module.
+
+    The plugin class attributes: name, phases, platforms and os must be literals defined in the
+    class body or inherited from CSMPlugin. None is returned if the metadata can not be extracted
+    statically and the plugin module needs to be imported.
+    """
+    if len(entry_point.attrs) != 1:
+        return None
+
+    filename = _module_source_path(entry_point)
+    if filename is None:
+        return None
+
+    try:
+        with open(filename, "r") as f:
+            tree = ast.parse(f.read(), filename)
+    except (IOError, OSError, SyntaxError):
+        return None
+
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == entry_point.attrs[0]:
+            break
+    else:
+        return None
+
+    attributes = {}
+    for statement in node.body:
+        if not isinstance(statement, ast.Assign):
+            continue
+        for target in statement.targets:
+            if isinstance(target, ast.Name) and (target.id in _CSMPLUGIN_DEFAULTS or
+                                                 target.id in _OPTIONAL_ATTRIBUTES):
+                try:
+                    attributes[target.id] = _literal(statement.value)
+                except ValueError:
+                    return None
+
+    bases = [_base_name(base) for base in node.bases]
+    if not set(_CSMPLUGIN_DEFAULTS).issubset(attributes):
+        # the missing attributes are known only if inherited directly from CSMPlugin
+        if bases != ['CSMPlugin']:
+            return None
+        for attribute, default in _CSMPLUGIN_DEFAULTS.items():
+            attributes.setdefault(attribute, default)
+    elif not set(_OPTIONAL_ATTRIBUTES).issubset(attributes) and bases not in (['CSMPlugin'], ['object'], []):
+        # the optional attributes may be inherited from the unknown base class
+        return None
+
+    metadata = {
+        'package_name': entry_point.module_name.split(".")[0],
+        'module': entry_point.module_name,
+        'attr': entry_point.attrs[0],
+        'description': ast.get_docstring(node, clean=False),
+        'name': attributes['name'],
+    }
+    for attribute, default in _OPTIONAL_ATTRIBUTES.items():
+        metadata[attribute] = attributes.get(attribute, default)
+    for attribute in _SET_ATTRIBUTES:
+        metadata[attribute] = set(attributes.get(attribute, metadata.get(attribute)))
+    return metadata
+
+
+class PluginManifest(object):
+    """On-disk cache of the plugin metadata.
+
+    The manifest maps the entry point name to the plugin metadata, i.e. name, description,
+    phases, platforms, os and the module path. It allows the plugin manager to select
+    the plugins matching the job without importing every plugin module.
+    """
+    def __init__(self, namespace="csm.plugin", cache_dir=None):
+        self.namespace = namespace
+        self.cache_dir = default_cache_dir() if cache_dir is None else cache_dir
+        self.filename = os.path.join(self.cache_dir, MANIFEST_FILENAME)
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = distributions_fingerprint(self.namespace)
+        return self._fingerprint
+
+    def load(self):
+        """Return the plugin entries or None if the manifest is missing or out of date."""
+        try:
+            with open(self.filename, "r") as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict):
+            return None
+        if data.get('version') != MANIFEST_VERSION or data.get('namespace') != self.namespace:
+            return None
+        if data.get('fingerprint') != self.fingerprint:
+            return None
+
+        entries = {}
+        for name, metadata in data.get('plugins', {}).items():
+            for attribute in _SET_ATTRIBUTES:
+                if attribute in metadata:
+                    metadata[attribute] = set(metadata[attribute])
+            entries[name] = metadata
+        return entries
+
+    def save(self, entries):
+        """Store the plugin entries. Returns True if the manifest was written."""
+        plugins = {}
+        for name, metadata in entries.items():
+            metadata = dict(metadata)
+            for attribute in _SET_ATTRIBUTES:
+                if attribute in metadata:
+                    metadata[attribute] = sorted(metadata[attribute])
+            plugins[name] = metadata
+
+        data = {
+            'version': MANIFEST_VERSION,
+            'namespace': self.namespace,
+            'fingerprint': self.fingerprint,
+            'plugins': plugins,
+        }
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            # write to the temporary file first so concurrent readers never see a partial manifest
+            fd, tmp_filename = tempfile.mkstemp(dir=self.cache_dir, prefix=".manifest")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.rename(tmp_filename, self.filename)
+        except (IOError, OSError):
+            return False
+        return True
+
+    def entries(self, builder):
+        """Return the plugin entries from the manifest.
+
+        The builder callable is used to scan the plugins and rebuild the manifest if it
+        is missing or out of date.
+        """
+        entries = self.load()
+        if entries is None:
+            entries = builder()
+            self.save(entries)
+        return entries
+
+    def invalidate(self):
+        """Remove the manifest file."""
+        try:
+            os.remove(self.filename)
+        except (IOError, OSError):
+            pass
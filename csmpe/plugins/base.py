@@ -57,6 +57,18 @@ class CSMPlugin(object):
     #: Empty set means plugin will be executed regardless of the detected operating system.
     os = set()
 
+    #: True if the plugin only reads the device state. The read-only plugins which do not depend on
+    #: each other may be dispatched concurrently over the additional device sessions.
+    readonly = False
+
+    #: The set of the job data keys the plugin loads. The plugin is dispatched after the plugins
+    #: from the same phase providing these keys.
+    requires = set()
+
+    #: The set of the job data keys the plugin saves. The plugin is skipped if all these keys
+    #: are already stored for the install job, so declare it only for plugins safe to skip.
+    provides = set()
+
     def __init__(self, ctx):
         """ This is a constructor of a plugin object. The constructor can be overridden by the plugin code.
         The CSM Plugin Engine passes the :class:`csmpe.InstallContext` object
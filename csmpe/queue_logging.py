@@ -0,0 +1,141 @@
+# =============================================================================
+# Queue based logging
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import logging
+import threading
+import time
+from Queue import Queue, Empty
+
+_STOP = object()
+
+
+class QueueHandler(logging.Handler):
+    """Log handler putting the records to the bounded queue processed by :class:`QueueListener`.
+
+    The plugin thread blocks only when the queue is full.
+    """
+    def __init__(self, queue):
+        logging.Handler.__init__(self)
+        self.queue = queue
+
+    def prepare(self, record):
+        # the message is formatted in the calling thread as the arguments may change later
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.queue.put(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+class QueueListener(object):
+    """Background thread passing the queued records to the handlers."""
+    def __init__(self, queue, *handlers):
+        self.queue = queue
+        self.handlers = handlers
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._monitor, name="log-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _monitor(self):
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                break
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+    def stop(self):
+        """Write all the queued records and stop the thread."""
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+
+class BatchedCall(object):
+    """Calls the function from the background thread with the list of the queued items.
+
+    The items are collected until max_batch items are queued or interval seconds elapsed
+    since the first item of the batch was queued.
+    """
+    def __init__(self, func, max_batch=50, interval=1.0, maxsize=1000):
+        self.func = func
+        self.max_batch = max_batch
+        self.interval = interval
+        self.queue = Queue(maxsize)
+        self._thread = threading.Thread(target=self._monitor, name="batched-call")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def _call(self, items):
+        try:
+            self.func(items)
+        except Exception:
+            # the failure must not stop the remaining batches
+            pass
+
+    def _monitor(self):
+        stop = False
+        while not stop:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            items = [item]
+            deadline = time.time() + self.interval
+            while len(items) < self.max_batch:
+                try:
+                    item = self.queue.get(timeout=max(0, deadline - time.time()))
+                except Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                items.append(item)
+            self._call(items)
+
+    def stop(self):
+        """Process all the queued items and stop the thread."""
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,198 @@
+# =============================================================================
+# Rolling-wave scheduler
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import os
+import time
+
+from fleet import execute, run_host, summary, write_results
+
+RESULTS_FILENAME = "rollout_results.json"
+
+
+def order_hosts(hosts, group_key="site"):
+    """Return the hosts interleaved round-robin across the groups so each wave spans as many groups as possible.
+
+    The order of the groups and the order of the hosts inside the group are preserved.
+    """
+    groups = []
+    members = {}
+    for host in hosts:
+        name = host.get(group_key)
+        if name not in members:
+            members[name] = []
+            groups.append(name)
+        members[name].append(host)
+
+    ordered = []
+    index = 0
+    while len(ordered) < len(hosts):
+        for name in groups:
+            if index < len(members[name]):
+                ordered.append(members[name][index])
+        index += 1
+    return ordered
+
+
+def plan_waves(hosts, canary=1, growth=2.0, max_wave=None):
+    """Split the hosts into waves.
+
+    The first wave contains the canary hosts. Every next wave is growth times larger than the
+    previous one up to max_wave hosts.
+
+    :return: The list of waves, each being the list of hosts.
+    """
+    waves = []
+    size = max(1, canary)
+    start = 0
+    while start < len(hosts):
+        waves.append(hosts[start:start + size])
+        start += size
+        size = int(max(size + 1, size * growth))
+        if max_wave:
+            size = min(size, max_wave)
+    return waves
+
+
+def run_rollout(hosts, phases, log_dir, canary=1, growth=2.0, max_wave=None, concurrency=8, group_key="site",
+                group_limit=0, failure_threshold=0.1, plugin_name=None, sessions=0, storage=None,
+                cached_discovery=False, log_max_bytes=0, log_compress=False, results_file=None, runner=run_host,
+                callback=None):
+    """Run the phase sequence on the hosts in widening waves.
+
+    The canary wave runs first. The next wave starts when all hosts from the previous wave
+    finished, unless the failure rate of all finished hosts exceeds the failure threshold. In such case
+    the rollout stops and the remaining hosts are reported as skipped. Each host runs the phases in
+    order and stops on the first failed phase.
+
+    :param hosts: The list of host dictionaries. See :func:`csmpe.fleet.load_inventory`.
+    :param phases: The sequence of the install phases, i.e. ["Add", "Activate", "Commit"].
+    :param log_dir: The rollout log directory. The host logs are stored in the hostname subdirectories.
+    :param canary: The number of hosts in the canary wave.
+    :param growth: The wave size multiplier.
+    :param max_wave: The optional maximum number of hosts in the wave.
+    :param concurrency: The maximum number of hosts processed concurrently.
+    :param group_key: The host key used to group the hosts, i.e. site.
+    :param group_limit: The maximum number of hosts from the same group processed concurrently. 0 means no limit.
+    :param failure_threshold: The failure rate (0.0 - 1.0) which stops the rollout.
+    :param plugin_name: The optional plugin name filter.
+    :param sessions: The number of additional device sessions per host.
+    :param storage: The optional SQLite file storing the host data between the phases and runs.
+    :param cached_discovery: Skip the device discovery if the device fingerprint did not change.
+    :param log_max_bytes: The size limit of the host log files. If 0 the size is not limited.
+    :param log_compress: Compress the rotated host log files.
+    :param results_file: The results file path. Default is rollout_results.json in the log directory.
+    :param runner: The function processing a single host job.
+    :param callback: The optional function called with each host result when the host is finished.
+    :return: The aggregated results dictionary.
+    """
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    if results_file is None:
+        results_file = os.path.join(log_dir, RESULTS_FILENAME)
+
+    begin = time.time()
+    waves = plan_waves(order_hosts(hosts, group_key), canary, growth, max_wave)
+    host_results = {}
+    wave_results = []
+    stop_reason = None
+    finished = failed = 0
+
+    for number, wave in enumerate(waves):
+        if stop_reason:
+            break
+
+        wave_begin = time.time()
+        jobs = [{
+            'host': host,
+            'phases': list(phases),
+            'plugin_name': plugin_name,
+            'log_dir': log_dir,
+            'sessions': sessions,
+            'storage': storage,
+            'cached_discovery': cached_discovery,
+            'log_max_bytes': log_max_bytes,
+            'log_compress': log_compress,
+        } for host in wave]
+
+        wave_failed = 0
+        for job, result in execute(jobs, runner, concurrency,
+                                   group=lambda job: job['host'].get(group_key), group_limit=group_limit):
+            result['wave'] = number
+            host_results[result['hostname']] = result
+            if not result['success']:
+                wave_failed += 1
+            if callback:
+                callback(result)
+
+        finished += len(wave)
+        failed += wave_failed
+        wave_results.append({
+            'wave': number,
+            'hosts': [host['hostname'] for host in wave],
+            'succeeded': len(wave) - wave_failed,
+            'failed': wave_failed,
+            'duration': time.time() - wave_begin,
+        })
+
+        if float(failed) / finished > failure_threshold:
+            stop_reason = "Failure rate {:.0%} exceeded the threshold {:.0%} after wave {}".format(
+                float(failed) / finished, failure_threshold, number)
+
+    for host in hosts:
+        if host['hostname'] not in host_results:
+            host_results[host['hostname']] = {
+                'hostname': host['hostname'],
+                'site': host.get('site'),
+                'success': False,
+                'skipped': True,
+                'error': "Rollout stopped",
+            }
+
+    elapsed = time.time() - begin
+    results = {
+        'phases': list(phases),
+        'plugin_name': plugin_name,
+        'concurrency': concurrency,
+        'group_limit': group_limit,
+        'failure_threshold': failure_threshold,
+        'start': begin,
+        'duration': elapsed,
+        'stopped': stop_reason is not None,
+        'stop_reason': stop_reason,
+        'waves': wave_results,
+        'hosts': [host_results[host['hostname']] for host in hosts],
+    }
+    results['summary'] = summary([result for result in results['hosts'] if not result.get('skipped')], elapsed)
+    results['summary']['skipped'] = len(hosts) - finished
+    results['summary']['total'] = len(hosts)
+
+    write_results(results, results_file)
+    results['results_file'] = results_file
+
+    return results
@@ -0,0 +1,209 @@
+# =============================================================================
+# Bounded session log
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import gzip
+import hashlib
+import logging.handlers
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+
+# The same pattern as condoor uses to hide the passwords in the session log
+_PASSWORD_RE = re.compile(r"s?[f|s][t|c]p://.*:(.*)@")
+
+# The timestamps printed by the device, i.e. before the command output
+_TIMESTAMP_RE = re.compile(r"\d{1,2}:\d{2}:\d{2}(\.\d+)?")
+
+
+def rotate(filename, backup_count, compress=False):
+    """Rotate the log file: filename.1 becomes filename.2 and so on, the filename becomes filename.1.
+
+    If compress is True the rotated files are gzip compressed and have the .gz suffix.
+    """
+    suffix = ".gz" if compress else ""
+    for index in range(backup_count - 1, 0, -1):
+        source = "{}.{}{}".format(filename, index, suffix)
+        if os.path.exists(source):
+            os.rename(source, "{}.{}{}".format(filename, index + 1, suffix))
+    if not os.path.exists(filename):
+        return
+    if not backup_count:
+        os.remove(filename)
+    elif compress:
+        with open(filename, "rb") as source, gzip.open("{}.1.gz".format(filename), "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(filename)
+    else:
+        os.rename(filename, "{}.1".format(filename))
+
+
+class RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """The rotating log file handler optionally compressing the rotated files."""
+    def __init__(self, filename, max_bytes, backup_count=5, compress=False):
+        logging.handlers.RotatingFileHandler.__init__(self, filename, maxBytes=max_bytes, backupCount=backup_count)
+        self.compress = compress
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        rotate(self.baseFilename, self.backupCount, self.compress)
+        self.stream = self._open()
+
+
+class SessionLog(object):
+    """The file-like device session log with the size limit passed to condoor as the session log file.
+
+    When the file exceeds max_bytes it is rotated, see :func:`rotate`. The command outputs are written
+    through :meth:`block`. The block identical to the previous output of the same command, except the
+    timestamps, is not written. The "repeated N times" marker is written instead when a different
+    output arrives. After :meth:`full_fidelity` is called, i.e. when an error is raised, the last
+    collapsed output is written and the collapsing is disabled.
+
+    :param filename: The session log file path.
+    :param max_bytes: The maximum file size. If 0 the file is not rotated.
+    :param backup_count: The number of the rotated files kept.
+    :param compress: Compress the rotated files.
+    :param collapse: Collapse the repeated command outputs.
+    """
+    def __init__(self, filename, max_bytes=0, backup_count=5, compress=False, collapse=True):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.collapse = collapse
+        #: The number of the command outputs not written
+        self.collapsed = 0
+        self._lock = threading.RLock()
+        self._file = open(filename, "a")
+        self._size = self._file.tell()
+        self._partial = ""
+        self._block = None
+        self._last = None
+        self._suppressed = None
+        self._repeats = 0
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def write(self, text):
+        with self._lock:
+            if self._block is not None:
+                self._block.append(text)
+            else:
+                self._write(text)
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._write_marker()
+            self._write(self._partial, partial=True)
+            self._file.close()
+
+    def _write(self, text, partial=False):
+        # write only the complete lines so the password is always filtered
+        text = self._partial + text
+        if partial:
+            self._partial = ""
+        else:
+            index = text.rfind("\n") + 1
+            text, self._partial = text[:index], text[index:]
+        if not text:
+            return
+        lines = text.splitlines(True)
+        for index, line in enumerate(lines):
+            match = _PASSWORD_RE.search(line)
+            if match and match.group(1):
+                lines[index] = line.replace(match.group(1), "***")
+        text = "".join(lines)
+        self._file.write(text)
+        self._file.flush()
+        self._size += len(text)
+        if self.max_bytes and self._size >= self.max_bytes:
+            self._file.close()
+            rotate(self.filename, self.backup_count, self.compress)
+            self._file = open(self.filename, "a")
+            self._size = 0
+
+    def _write_marker(self):
+        if self._repeats:
+            self._write("\n[csmpe] The output above repeated {} time(s)\n".format(self._repeats))
+            self._repeats = 0
+
+    @staticmethod
+    def _fingerprint(name, text):
+        digest = hashlib.sha1(name.encode("utf-8"))
+        for line in text.splitlines():
+            # the timestamps only are ignored, the rest of the line may change between the polls
+            line = _TIMESTAMP_RE.sub("", line)
+            digest.update(line.encode("utf-8", "replace") if isinstance(line, unicode) else line)
+            digest.update(b"\n")
+        return digest.digest()
+
+    @contextmanager
+    def block(self, name):
+        """Buffer the session output written inside the with block as the output of the command name."""
+        with self._lock:
+            self._block = []
+        try:
+            yield
+        finally:
+            with self._lock:
+                text = "".join(self._block)
+                self._block = None
+                fingerprint = self._fingerprint(name, text)
+                if self.collapse and fingerprint == self._last:
+                    self._repeats += 1
+                    self.collapsed += 1
+                    self._suppressed = text
+                else:
+                    self._write_marker()
+                    self._write(text)
+                    self._last = fingerprint
+                    self._suppressed = None
+
+    def full_fidelity(self):
+        """Write the last collapsed output and stop collapsing the outputs."""
+        with self._lock:
+            if not self.collapse:
+                return
+            self.collapse = False
+            if self._suppressed is not None:
+                self._repeats -= 1
+                self._write_marker()
+                self._write(self._suppressed)
+                self._suppressed = None
@@ -0,0 +1,196 @@
+# =============================================================================
+# Storage
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import cPickle as pickle
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# The CSM storage scopes: host context data and install job data
+_SCOPES = ("data", "job_data")
+
+
+class WriteBehindStorage(object):
+    """Read-through cache and write-behind buffer in front of the CSM storage.
+
+    The saved values are served from the local cache and kept pending until :meth:`flush`.
+    The values saved many times are written to CSM once. The values loaded from CSM are cached,
+    so the next loads do not reach CSM. The object is shared by the additional device sessions.
+    """
+    def __init__(self, csm):
+        self._csm = csm
+        self._lock = threading.RLock()
+        self._cache = dict((scope, {}) for scope in _SCOPES)
+        self._pending = dict((scope, OrderedDict()) for scope in _SCOPES)
+
+    def save(self, scope, key, value):
+        with self._lock:
+            self._cache[scope][key] = value
+            self._pending[scope][key] = value
+
+    def load(self, scope, key):
+        """Return the (value, cached) tuple. The cached is False if the value was loaded from CSM."""
+        with self._lock:
+            if key in self._cache[scope]:
+                return self._cache[scope][key], True
+            value = getattr(self._csm, "load_" + scope)(key)
+            self._cache[scope][key] = value
+            return value, False
+
+    @property
+    def pending(self):
+        """The number of the values waiting to be written to CSM."""
+        with self._lock:
+            return sum(len(pending) for pending in self._pending.values())
+
+    def flush(self):
+        """Write the pending values to CSM. Returns the list of the written keys."""
+        written = []
+        with self._lock:
+            for scope in _SCOPES:
+                pending = self._pending[scope]
+                save = getattr(self._csm, "save_" + scope)
+                for key in list(pending):
+                    save(key, pending[key])
+                    del pending[key]
+                    written.append(key)
+        return written
+
+
+class MemoryStorage(object):
+    """Thread-safe in-memory key-value storage with the per-host namespaces.
+
+    The values are lost when the process exits. See :class:`SQLiteStorage` for the persistent storage.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._namespaces = {}
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            return self._namespaces.get(namespace, {}).get(key, default)
+
+    def set(self, namespace, key, value):
+        with self._lock:
+            self._namespaces.setdefault(namespace, {})[key] = value
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._namespaces.get(namespace, {}).pop(key, None)
+
+    def keys(self, namespace):
+        with self._lock:
+            return sorted(self._namespaces.get(namespace, {}))
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage(object):
+    """Key-value storage with the per-host namespaces persisted in the local SQLite database file.
+
+    The values are pickled, so any picklable plugin data can be stored. The recently used values
+    are kept in the in-memory LRU cache in front of the database. The cache is private to the
+    process, so the same host namespace must not be written by two processes at the same time.
+
+    :param filename: The database file path. The directory is created if needed.
+    :param cache_size: The maximum number of the values in the LRU cache. 0 disables the cache.
+    """
+    _SCHEMA = "CREATE TABLE IF NOT EXISTS storage (" \
+              "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB, timestamp REAL, " \
+              "PRIMARY KEY (namespace, key))"
+
+    def __init__(self, filename, cache_size=256):
+        directory = os.path.dirname(os.path.abspath(filename))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.filename = filename
+        self.cache_size = cache_size
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+        # the fleet worker processes may use the same file, so wait for the lock held by the other process
+        self._db = sqlite3.connect(filename, timeout=60, check_same_thread=False)
+        with self._db:
+            self._db.execute(self._SCHEMA)
+
+    def _remember(self, item, value):
+        if not self.cache_size:
+            return
+        self._cache.pop(item, None)
+        self._cache[item] = value
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, namespace, key, default=None):
+        item = (namespace, key)
+        with self._lock:
+            if item in self._cache:
+                value = self._cache.pop(item)
+                self._cache[item] = value
+                return value
+            row = self._db.execute("SELECT value FROM storage WHERE namespace = ? AND key = ?", item).fetchone()
+            if row is None:
+                return default
+            value = pickle.loads(str(row[0]))
+            self._remember(item, value)
+            return value
+
+    def set(self, namespace, key, value):
+        item = (namespace, key)
+        data = sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO storage (namespace, key, value, timestamp) "
+                                 "VALUES (?, ?, ?, ?)", (namespace, key, data, time.time()))
+            self._remember(item, value)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM storage WHERE namespace = ? AND key = ?", (namespace, key))
+            self._cache.pop((namespace, key), None)
+
+    def keys(self, namespace):
+        with self._lock:
+            rows = self._db.execute("SELECT key FROM storage WHERE namespace = ? ORDER BY key", (namespace,))
+            return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+            self._cache.clear()
+
+
+def open_storage(filename=None, cache_size=256):
+    """Return the :class:`SQLiteStorage` for the file or the :class:`MemoryStorage` if no file name is provided."""
+    if filename:
+        return SQLiteStorage(filename, cache_size=cache_size)
+    return MemoryStorage()
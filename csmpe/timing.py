@@ -0,0 +1,122 @@
+# =============================================================================
+# Timing trace
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_FILENAME = "trace.json"
+
+
+class Tracer(object):
+    """Records the timing of the plugins, device commands and waits.
+
+    The events are stored in the Chrome trace event format and can be loaded in
+    chrome://tracing or https://ui.perfetto.dev. Each thread, i.e. the additional
+    device session, is shown as a separate track.
+    """
+    def __init__(self, process_name="csmpe"):
+        self.process_name = process_name
+        self.pid = os.getpid()
+        self.start = time.time()
+        self._events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def _timestamp(self, value):
+        # microseconds since the tracer start
+        return int((value - self.start) * 1000000)
+
+    def add(self, name, category, begin, end, args=None):
+        """Add the complete event which started at begin and finished at end time."""
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': "X",
+            'ts': self._timestamp(begin),
+            'dur': self._timestamp(end) - self._timestamp(begin),
+            'pid': self.pid,
+            'tid': thread.ident,
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._threads[thread.ident] = thread.name
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name, category, **args):
+        """Record the duration of the with block. The yielded args dictionary may be updated
+        inside the block, i.e. with the command output size."""
+        begin = time.time()
+        try:
+            yield args
+        except Exception as e:
+            args['error'] = "{}: {}".format(e.__class__.__name__, e)
+            raise
+        finally:
+            self.add(name, category, begin, time.time(), args)
+
+    @property
+    def events(self):
+        with self._lock:
+            return list(self._events)
+
+    def save(self, filename):
+        """Save the trace events to the JSON file."""
+        with self._lock:
+            events = [{'name': "process_name", 'ph': "M", 'pid': self.pid, 'tid': 0,
+                       'args': {'name': self.process_name}}]
+            for tid, name in self._threads.items():
+                events.append({'name': "thread_name", 'ph': "M", 'pid': self.pid, 'tid': tid,
+                               'args': {'name': name}})
+            events.extend(self._events)
+
+        data = {
+            'traceEvents': events,
+            'displayTimeUnit': "ms",
+            'otherData': {'start': self.start},
+        }
+        with open(filename, "w") as f:
+            json.dump(data, f)
+
+
+def traced(category="wait"):
+    """Decorator recording the duration of the function taking the plugin context as the first argument."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(ctx, *args, **kwargs):
+            with ctx.trace(func.__name__, category):
+                return func(ctx, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,190 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import random
+import re
+import timeit
+from unittest import TestCase
+
+from csmpe.core_plugins.csm_install_operations.ios_xr.satellite_lib import SatelliteIdSet
+
+
+def build_satellite_list(satellite_ids):
+    """The previous implementation used as the benchmark reference."""
+    L = []
+    input_list = satellite_ids.split(',')
+    for item in input_list:
+        if '-' in item:
+            m = re.search(r'(\w+)-(\w+)', item)
+            arg1 = int(m.group(1))
+            arg2 = int(m.group(2)) + 1
+            ilist = range(arg1, arg2)
+            slist = []
+            for i in ilist:
+                slist.append(str(i))
+            L = L + slist
+        else:
+            L.append(item)
+    return L
+
+
+def build_new_argument(L):
+    """The previous implementation used as the benchmark reference."""
+    LI = [int(x) for x in L]
+    LI.sort()
+    lrange = len(LI) - 1
+    if lrange == 0:
+        return str(LI[0])
+    arg = str(LI[0])
+    id = 1
+    nexts = ''
+    while id < lrange:
+        if LI[id - 1] + 1 == LI[id]:
+            nexts = '-'
+        else:
+            if nexts == '-':
+                arg = arg + '-' + str(LI[id - 1]) + ',' + str(LI[id])
+                nexts = ''
+            else:
+                arg = arg + ',' + str(LI[id])
+        id += 1
+    id = lrange
+    if LI[id - 1] + 1 == LI[id]:
+        if nexts == '-':
+            arg = arg + '-' + str(LI[id])
+        else:
+            arg = arg + ',' + str(LI[id])
+    else:
+        if nexts == '-':
+            arg = arg + '-' + str(LI[id - 1]) + ',' + str(LI[id])
+        else:
+            arg = arg + ',' + str(LI[id])
+    return arg
+
+
+def random_ids(rnd, size=200, maximum=1000):
+    return set(rnd.randint(100, maximum) for _ in range(rnd.randint(0, size)))
+
+
+def cli_syntax(rnd, ids):
+    """Return the satellite IDs in the CLI syntax with random ranges, duplicates and order."""
+    items = []
+    for satellite_id in ids:
+        if rnd.random() < 0.3:
+            last = satellite_id + rnd.randint(0, 3)
+            items.append("{}-{}".format(satellite_id, last))
+        else:
+            items.append(str(satellite_id))
+    rnd.shuffle(items)
+    return ','.join(items)
+
+
+def expand(text):
+    return set(int(x) for x in build_satellite_list(text)) if text else set()
+
+
+class TestSatelliteIdSet(TestCase):
+    def test_parse_format(self):
+        ids = SatelliteIdSet.parse('100-102,105,106-109,110,160-164,319-320')
+        self.assertEqual(ids.format(), '100-102,105-110,160-164,319-320')
+        self.assertEqual(ids.ranges, [(100, 102), (105, 110), (160, 164), (319, 320)])
+        self.assertEqual(len(ids), 16)
+        self.assertEqual(str(SatelliteIdSet.parse(u' 161 , 160,')), '160-161')
+        self.assertEqual(SatelliteIdSet.parse('').format(), '')
+        self.assertFalse(SatelliteIdSet.parse(''))
+        self.assertEqual(SatelliteIdSet.from_ids(['163', 160, 161]).format(), '160-161,163')
+        self.assertIn(105, ids)
+        self.assertNotIn(104, ids)
+        self.assertNotIn(99, ids)
+        self.assertNotIn(321, ids)
+
+    def test_invalid(self):
+        for text in ('100-abc', '100-', 'abc', '105-100'):
+            with self.assertRaises(ValueError):
+                SatelliteIdSet.parse(text)
+
+    def test_set_operations(self):
+        a = SatelliteIdSet.parse('100-110,120-130')
+        b = SatelliteIdSet.parse('105-122,130-140')
+        self.assertEqual(str(a - b), '100-104,123-129')
+        self.assertEqual(str(a & b), '105-110,120-122,130')
+        self.assertEqual(str(a | b), '100-140')
+        self.assertEqual(a - a, SatelliteIdSet())
+
+    def test_properties(self):
+        rnd = random.Random(2016)
+        for _ in range(300):
+            a, b = random_ids(rnd), random_ids(rnd)
+            text_a, text_b = cli_syntax(rnd, a), cli_syntax(rnd, b)
+            set_a, set_b = SatelliteIdSet.parse(text_a), SatelliteIdSet.parse(text_b)
+            expanded_a, expanded_b = expand(text_a), expand(text_b)
+
+            # the same IDs as the previous implementation
+            self.assertEqual(set(set_a), expanded_a)
+            self.assertEqual(len(set_a), len(expanded_a))
+            self.assertEqual(list(set_a), sorted(expanded_a))
+
+            # the ranges are sorted, disjoint and not adjacent
+            ranges = set_a.ranges
+            for (first, last), (next_first, _) in zip(ranges, ranges[1:]):
+                self.assertLess(last + 1, next_first)
+            self.assertTrue(all(first <= last for first, last in ranges))
+
+            # the formatted set parses to the same set and is accepted by the previous implementation
+            self.assertEqual(SatelliteIdSet.parse(set_a.format()), set_a)
+            if expanded_a:
+                self.assertEqual(expand(build_new_argument(list(set_a))), expanded_a)
+
+            self.assertEqual(set(set_a - set_b), expanded_a - expanded_b)
+            self.assertEqual(set(set_a & set_b), expanded_a & expanded_b)
+            self.assertEqual(set(set_a | set_b), expanded_a | expanded_b)
+            self.assertEqual(SatelliteIdSet.from_ids(expanded_a & expanded_b), set_a & set_b)
+
+            for satellite_id in range(95, 1010, 7):
+                self.assertEqual(satellite_id in set_a, satellite_id in expanded_a)
+
+    def test_benchmark(self):
+        # thousands of satellite IDs in the short ranges
+        text = ','.join("{}-{}".format(first, first + 2) for first in range(100, 20000, 5))
+        done = [str(x) for x in range(100, 20000, 7)]
+
+        def previous():
+            L = build_satellite_list(text)
+            finished = set(done)
+            L = [x for x in L if x not in finished]
+            return build_new_argument(L)
+
+        def current():
+            return (SatelliteIdSet.parse(text) - SatelliteIdSet.from_ids(done)).format()
+
+        self.assertEqual(SatelliteIdSet.parse(previous()), SatelliteIdSet.parse(current()))
+        timings = {}
+        for name, function in (("previous", previous), ("range set", current)):
+            timings[name] = min(timeit.repeat(function, repeat=3, number=1))
+        self.assertLess(timings['range set'], timings['previous'])
@@ -0,0 +1,143 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+from unittest import TestCase
+
+from csmpe.context import PluginContext
+from csmpe.core_plugins.csm_install_operations.ios_xr.satellite_lib import parse_satellite_status, \
+    diff_satellite_status, format_satellite_status, collect_satellite_status
+
+SHOW_NV_SATELLITE_STATUS = """
+Mon Oct 17 10:11:12.345 UTC
+Satellite 160
+-------------
+  Status: Connected (Stable)
+  Redundancy: Active (Group: 100)
+  Type: ncs5002
+  Displayed device name: Sat160
+  Remote version: Compatible (latest version)
+    XR: 6.2.25.05I (Latest)
+  Configured satellite fabric links:
+    HundredGigE0/18/0/4
+    -------------------
+      Status: Satellite Ready
+      Remote ports: TenGigE0/0/0-70
+
+Satellite 161
+-------------
+  Status: Connected (Transferring new image)
+  Redundancy: Active (Group: 100)
+  Type: ncs5002
+  Displayed device name: Sat161
+  Remote version: Compatible (older version)
+    IOFPGA: 0.17
+    XR: 6.2.25.03I (Available: 6.2.25.05I)
+  Configured satellite fabric links:
+    HundredGigE0/18/0/5
+    -------------------
+      Status: Satellite Ready
+      Remote ports: TenGigE0/0/0-70
+
+Satellite 1000
+--------------
+  Status: Discovery Stalled; Conflict: interface is down
+  Type: ncs5002
+  Configured satellite fabric links:
+    HundredGigE0/18/0/6
+    -------------------
+      Status: Discovery Stalled; Conflict: interface is down
+      Remote ports: TenGigE0/0/0-70
+"""
+
+
+class FakeConnection(object):
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.sent = []
+
+    def send(self, cmd="", timeout=300, wait_for_string=None, password=False):
+        self.sent.append(cmd)
+        return self.outputs.pop(0)
+
+    def disconnect(self):
+        pass
+
+    def finalize(self):
+        pass
+
+
+class TestSatelliteStatus(TestCase):
+    def test_parse(self):
+        satellites = parse_satellite_status(SHOW_NV_SATELLITE_STATUS)
+        self.assertEqual(sorted(satellites), [160, 161, 1000])
+
+        self.assertEqual(satellites[160].status, "Connected (Stable)")
+        self.assertTrue(satellites[160].connected)
+        self.assertFalse(satellites[160].new_image_available)
+
+        self.assertEqual(satellites[161].status, "Connected (Transferring new image)")
+        self.assertEqual(satellites[161].type, "ncs5002")
+        self.assertTrue(satellites[161].new_image_available)
+        self.assertTrue(satellites[161].text.startswith("Satellite 161\n"))
+        self.assertNotIn("Satellite 1000", satellites[161].text)
+
+        self.assertFalse(satellites[1000].connected)
+        self.assertEqual(parse_satellite_status(""), {})
+
+    def test_diff(self):
+        previous = parse_satellite_status(SHOW_NV_SATELLITE_STATUS)
+        current = parse_satellite_status(SHOW_NV_SATELLITE_STATUS.replace(
+            "Transferring new image", "New image transferred").replace("Satellite 160", "Satellite 162"))
+        self.assertEqual(diff_satellite_status(previous, current), [
+            (160, "Connected (Stable)", None),
+            (161, "Connected (Transferring new image)", "Connected (New image transferred)"),
+            (162, None, "Connected (Stable)"),
+        ])
+        self.assertEqual(diff_satellite_status(previous, previous), [])
+
+    def test_format(self):
+        satellites = parse_satellite_status(SHOW_NV_SATELLITE_STATUS)
+        status = format_satellite_status("Transferring Satellite Image", satellites, [161, 170])
+        self.assertEqual(status.splitlines()[2:4], ["161     ncs5002    Connected (Transferring new image)",
+                                                    "170                No information"])
+        self.assertTrue(status.endswith("</pre>"))
+
+    def test_collect_polls_device(self):
+        connection = FakeConnection([SHOW_NV_SATELLITE_STATUS, SHOW_NV_SATELLITE_STATUS.replace(
+            "Transferring new image", "New image transferred")])
+        ctx = PluginContext()
+        ctx._connection = connection
+        ctx.enable_command_cache(ttl=60)
+        try:
+            collect_satellite_status(ctx)
+            satellites = collect_satellite_status(ctx)
+        finally:
+            ctx.finalize()
+        self.assertEqual(len(connection.sent), 2)
+        self.assertEqual(satellites[161].status, "Connected (New image transferred)")
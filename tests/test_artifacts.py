@@ -0,0 +1,81 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from csmpe.artifacts import ArtifactStore
+
+CONFIG = "".join("interface GigabitEthernet0/0/0/{}\n shutdown\n!\n".format(index) for index in range(1000))
+
+
+class TestArtifactStore(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = ArtifactStore(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_dedupe(self):
+        first = self.store.put(CONFIG, "R1", "Pre-Upgrade", "show-running-config.txt")
+        second = self.store.put(CONFIG, "R1", "Post-Upgrade", "show-running-config.txt")
+        third = self.store.put(CONFIG, "R2", "Pre-Upgrade", "show-running-config.txt")
+        other = self.store.put("other", "R2", "Post-Upgrade", "show-running-config.txt")
+        self.assertEqual(len({first, second, third}), 1)
+        self.assertNotEqual(first, other)
+        self.assertEqual(self.store.get(first), CONFIG)
+        self.assertEqual(self.store.get(other), "other")
+
+        stats = self.store.stats()
+        self.assertEqual((stats['entries'], stats['blobs']), (4, 2))
+        self.assertEqual(stats['size'], len(CONFIG) * 3 + len("other"))
+        self.assertLess(stats['stored_size'], len(CONFIG) / 10)
+        self.assertEqual([name for name in os.listdir(os.path.join(self.root, "blobs")) if name.startswith(".")], [])
+
+    def test_lookup(self):
+        pre = self.store.put("pre", "R1", "Pre-Upgrade", "cmd.txt")
+        post = self.store.put("post", "R1", "Post-Upgrade", "cmd.txt")
+        self.assertEqual(self.store.lookup("R1", "cmd.txt", "Pre-Upgrade"), pre)
+        self.assertEqual(self.store.lookup("R1", "cmd.txt"), post)
+        self.assertIsNone(self.store.lookup("R2", "cmd.txt"))
+
+    def test_streaming_writer(self):
+        writer = self.store.open("R1", "Pre-Upgrade", "cmd.txt")
+        for start in range(0, len(CONFIG), 1000):
+            writer.write(CONFIG[start:start + 1000])
+        writer.close()
+        self.assertEqual(writer.digest, self.store.put(CONFIG, "R1", "Post-Upgrade", "cmd.txt"))
+        self.assertEqual(self.store.get(writer.digest), CONFIG)
+
+    def test_compression(self):
+        with self.assertRaises(ValueError):
+            ArtifactStore(self.root, compression="gzip")
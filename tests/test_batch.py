@@ -0,0 +1,228 @@
+# =============================================================================
+# Batch tests
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import re
+from unittest import TestCase
+
+import pexpect
+from condoor import CommandSyntaxError
+
+from csmpe.batch import BatchParser, read_only, send_batch
+from csmpe.context import PluginContext
+
+PROMPT = "RP/0/RSP0/CPU0:host#"
+PROMPT_RE = re.compile(r"[\r\n]RP/0/RSP0/CPU0:host#", re.MULTILINE)
+
+CMDS = ["admin show install inactive summary",
+        "admin show install active summary",
+        "admin show install committed summary"]
+
+OUTPUTS = ["Inactive Packages:\r\n    disk0:asr9k-px-6.1.3.CSCvc12345-1.0.0\r\n",
+           "Active Packages:\r\n    disk0:asr9k-mini-px-6.1.3\r\n    disk0:asr9k-mpls-px-6.1.3\r\n",
+           "Committed Packages:\r\n    disk0:asr9k-mini-px-6.1.3\r\n"]
+
+
+def device_output(cmds, outputs):
+    """Return the session output of the commands sent without waiting for the prompt."""
+    data = ""
+    for cmd, output in zip(cmds, outputs):
+        data += cmd + "\r\n" + output + PROMPT
+    return data
+
+
+class FakeSession(object):
+    string_type = str
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.buffer = ""
+        self.after = "\r\n" + PROMPT
+        self.sent = []
+
+    def read_nonblocking(self, size, timeout):
+        if not self.chunks:
+            raise pexpect.TIMEOUT("timeout")
+        return self.chunks.pop(0)
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+class FakeCtrl(object):
+    def __init__(self, session):
+        self._session = session
+
+
+class FakeDriver(object):
+    more_re = re.compile(" --More-- ")
+    syntax_error_re = re.compile(r"% Invalid input detected")
+
+
+class FakeDevice(object):
+    hostname = "host"
+    connected = True
+    prompt_re = PROMPT_RE
+    driver = FakeDriver()
+
+    def __init__(self, session):
+        self.ctrl = FakeCtrl(session)
+
+
+class FakeChain(object):
+    def __init__(self, session):
+        self.target_device = FakeDevice(session)
+
+
+class FakeConnection(object):
+    is_console = False
+
+    def __init__(self, chunks):
+        self.session = FakeSession(chunks)
+        self._chain = FakeChain(self.session)
+        self.commands = []
+
+    def send(self, cmd="", timeout=300, wait_for_string=None, password=False):
+        self.commands.append(cmd)
+        return "\n" + OUTPUTS[CMDS.index(cmd)].replace("\r", "") if cmd in CMDS else "\n"
+
+    def disconnect(self):
+        pass
+
+
+def expected(outputs):
+    return ["\n" + output.replace("\r", "") for output in outputs]
+
+
+def chunked(data, size=17):
+    return [data[index:index + size] for index in range(0, len(data), size)]
+
+
+class TestBatch(TestCase):
+    def test_read_only(self):
+        self.assertTrue(read_only("show install active"))
+        self.assertTrue(read_only("admin show install active summary"))
+        self.assertFalse(read_only("install activate disk0:asr9k-px-6.1.3.CSCvc12345-1.0.0"))
+        self.assertFalse(read_only("admin"))
+        self.assertFalse(read_only("show"))
+
+    def test_parser(self):
+        parser = BatchParser(CMDS, PROMPT_RE)
+        self.assertFalse(parser.feed("\r\n" + PROMPT))
+        for chunk in chunked(device_output(CMDS, OUTPUTS), 5):
+            parser.feed(chunk)
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.outputs, expected(OUTPUTS))
+
+    def test_parser_separate_echo(self):
+        data = CMDS[0] + "\r\n" + OUTPUTS[0] + PROMPT + "\r\n" + CMDS[1] + "\r\n" + OUTPUTS[1] + PROMPT
+        parser = BatchParser(CMDS[:2], PROMPT_RE)
+        self.assertTrue(parser.feed(data))
+        self.assertEqual(parser.outputs, expected(OUTPUTS[:2]))
+
+    def test_send_batch(self):
+        connection = FakeConnection(chunked(device_output(CMDS, OUTPUTS)))
+        self.assertEqual(send_batch(connection, CMDS), expected(OUTPUTS))
+        self.assertEqual(connection.session.sent, ["".join(cmd + "\n" for cmd in CMDS)])
+
+    def test_more(self):
+        more = OUTPUTS[1].index("    disk0:asr9k-mpls")
+        data = device_output(CMDS[:1], OUTPUTS[:1]) + CMDS[1] + "\r\n" + OUTPUTS[1][:more] + " --More-- "
+        connection = FakeConnection([data, OUTPUTS[1][more:] + PROMPT])
+        self.assertEqual(send_batch(connection, CMDS[:2]), expected(OUTPUTS[:2]))
+        self.assertEqual(connection.session.sent[1:], [" "])
+
+    def test_syntax_error(self):
+        outputs = [OUTPUTS[0], "           ^\r\n% Invalid input detected at '^' marker.\r\n"]
+        connection = FakeConnection(chunked(device_output(CMDS[:2], outputs)))
+        with self.assertRaises(CommandSyntaxError) as context:
+            send_batch(connection, CMDS[:2])
+        self.assertEqual(context.exception.command, CMDS[1])
+
+    def test_unknown_prompt(self):
+        connection = FakeConnection(chunked(device_output(CMDS, OUTPUTS)))
+        connection.session.after = "\r\nsysadmin-vm:0_RP0#"
+        self.assertIsNone(send_batch(connection, CMDS))
+        self.assertEqual(connection.session.sent, [])
+
+    def test_typeahead_discarded(self):
+        # the device prints the prompt and never echoes the remaining commands
+        connection = FakeConnection([CMDS[0] + "\r\n" + OUTPUTS[0] + PROMPT])
+        self.assertEqual(send_batch(connection, CMDS), expected(OUTPUTS[:1]))
+
+
+class TestContextSendBatch(TestCase):
+    def setUp(self):
+        self.ctx = PluginContext()
+
+    def tearDown(self):
+        self.ctx._connection = None
+        self.ctx.finalize()
+
+    def test_batch(self):
+        self.ctx._connection = FakeConnection(chunked(device_output(CMDS, OUTPUTS)))
+        self.assertEqual(self.ctx.send_batch(CMDS), expected(OUTPUTS))
+        self.assertEqual(self.ctx._connection.commands, [])
+        event = self.ctx._tracer.events[-1]
+        self.assertEqual(event['args']['batch'], 3)
+
+    def test_cached(self):
+        self.ctx.enable_command_cache()
+        self.ctx._command_cache.put(CMDS[1], "cached")
+        self.ctx._connection = FakeConnection(chunked(device_output(CMDS[::2], OUTPUTS[::2])))
+        outputs = self.ctx.send_batch(CMDS)
+        self.assertEqual(outputs, [expected(OUTPUTS)[0], "cached", expected(OUTPUTS)[2]])
+        self.assertEqual(self.ctx._command_cache.get(CMDS[2]), expected(OUTPUTS)[2])
+
+    def test_sequential_fallback(self):
+        self.ctx._connection = FakeConnection([CMDS[0] + "\r\n" + OUTPUTS[0] + PROMPT])
+        self.assertEqual(self.ctx.send_batch(CMDS), expected(OUTPUTS))
+        self.assertEqual(self.ctx._connection.commands, CMDS[1:])
+        self.assertTrue(self.ctx._batch_disabled)
+
+        # the device discarding the type-ahead commands is not sent the batch again
+        self.assertEqual(self.ctx.send_batch(CMDS), expected(OUTPUTS))
+        self.assertEqual(self.ctx._connection.session.sent, ["".join(cmd + "\n" for cmd in CMDS)])
+
+    def test_unknown_prompt_fallback(self):
+        self.ctx._connection = FakeConnection([])
+        self.ctx._connection.session.after = "\r\nsysadmin-vm:0_RP0#"
+        self.assertEqual(self.ctx.send_batch(CMDS), expected(OUTPUTS))
+        self.assertEqual(self.ctx._connection.commands, CMDS)
+        self.assertFalse(self.ctx._batch_disabled)
+
+    def test_unsafe(self):
+        self.ctx._connection = FakeConnection([])
+        self.ctx._connection.is_console = True
+        self.assertEqual(self.ctx.send_batch(CMDS), expected(OUTPUTS))
+        self.assertEqual(self.ctx._connection.commands, CMDS)
+
+        self.ctx = PluginContext()
+        self.ctx._connection = FakeConnection([])
+        self.ctx.send_batch([CMDS[0], "admin", CMDS[1]])
+        self.assertEqual(self.ctx._connection.session.sent, [])
@@ -0,0 +1,152 @@
+# =============================================================================
+# Session broker tests
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from csmpe.broker import SessionBroker, BrokerError, request, ping
+
+
+class FakeConnection(object):
+    def __init__(self, hostname, urls, log_dir):
+        self.hostname = hostname
+        self.connection_chains = None
+        self.is_connected = False
+        self.healthy = True
+        self.disconnects = 0
+        self._log_dir = log_dir
+
+    def connect(self):
+        self.connection_chains = [[self.hostname]]
+        self.is_connected = True
+
+    def send(self, cmd="", timeout=300):
+        if not self.healthy:
+            raise IOError("connection closed")
+        return ""
+
+    def disconnect(self):
+        self.disconnects += 1
+        self.is_connected = False
+
+    def finalize(self):
+        pass
+
+    def _enable_logging(self, logfile, tracefile):
+        pass
+
+    def resume_session_logging(self):
+        pass
+
+
+def fake_runner(request, connection):
+    time.sleep(request.get('delay', 0))
+    if not connection.is_connected:
+        connection.connect()
+    return {'phase': request['phase'], 'success': True, 'results': [connection._log_dir], 'error': None,
+            'connection': id(connection)}
+
+
+class TestSessionBroker(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, "broker.sock")
+        self.server = SessionBroker(self.socket_path, log_dir=self.directory, idle_timeout=60, health_interval=60,
+                                    connection_factory=FakeConnection, runner=fake_runner)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05})
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def run_phase(self, phase, hostname="R1", delay=0):
+        return request({
+            'command': "run",
+            'host': {'hostname': hostname, 'urls': ["telnet://user:pass@{}".format(hostname)]},
+            'phase': phase,
+            'log_dir': os.path.join(self.directory, phase),
+            'delay': delay,
+        }, self.socket_path)
+
+    def test_concurrent_hosts(self):
+        threads = [threading.Thread(target=self.run_phase, args=("Add", hostname, 0.5)) for hostname in ("R1", "R2")]
+        begin = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.time() - begin, 0.9)
+
+    def test_reuse(self):
+        results = [self.run_phase(phase) for phase in ("Pre-Upgrade", "Add", "Activate")]
+        self.assertEqual([result['session_reused'] for result in results], [False, True, True])
+        self.assertEqual(len(set(result['connection'] for result in results)), 1)
+        self.assertEqual(results[1]['results'], [os.path.join(self.directory, "Add")])
+        self.assertFalse(self.run_phase("Add", hostname="R2")['session_reused'])
+
+        status = request({'command': "status"}, self.socket_path)
+        self.assertEqual(sorted(session['hostname'] for session in status['sessions']), ["R1", "R2"])
+        self.assertEqual(sorted(session['jobs'] for session in status['sessions']), [1, 3])
+
+    def test_health_check(self):
+        self.run_phase("Pre-Upgrade")
+        session = self.server._sessions.values()[0]
+        self.server.check_sessions()
+        self.assertEqual(len(self.server._sessions), 1)
+
+        session.connection.healthy = False
+        self.server.check_sessions()
+        self.assertEqual(len(self.server._sessions), 0)
+        self.assertEqual(session.connection.disconnects, 1)
+        self.assertFalse(self.run_phase("Add")['session_reused'])
+
+    def test_idle_timeout(self):
+        self.run_phase("Pre-Upgrade")
+        session = self.server._sessions.values()[0]
+        session.last_used -= 120
+        self.server.check_sessions()
+        self.assertEqual(len(self.server._sessions), 0)
+        self.assertEqual(session.connection.disconnects, 1)
+
+    def test_errors(self):
+        self.assertTrue(ping(self.socket_path))
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o077, 0)
+        with self.assertRaises(BrokerError):
+            request({'command': "unknown"}, self.socket_path)
+        with self.assertRaises(BrokerError):
+            SessionBroker(self.socket_path)
+        with self.assertRaises(BrokerError):
+            request({'command': "status"}, os.path.join(self.directory, "missing.sock"))
@@ -0,0 +1,132 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import re
+import shutil
+import tempfile
+from unittest import TestCase
+
+from condoor import CommandSyntaxError
+
+from csmpe.capture import Capture, stream_command
+
+PROMPT = "RP/0/RSP0/CPU0:host#"
+
+
+class FakeSession(object):
+    string_type = str
+
+    def __init__(self, chunks, buffer=""):
+        self.chunks = list(chunks)
+        self.buffer = buffer
+        self.sent = []
+
+    def read_nonblocking(self, size, timeout):
+        return self.chunks.pop(0)
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+class FakeCtrl(object):
+    def __init__(self, session):
+        self._session = session
+
+    def send_command(self, cmd, password=False):
+        self._session.sent.append(cmd)
+
+
+class FakeDriver(object):
+    more_re = re.compile(" --More-- ")
+    syntax_error_re = re.compile(r"% Invalid input detected")
+
+
+class FakeDevice(object):
+    hostname = "host"
+    connected = True
+    prompt_re = re.compile(r"[\r\n]RP/0/RSP0/CPU0:host#", re.MULTILINE)
+    driver = FakeDriver()
+
+    def __init__(self, session):
+        self.ctrl = FakeCtrl(session)
+
+
+class FakeChain(object):
+    def __init__(self, session):
+        self.target_device = FakeDevice(session)
+
+
+class FakeConnection(object):
+    def __init__(self, chunks, buffer=""):
+        self.session = FakeSession(chunks, buffer)
+        self._chain = FakeChain(self.session)
+
+
+class TestCapture(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "output.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.filename) as f:
+            return f.read()
+
+    def test_stream(self):
+        lines = ["line {}\n".format(index) for index in range(1000)]
+        data = "\r\n".join(line.rstrip("\n") for line in lines) + "\r\n" + PROMPT
+        chunks = [data[index:index + 37] for index in range(5, len(data), 37)]
+        connection = FakeConnection(chunks, buffer=data[:5])
+        with Capture(self.filename, tail=3) as capture:
+            self.assertTrue(stream_command(connection, "show run", capture))
+        self.assertEqual(self.read(), "".join(lines))
+        self.assertEqual(capture.tail, "".join(lines[-3:]))
+        self.assertEqual(capture.lines, 1000)
+        self.assertEqual(capture.size, len("".join(lines)))
+
+    def test_more_and_filter(self):
+        connection = FakeConnection(["interface Gi0/0\n ipv4 address 1.1.1.1\n --More-- ",
+                                     "interface Gi0/1\n shutdown\n" + PROMPT])
+        with Capture(self.filename, line_filter="^interface") as capture:
+            stream_command(connection, "show run", capture)
+        self.assertEqual(self.read(), "interface Gi0/0\ninterface Gi0/1\n")
+        self.assertEqual(connection.session.sent, ["show run", " "])
+
+    def test_syntax_error(self):
+        connection = FakeConnection(["\n        ^\n% Invalid input detected at '^' marker.\n" + PROMPT])
+        with self.assertRaises(CommandSyntaxError):
+            with Capture(self.filename) as capture:
+                stream_command(connection, "show foo", capture)
+
+    def test_not_supported(self):
+        with Capture(self.filename) as capture:
+            self.assertFalse(stream_command(object(), "show run", capture))
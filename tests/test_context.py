@@ -25,3 +25,234 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from Queue import Queue
+
+from csmpe.command_cache import CommandCache
+from csmpe.context import PluginContext
+from csmpe.queue_logging import QueueHandler, QueueListener, BatchedCall
+from csmpe.storage import WriteBehindStorage
+from csmpe.timing import Tracer, traced
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.sent = []
+
+    def send(self, cmd="", timeout=300, wait_for_string=None, password=False):
+        self.sent.append(cmd)
+        return "output of {}".format(cmd)
+
+    def disconnect(self):
+        pass
+
+    def finalize(self):
+        pass
+
+
+@traced("wait")
+def wait_for_something(ctx, seconds):
+    ctx.sleep(seconds)
+    return True
+
+
+class TestTiming(TestCase):
+    def setUp(self):
+        self.ctx = PluginContext()
+        self.ctx._connection = FakeConnection()
+
+    def tearDown(self):
+        self.ctx.finalize()
+
+    def test_send(self):
+        self.assertEqual(self.ctx.send("show version", timeout=10), "output of show version")
+        self.ctx.send("secret", password=True)
+        events = self.ctx._tracer.events
+        self.assertEqual([event['name'] for event in events], ["show version", "<password>"])
+        self.assertEqual(events[0]['cat'], "command")
+        self.assertEqual(events[0]['args'], {'timeout': 10, 'bytes': len("output of show version")})
+
+    def test_wait(self):
+        self.assertTrue(wait_for_something(self.ctx, 0.01))
+        sleep, wait = self.ctx._tracer.events
+        self.assertEqual((sleep['name'], sleep['cat']), ("sleep", "wait"))
+        self.assertEqual((wait['name'], wait['cat']), ("wait_for_something", "wait"))
+        self.assertGreaterEqual(wait['dur'], sleep['dur'])
+        self.assertGreaterEqual(sleep['dur'], 10000)
+
+    def test_save(self):
+        tracer = Tracer("host")
+        with self.assertRaises(ValueError):
+            with tracer.span("plugin", "plugin"):
+                raise ValueError("failed")
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "trace.json")
+            tracer.save(filename)
+            with open(filename) as f:
+                data = json.load(f)
+        finally:
+            shutil.rmtree(directory)
+        phases = [event['ph'] for event in data['traceEvents']]
+        self.assertEqual(phases, ["M", "M", "X"])
+        self.assertEqual(data['traceEvents'][-1]['args']['error'], "ValueError: failed")
+
+
+class TestCommandCache(TestCase):
+    def setUp(self):
+        self.ctx = PluginContext()
+        self.ctx._connection = FakeConnection()
+        self.ctx.enable_command_cache(ttl=60)
+
+    def tearDown(self):
+        self.ctx.finalize()
+
+    def test_cacheable(self):
+        self.assertTrue(CommandCache.cacheable("show version"))
+        self.assertTrue(CommandCache.cacheable("admin show install active summary"))
+        self.assertFalse(CommandCache.cacheable("install activate disk0:pkg"))
+        self.assertFalse(CommandCache.cacheable("admin"))
+        self.assertFalse(CommandCache.cacheable(""))
+
+    def test_read_through(self):
+        for _ in range(3):
+            self.assertEqual(self.ctx.send("show  version"), "output of show  version")
+        self.ctx.send("show version")
+        self.assertEqual(self.ctx._connection.sent, ["show  version"])
+        self.assertEqual(self.ctx.command_cache_stats['hits'], 3)
+        self.assertEqual(self.ctx.command_cache_stats['misses'], 1)
+
+    def test_invalidation(self):
+        self.ctx.send("show install active summary")
+        self.ctx.send("install commit")
+        self.ctx.send("show install active summary")
+        self.ctx.send("show install active summary", wait_for_string="#")
+        self.assertEqual(self.ctx._connection.sent, ["show install active summary", "install commit",
+                                                     "show install active summary", "show install active summary"])
+        self.assertEqual(self.ctx.command_cache_stats['invalidations'], 1)
+
+    def test_bypass(self):
+        self.ctx.send("show nv satellite status")
+        self.ctx.send("show nv satellite status", cache=False)
+        self.assertEqual(self.ctx.send("show nv satellite status"), "output of show nv satellite status")
+        self.assertEqual(self.ctx._connection.sent, ["show nv satellite status"] * 2)
+        self.assertEqual(self.ctx.command_cache_stats['hits'], 1)
+
+    def test_ttl(self):
+        self.ctx._command_cache.ttl = 0
+        self.ctx.send("show version")
+        self.ctx.send("show version")
+        self.assertEqual(len(self.ctx._connection.sent), 2)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+class TestQueueLogging(TestCase):
+    def test_listener(self):
+        queue = Queue(10)
+        target = ListHandler()
+        listener = QueueListener(queue, target)
+        listener.start()
+        logger = logging.getLogger("test.queue_logging")
+        logger.propagate = False
+        handler = QueueHandler(queue)
+        logger.addHandler(handler)
+        try:
+            args = ["a"]
+            for index in range(100):
+                logger.warning("message %d %s", index, args)
+            args.append("b")
+        finally:
+            logger.removeHandler(handler)
+            listener.stop()
+        self.assertEqual(target.messages, ["message {} ['a']".format(index) for index in range(100)])
+
+    def test_batched_call(self):
+        batches = []
+        batched = BatchedCall(batches.append, max_batch=10, interval=60)
+        for index in range(25):
+            batched.put(index)
+        batched.stop()
+        self.assertEqual(sum(batches, []), list(range(25)))
+        self.assertTrue(all(len(batch) <= 10 for batch in batches))
+        self.assertEqual(len(batches[0]), 10)
+
+
+class FakeCSM(object):
+    def __init__(self):
+        self.data = {}
+        self.job_data = {}
+        self.calls = []
+
+    def save_data(self, key, value):
+        self.calls.append(("save_data", key))
+        self.data[key] = value
+
+    def load_data(self, key):
+        self.calls.append(("load_data", key))
+        return self.data.get(key)
+
+    def save_job_data(self, key, value):
+        self.calls.append(("save_job_data", key))
+        self.job_data[key] = value
+
+    def load_job_data(self, key):
+        self.calls.append(("load_job_data", key))
+        return self.job_data.get(key)
+
+
+class TestStorage(TestCase):
+    def setUp(self):
+        self.csm = FakeCSM()
+        self.ctx = PluginContext()
+        self.ctx._storage = WriteBehindStorage(self.csm)
+
+    def tearDown(self):
+        self.ctx.finalize()
+
+    def test_write_behind(self):
+        for index in range(10):
+            self.ctx.save_job_data("package_change_list", [index])
+        self.ctx.save_data("isis_neighbors", "neighbors")
+        self.assertEqual(self.ctx.load_job_data("package_change_list")[0], [9])
+        self.assertEqual(self.csm.calls, [])
+        self.assertEqual(self.ctx._storage.pending, 2)
+
+        self.ctx.flush_storage()
+        self.assertEqual(self.csm.calls, [("save_data", "isis_neighbors"), ("save_job_data", "package_change_list")])
+        self.assertEqual(self.csm.job_data["package_change_list"][0], [9])
+        self.assertEqual(self.ctx._storage.pending, 0)
+
+    def test_read_through(self):
+        self.csm.job_data["fpd_type"] = ["all", 1.0]
+        for _ in range(5):
+            self.assertEqual(self.ctx.load_job_data("fpd_type"), ("all", 1.0))
+        self.assertEqual(self.ctx.load_job_data("missing"), (None, None))
+        self.assertFalse(self.ctx.has_job_data("missing"))
+        self.assertTrue(self.ctx.has_job_data("fpd_type"))
+        self.assertEqual(self.csm.calls, [("load_job_data", "fpd_type"), ("load_job_data", "missing")])
+
+    def test_produced(self):
+        self.csm.job_data["cli_show_inventory"] = ["stale", 1.0]
+        self.assertTrue(self.ctx.has_job_data("cli_show_inventory"))
+        self.assertFalse(self.ctx.produced_job_data("cli_show_inventory"))
+        self.ctx.save_job_data("cli_show_inventory", "current")
+        self.assertTrue(self.ctx.produced_job_data("cli_show_inventory"))
+
+    def test_finalize(self):
+        self.ctx.save_data("key", "value")
+        self.ctx.finalize()
+        self.assertEqual(self.csm.calls, [("save_data", "key")])
@@ -0,0 +1,169 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from unittest import TestCase
+
+from csmpe.csm_pm import CSMPluginManager, install_phases
+
+
+class PluginManagerTestCase(TestCase):
+    """The plugin manifest is written to the temporary cache directory."""
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.environ_cache_dir = os.environ.get("CSMPE_CACHE_DIR")
+        os.environ["CSMPE_CACHE_DIR"] = self.cache_dir
+        self.pm = CSMPluginManager(None, invoke_on_load=False)
+
+    def tearDown(self):
+        if self.environ_cache_dir is None:
+            del os.environ["CSMPE_CACHE_DIR"]
+        else:
+            os.environ["CSMPE_CACHE_DIR"] = self.environ_cache_dir
+        shutil.rmtree(self.cache_dir)
+
+
+class TestDispatchIndex(PluginManagerTestCase):
+
+    def expected(self, phase, family, os_type):
+        self.pm.set_phase_filter(phase)
+        self.pm.set_platform_filter(family)
+        self.pm.set_os_filter(os_type)
+        return sorted(name for name, metadata in self.pm.entries.items() if self.pm._match_metadata(metadata))
+
+    def test_plugins_for(self):
+        self.assertTrue(self.pm.entries)
+        for phase in install_phases + [None]:
+            for family in ["ASR9K", "NCS6K", "ASR900", "UNKNOWN", None]:
+                for os_type in ["XR", "eXR", "XE", "IOS", "UNKNOWN", None]:
+                    self.assertEqual(sorted(self.pm.plugins_for(phase, family, os_type)),
+                                     self.expected(phase, family, os_type),
+                                     "{} {} {}".format(phase, family, os_type))
+
+    def test_order(self):
+        names = self.pm.plugins_for("Pre-Upgrade")
+        plugin_names = [self.pm.entries[name]['name'] for name in names]
+        self.assertEqual(plugin_names, sorted(plugin_names))
+
+
+class FakeContext(object):
+    def __init__(self, job_data=()):
+        self.job_data = set(job_data)
+        self.warnings = []
+
+    def info(self, message):
+        pass
+
+    def warning(self, message):
+        self.warnings.append(message)
+
+    def produced_job_data(self, key):
+        return key in self.job_data
+
+
+class TestSchedule(PluginManagerTestCase):
+    def setUp(self):
+        super(TestSchedule, self).setUp()
+        self.pm._ctx = FakeContext(job_data=["inventory"])
+        self.pm._entries = {}
+
+    def add(self, name, requires=(), provides=()):
+        self.pm._entries[name] = {'name': name, 'requires': set(requires), 'provides': set(provides)}
+
+    def test_levels(self):
+        self.add("a", requires=["packages"])
+        self.add("b", provides=["packages"])
+        self.add("c")
+        self.add("d", requires=["packages", "inventory"], provides=["report"])
+        self.add("e", requires=["report"])
+        self.assertEqual(self.pm.schedule(["a", "b", "c", "d", "e"]), [["b", "c"], ["a", "d"], ["e"]])
+        self.assertEqual(self.pm.schedule(["e", "d", "c", "b", "a"]), [["c", "b"], ["d", "a"], ["e"]])
+
+    def test_cycle(self):
+        self.add("a", requires=["x"], provides=["y"])
+        self.add("b", requires=["y"], provides=["x"])
+        self.add("c", provides=["x"])
+        self.assertEqual(self.pm.schedule(["a", "b", "c"]), [["c"], ["a", "b"]])
+        self.assertEqual(len(self.pm._ctx.warnings), 1)
+
+    def test_outputs_available(self):
+        self.add("a", provides=["inventory"])
+        self.add("b", provides=["inventory", "packages"])
+        self.add("c")
+        self.assertEqual([name for name in "abc" if self.pm._outputs_available(name)], ["a"])
+
+
+class DispatchContext(FakeContext):
+    def __init__(self, phase):
+        super(DispatchContext, self).__init__()
+        self.phase = phase
+        self.errors = []
+
+    @contextmanager
+    def trace(self, name, kind, **attributes):
+        yield
+
+    def post_status(self, message):
+        pass
+
+    def error(self, message):
+        self.errors.append(message)
+
+    def finalize(self):
+        pass
+
+
+class TestDispatch(PluginManagerTestCase):
+    def setUp(self):
+        super(TestDispatch, self).setUp()
+        self.pm.set_platform_filter("ASR9K")
+        self.pm.set_os_filter("XR")
+        self.pm._dispatch = lambda ext, func: (self.pm._phase, ext.plugin.name)
+
+    def test_auto_pre_phase(self):
+        self.pm._ctx = DispatchContext("Activate")
+        results = self.pm.dispatch("run")
+        phases = [phase for phase, _ in results]
+        self.assertIn("Pre-Activate", phases)
+        self.assertEqual(phases, sorted(phases, key=lambda phase: phase != "Pre-Activate"))
+        self.assertIn(("Activate", "Install Activate Plugin"), results)
+        self.assertEqual(self.pm._ctx.errors, [])
+
+    def test_phase_without_plugins(self):
+        self.pm.set_os_filter("eXR")
+        for phase in ("Add", "Rollback"):
+            self.pm._ctx = DispatchContext(phase)
+            results = self.pm.dispatch("run")
+            self.assertNotIn("Pre-Add", [phase for phase, _ in results])
+            self.assertEqual(self.pm._ctx.warnings, [])
+            self.assertEqual(self.pm._ctx.errors, [])
+        self.assertEqual(results, [])
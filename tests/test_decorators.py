@@ -26,9 +26,11 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 # =============================================================================
 
+import timeit
+from functools import partial
 from unittest import TestCase, skip, skipIf
 
-from csmpe.decorators import delegate
+from csmpe.decorators import delegate, clear_delegate_cache
 
 
 class Delegate():
@@ -72,7 +74,94 @@ class TestDelegateDecorator(TestCase):
         self.assertEqual(dc.method3("10", arg2=20), ("10", 20))
 
 
+def partial_delegate(attribute_name, method_names, attribute_names=()):
+    """The previous implementation based on functools.partial used as the benchmark reference."""
+    def getter(attribute, name, instance):
+        return getattr(getattr(instance, attribute), name)
 
+    def setter(attribute, name, instance, value):
+        setattr(getattr(instance, attribute), name, value)
 
+    def caller(attribute, name):
+        return lambda self, *args, **kwargs: getter(attribute, name, self)(*args, **kwargs)
 
+    def decorator(cls):
+        for name in method_names:
+            setattr(cls, name, caller(attribute_name, name))
+        for name in attribute_names:
+            setattr(cls, name, property(partial(getter, attribute_name, name), partial(setter, attribute_name, name)))
+        return cls
+    return decorator
 
+
+class Device(object):
+    def __init__(self):
+        self.family = None
+        self.prompt = "RP/0/RSP0/CPU0:R1#"
+        self.reads = 0
+
+    @property
+    def os_version(self):
+        self.reads += 1
+        return "6.1.3"
+
+    def send(self, cmd, timeout=60):
+        return cmd, timeout
+
+
+@delegate("_device", ("send",), ("family", "prompt", "os_version"), cached_names=("family", "os_version"))
+class Context(object):
+    def __init__(self):
+        self._device = Device()
+
+
+@partial_delegate("_device", ("send",), ("family", "prompt", "os_version"))
+class PartialContext(object):
+    def __init__(self):
+        self._device = Device()
+
+
+@delegate("__device", ("send",), ("prompt",))
+class PrivateContext(object):
+    def __init__(self):
+        self.__device = Device()
+
+
+class TestDelegate(TestCase):
+    def test_accessors(self):
+        ctx = Context()
+        self.assertEqual(ctx.send("show version", timeout=10), ("show version", 10))
+        self.assertEqual(ctx.prompt, "RP/0/RSP0/CPU0:R1#")
+        ctx.prompt = "R1#"
+        self.assertEqual(ctx._device.prompt, "R1#")
+        self.assertEqual(PrivateContext().send("show version"), ("show version", 60))
+        self.assertEqual(PrivateContext().prompt, "RP/0/RSP0/CPU0:R1#")
+
+    def test_cache(self):
+        ctx = Context()
+        for _ in range(10):
+            self.assertEqual(ctx.os_version, "6.1.3")
+        self.assertEqual(ctx._device.reads, 1)
+
+        # not discovered yet
+        self.assertIsNone(ctx.family)
+        ctx._device.family = "ASR9K"
+        self.assertEqual(ctx.family, "ASR9K")
+        ctx._device.family = "NCS5500"
+        self.assertEqual(ctx.family, "ASR9K")
+        ctx.family = "NCS6K"
+        self.assertEqual(ctx.family, "NCS6K")
+
+        clear_delegate_cache(ctx)
+        self.assertEqual(ctx.os_version, "6.1.3")
+        self.assertEqual(ctx._device.reads, 2)
+
+    def test_benchmark(self):
+        number = 100000
+        timings = {}
+        for name, cls in (("partial", PartialContext), ("generated", Context)):
+            ctx = cls()
+            ctx.family = "ASR9K"
+            timings[name] = min(timeit.repeat(lambda: (ctx.family, ctx.prompt, ctx.send("show")),
+                                              repeat=3, number=number))
+        self.assertLess(timings['generated'], timings['partial'])
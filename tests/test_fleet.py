@@ -0,0 +1,250 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+import condoor
+import pkg_resources
+from stevedore import ExtensionManager
+
+from csmpe import fleet
+from csmpe.fleet import load_inventory, run_fleet, run_host, execute, host_log_directory, InventoryError
+from csmpe.plugins import CSMPlugin
+
+# The fake device response time
+CONNECT_TIME = 0.2
+COMMAND_TIME = 0.05
+COMMANDS = ["show version", "show install active summary", "show platform", "show redundancy"]
+
+
+def fake_device_runner(job):
+    """Simulate the plugin execution on the device responding with the fixed latency."""
+    host = job['host']
+    log_dir = host_log_directory(job['log_dir'], host['hostname'])
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    start = time.time()
+    time.sleep(CONNECT_TIME)
+    with open(os.path.join(log_dir, "session.log"), "w") as f:
+        for cmd in COMMANDS:
+            time.sleep(COMMAND_TIME)
+            f.write("{}#{}\n".format(host['hostname'], cmd))
+    return {
+        'hostname': host['hostname'],
+        'site': host.get('site'),
+        'log_directory': log_dir,
+        'success': host['hostname'] != "failed",
+        'phases': [],
+        'error': None,
+        'start': start,
+        'duration': time.time() - start,
+    }
+
+
+def exiting_runner(job):
+    """Simulate the worker process killed while processing the host."""
+    os._exit(1)
+
+
+def hanging_runner(job):
+    time.sleep(60)
+
+
+class StubPlugin(CSMPlugin):
+    """This plugin is dispatched by the fleet end to end test."""
+    name = "Fleet Test Plugin"
+    platforms = set()
+    phases = {'Pre-Upgrade'}
+    os = set()
+
+    def run(self):
+        self.ctx.save_job_data("fleet_test", self.ctx.send("show version"))
+        return self.ctx.family
+
+
+class FakeConnection(object):
+    """The condoor connection to the ASR9K device."""
+    instances = []
+
+    def __init__(self, hostname, urls, log_dir=None):
+        self.hostname = hostname
+        self.urls = urls
+        self.family = "ASR9K"
+        self.platform = "ASR-9010"
+        self.os_type = "XR"
+        self.os_version = "6.1.3"
+        self.prompt = "RP/0/RSP0/CPU0:{}#".format(hostname)
+        self.is_console = False
+        self.device_info = {'family': self.family, 'os_type': self.os_type}
+        self.udi = {}
+        self.sent = []
+        self.disconnected = False
+        FakeConnection.instances.append(self)
+
+    def connect(self, force_discovery=False, logfile=None):
+        pass
+
+    def send(self, cmd="", timeout=300, wait_for_string=None, password=False):
+        self.sent.append(cmd)
+        return "\nCisco IOS XR Software, Version {}\n".format(self.os_version)
+
+    def disconnect(self):
+        self.disconnected = True
+
+    def finalize(self):
+        pass
+
+
+class TestFleet(TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir)
+
+    def write_inventory(self, data):
+        filename = os.path.join(self.log_dir, "inventory.json")
+        with open(filename, "w") as f:
+            json.dump(data, f)
+        return filename
+
+    def test_load_inventory(self):
+        filename = self.write_inventory({
+            'defaults': {'repository_url': "tftp://server/dir"},
+            'hosts': [
+                {'hostname': "R1", 'urls': "telnet://user:pass@r1", 'packages': ["pkg1"]},
+                {'hostname': "R2", 'urls': ["ssh://jump", "telnet://user:pass@r2"], 'repository_url': "sftp://x"},
+            ]
+        })
+        hosts = load_inventory(filename)
+        self.assertEqual([host['hostname'] for host in hosts], ["R1", "R2"])
+        self.assertEqual(hosts[0]['urls'], ["telnet://user:pass@r1"])
+        self.assertEqual(hosts[0]['repository_url'], "tftp://server/dir")
+        self.assertEqual(hosts[1]['repository_url'], "sftp://x")
+
+        with self.assertRaises(InventoryError):
+            load_inventory(self.write_inventory([{'hostname': "R1"}]))
+        with self.assertRaises(InventoryError):
+            load_inventory(self.write_inventory([{'hostname': "R1", 'urls': "a"}, {'hostname': "R1", 'urls': "b"}]))
+
+    def test_results_file(self):
+        hosts = [{'hostname': name, 'urls': ["telnet://" + name]} for name in ("R1", "failed", "R3")]
+        results = run_fleet(hosts, "Pre-Upgrade", self.log_dir, concurrency=2, runner=fake_device_runner)
+        with open(os.path.join(self.log_dir, "fleet_results.json")) as f:
+            data = json.load(f)
+        self.assertEqual([host['hostname'] for host in data['hosts']], ["R1", "failed", "R3"])
+        self.assertEqual(data['summary']['failed'], 1)
+        self.assertEqual(results['summary']['succeeded'], 2)
+        for name in ("R1", "failed", "R3"):
+            self.assertTrue(os.path.exists(os.path.join(self.log_dir, name, "session.log")))
+
+    def test_throughput_benchmark(self):
+        hosts = [{'hostname': "host-{}".format(i), 'urls': ["telnet://host"]} for i in range(16)]
+        throughput = {}
+        for concurrency in (1, 8):
+            results = run_fleet(hosts, "Pre-Upgrade", self.log_dir, concurrency=concurrency,
+                                runner=fake_device_runner)
+            throughput[concurrency] = results['summary']['hosts_per_minute']
+        # the fake device latency dominates so the throughput scales with the concurrency
+        self.assertGreater(throughput[8], throughput[1] * 3)
+
+    def test_lost_worker(self):
+        lost_grace = fleet._LOST_GRACE
+        fleet._LOST_GRACE = 0.5
+        try:
+            jobs = [{'host': {'hostname': name, 'urls': ["telnet://" + name]}} for name in ("R1", "R2")]
+            results = [result for _, result in execute(jobs, exiting_runner, concurrency=2)]
+        finally:
+            fleet._LOST_GRACE = lost_grace
+        self.assertEqual(sorted(result['hostname'] for result in results), ["R1", "R2"])
+        self.assertEqual([result['error'] for result in results], ["Worker process lost"] * 2)
+
+    def test_timeout(self):
+        begin = time.time()
+        jobs = [{'host': {'hostname': "R1", 'urls': ["telnet://r1"]}}]
+        results = [result for _, result in execute(jobs, hanging_runner, timeout=0.5)]
+        self.assertFalse(results[0]['success'])
+        self.assertEqual(results[0]['error'], "Timeout after 0.5 seconds")
+        self.assertLess(time.time() - begin, 30)
+
+
+class TestRunHost(TestCase):
+    """Run the plugin on the host through the plugin manager with the fake condoor connection."""
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.cache_dir = os.environ.get("CSMPE_CACHE_DIR")
+        os.environ["CSMPE_CACHE_DIR"] = os.path.join(self.log_dir, "cache")
+
+        self.dist = pkg_resources.Distribution(location=self.log_dir, project_name="csmpe-fleet-test", version="1.0")
+        entry_point = pkg_resources.EntryPoint.parse("fleet-test = {}:StubPlugin".format(__name__), dist=self.dist)
+        self.dist._ep_map = {"csm.plugin": {"fleet-test": entry_point}}
+        pkg_resources.working_set.add(self.dist)
+        # stevedore caches the entry points of the namespace
+        ExtensionManager.ENTRY_POINT_CACHE.pop("csm.plugin", None)
+
+        self.connection = condoor.Connection
+        condoor.Connection = FakeConnection
+        FakeConnection.instances = []
+
+    def tearDown(self):
+        condoor.Connection = self.connection
+        working_set = pkg_resources.working_set
+        del working_set.by_key[self.dist.key]
+        working_set.entry_keys[self.dist.location].remove(self.dist.key)
+        working_set.entries.remove(self.dist.location)
+        ExtensionManager.ENTRY_POINT_CACHE.pop("csm.plugin", None)
+        if self.cache_dir is None:
+            del os.environ["CSMPE_CACHE_DIR"]
+        else:
+            os.environ["CSMPE_CACHE_DIR"] = self.cache_dir
+        shutil.rmtree(self.log_dir)
+
+    def test_run_host(self):
+        job = {
+            'host': {'hostname': "R1", 'urls': ["telnet://user:pass@r1"]},
+            'phases': ["Pre-Upgrade"],
+            'plugin_name': "Fleet Test Plugin",
+            'log_dir': self.log_dir,
+        }
+        result = run_host(job)
+        self.assertTrue(result['success'], result['error'])
+        self.assertEqual(result['phases'][0]['results'], ["ASR9K"])
+        self.assertEqual(result['log_directory'], os.path.join(self.log_dir, "R1"))
+        self.assertTrue(os.path.exists(os.path.join(self.log_dir, "R1", "plugins.log")))
+
+        connection, = FakeConnection.instances
+        self.assertEqual(connection.urls, ["telnet://user:pass@r1"])
+        self.assertEqual(connection.sent, ["show version"])
+        self.assertTrue(connection.disconnected)
+
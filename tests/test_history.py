@@ -0,0 +1,82 @@
+# =============================================================================
+# Duration history tests
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from csmpe.history import DurationHistory, percentile
+
+
+class TestDurationHistory(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.history = DurationHistory(os.path.join(self.directory, "history.db"), samples=5)
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.directory)
+
+    def test_percentile(self):
+        self.assertEqual(percentile([3, 1, 2], 0.5), 2)
+        self.assertEqual(percentile([3, 1, 2, 4], 1.0), 4)
+
+    def test_record(self):
+        for duration in range(10):
+            self.assertTrue(self.history.record("ASR9K", "ASR-9010", "Activate reload", duration, packages=2))
+        self.assertEqual(self.history.durations("ASR9K", "ASR-9010", "Activate reload", 2), [5, 6, 7, 8, 9])
+        self.assertEqual(self.history.durations("ASR9K", "ASR-9006", "Activate reload", 2), [])
+
+        # the durations are persisted
+        history = DurationHistory(self.history.filename)
+        self.assertEqual(history.durations("ASR9K", "ASR-9010", "Activate reload", 2), [5, 6, 7, 8, 9])
+        history.close()
+
+    def test_closest_packages(self):
+        self.history.record("ASR9K", "ASR-9010", "Activate install", 100, packages=1)
+        self.history.record("ASR9K", "ASR-9010", "Activate install", 400, packages=10)
+        self.assertEqual(self.history.durations("ASR9K", "ASR-9010", "Activate install", 3), [100])
+        self.assertEqual(self.history.durations("ASR9K", "ASR-9010", "Activate install", 8), [400])
+
+    def test_operation(self):
+        operation = self.history.operation("ASR9K", "ASR-9010", "Activate reload", 2)
+        self.assertIsNone(operation.estimate)
+        self.assertEqual(operation.timeout(3600), 3600)
+        self.assertEqual(operation.interval(5, 5, 60), 5)
+        self.assertEqual(operation.eta(), "")
+
+        for duration in (600, 700, 1000):
+            operation.record(duration)
+        operation = self.history.operation("ASR9K", "ASR-9010", "Activate reload", 2)
+        self.assertEqual(operation.estimate, 700)
+        self.assertEqual(operation.timeout(600), 1500)
+        self.assertEqual(operation.timeout(3600), 3600)
+        self.assertEqual(operation.interval(5, 5, 60, fraction=0.05), 35)
+        self.assertEqual(operation.eta(100), " (ETA 10 minute(s) 0 second(s))")
@@ -0,0 +1,119 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import pkg_resources
+
+from csmpe.manifest import PluginManifest, MANIFEST_FILENAME, extract_plugin_metadata
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+ENTRIES = {
+    "8d5e2c0a-plugin": {
+        "package_name": "csmpe",
+        "module": "csmpe.core_plugins.csm_config_capture.plugin",
+        "attr": "Plugin",
+        "name": "Config Capture Plugin",
+        "description": "This plugin captures device configuration and stores in the log directory.",
+        "phases": {"Pre-Upgrade", "Post-Upgrade"},
+        "platforms": {"ASR9K", "CRS"},
+        "os": set(),
+    }
+}
+
+
+class TestPluginManifest(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_save_load(self):
+        manifest = PluginManifest(cache_dir=self.cache_dir)
+        self.assertIsNone(manifest.load())
+        self.assertTrue(manifest.save(ENTRIES))
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, MANIFEST_FILENAME)))
+
+        entries = PluginManifest(cache_dir=self.cache_dir).load()
+        self.assertEqual(entries, ENTRIES)
+
+    def test_fingerprint_invalidation(self):
+        manifest = PluginManifest(cache_dir=self.cache_dir)
+        manifest.save(ENTRIES)
+
+        manifest = PluginManifest(cache_dir=self.cache_dir)
+        manifest._fingerprint = "changed distributions"
+        self.assertIsNone(manifest.load())
+
+    def test_entries_builder(self):
+        calls = []
+
+        def builder():
+            calls.append(1)
+            return ENTRIES
+
+        self.assertEqual(PluginManifest(cache_dir=self.cache_dir).entries(builder), ENTRIES)
+        self.assertEqual(PluginManifest(cache_dir=self.cache_dir).entries(builder), ENTRIES)
+        self.assertEqual(len(calls), 1)
+
+        manifest = PluginManifest(cache_dir=self.cache_dir)
+        manifest.invalidate()
+        manifest.entries(builder)
+        self.assertEqual(len(calls), 2)
+
+
+class TestExtractPluginMetadata(TestCase):
+    def entry_point(self, target):
+        dist = pkg_resources.Distribution(location=REPO_DIR, project_name="csmpe")
+        return pkg_resources.EntryPoint.parse("8d5e2c0a-plugin = {}".format(target), dist=dist)
+
+    def test_extract(self):
+        from csmpe.core_plugins.csm_install_operations.ios_xr.commit import Plugin
+
+        metadata = extract_plugin_metadata(self.entry_point(
+            "csmpe.core_plugins.csm_install_operations.ios_xr.commit:Plugin"))
+        self.assertEqual(metadata['name'], Plugin.name)
+        self.assertEqual(metadata['phases'], Plugin.phases)
+        self.assertEqual(metadata['platforms'], Plugin.platforms)
+        self.assertEqual(metadata['os'], Plugin.os)
+        self.assertEqual(metadata['description'], Plugin.__doc__)
+        self.assertEqual(metadata['module'], "csmpe.core_plugins.csm_install_operations.ios_xr.commit")
+
+    def test_inherited_defaults(self):
+        metadata = extract_plugin_metadata(self.entry_point("csmpe.core_plugins.csm_config_capture.plugin:Plugin"))
+        self.assertEqual(metadata['os'], set())
+
+    def test_not_extractable(self):
+        self.assertIsNone(extract_plugin_metadata(self.entry_point("csmpe.core_plugins.missing:Plugin")))
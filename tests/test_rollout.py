@@ -0,0 +1,100 @@
+# =============================================================================
+#
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from csmpe.rollout import order_hosts, plan_waves, run_rollout
+
+
+def fake_runner(job):
+    start = time.time()
+    time.sleep(0.1)
+    return {
+        'hostname': job['host']['hostname'],
+        'site': job['host'].get('site'),
+        'success': not job['host']['hostname'].startswith("bad"),
+        'error': None,
+        'start': start,
+        'duration': time.time() - start,
+    }
+
+
+def make_hosts(count, sites=("A", "B")):
+    return [{'hostname': "R{}".format(i), 'urls': ["telnet://r"], 'site': sites[i % len(sites)]}
+            for i in range(count)]
+
+
+class TestRollout(TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir)
+
+    def test_order_hosts(self):
+        hosts = [{'hostname': name, 'site': site} for name, site in
+                 [("a1", "A"), ("a2", "A"), ("a3", "A"), ("b1", "B"), ("c1", "C"), ("b2", "B")]]
+        self.assertEqual([host['hostname'] for host in order_hosts(hosts)], ["a1", "b1", "c1", "a2", "b2", "a3"])
+
+    def test_plan_waves(self):
+        waves = plan_waves(range(20), canary=1, growth=2)
+        self.assertEqual([len(wave) for wave in waves], [1, 2, 4, 8, 5])
+        waves = plan_waves(range(20), canary=2, growth=3, max_wave=5)
+        self.assertEqual([len(wave) for wave in waves], [2, 5, 5, 5, 3])
+        self.assertEqual(sum(waves, []), list(range(20)))
+
+    def test_rollout(self):
+        hosts = make_hosts(10)
+        results = run_rollout(hosts, ["Add", "Activate"], self.log_dir, canary=2, concurrency=4, runner=fake_runner)
+        self.assertFalse(results['stopped'])
+        self.assertEqual([len(wave['hosts']) for wave in results['waves']], [2, 4, 4])
+        self.assertEqual(results['summary']['succeeded'], 10)
+
+    def test_canary_failure_stops_rollout(self):
+        hosts = [{'hostname': "bad", 'urls': ["telnet://r"], 'site': "A"}] + make_hosts(5)
+        results = run_rollout(hosts, ["Add"], self.log_dir, canary=1, runner=fake_runner)
+        self.assertTrue(results['stopped'])
+        self.assertEqual(len(results['waves']), 1)
+        self.assertEqual(results['summary']['failed'], 1)
+        self.assertEqual(results['summary']['skipped'], 5)
+        self.assertTrue(all(result.get('skipped') for result in results['hosts'][1:]))
+
+    def test_group_limit(self):
+        hosts = make_hosts(8)
+        results = run_rollout(hosts, ["Add"], self.log_dir, canary=8, concurrency=8, group_limit=2,
+                              runner=fake_runner)
+        for site in ("A", "B"):
+            intervals = [(result['start'], result['start'] + result['duration'])
+                         for result in results['hosts'] if result['site'] == site]
+            for start, _ in intervals:
+                running = len([1 for begin, end in intervals if begin <= start < end])
+                self.assertLessEqual(running, 2)
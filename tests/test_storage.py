@@ -0,0 +1,115 @@
+# =============================================================================
+# Storage tests
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from csmpe.context import InstallContext
+from csmpe.storage import MemoryStorage, SQLiteStorage, open_storage
+
+
+class TestMemoryStorage(TestCase):
+    def test_namespaces(self):
+        storage = MemoryStorage()
+        storage.set("R1", "isis_neighbors", ["neighbor", 1.0])
+        storage.set("R2", "isis_neighbors", ["other", 2.0])
+        self.assertEqual(storage.get("R1", "isis_neighbors"), ["neighbor", 1.0])
+        self.assertEqual(storage.get("R2", "isis_neighbors"), ["other", 2.0])
+        self.assertIsNone(storage.get("R3", "isis_neighbors"))
+        storage.delete("R1", "isis_neighbors")
+        self.assertEqual(storage.keys("R1"), [])
+        self.assertEqual(storage.keys("R2"), ["isis_neighbors"])
+
+    def test_install_contexts(self):
+        r1 = InstallContext()
+        r1.hostname = "R1"
+        r2 = InstallContext()
+        r2.hostname = "R2"
+        r1.save_data("node_status", ["up", 1.0])
+        r1.save_job_data("package_change_list", [["pkg"], 1.0])
+        self.assertEqual(r1.load_data("node_status"), ["up", 1.0])
+        self.assertIsNone(r2.load_data("node_status"))
+        self.assertIsNone(r2.load_job_data("package_change_list"))
+
+
+class TestSQLiteStorage(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "storage", "csmpe.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_persistence(self):
+        ctx = InstallContext(open_storage(self.filename))
+        ctx.hostname = "R1"
+        ctx.save_data("isis_neighbors", [{'Gi0/0/0/0': "Up"}, 1.0])
+        ctx.save_job_data("package_change_list", [["pkg"], 1.0])
+        ctx.storage.close()
+
+        # the next run, i.e. Post-Upgrade
+        ctx = InstallContext(open_storage(self.filename))
+        ctx.hostname = "R1"
+        self.assertEqual(ctx.load_data("isis_neighbors"), [{'Gi0/0/0/0': "Up"}, 1.0])
+        self.assertIsNone(ctx.load_job_data("package_change_list"))
+        ctx.hostname = "R2"
+        self.assertIsNone(ctx.load_data("isis_neighbors"))
+        ctx.storage.close()
+
+    def test_lru_cache(self):
+        storage = SQLiteStorage(self.filename, cache_size=2)
+        for key in ("a", "b", "c"):
+            storage.set("R1", key, key.upper())
+        self.assertEqual(list(storage._cache), [("R1", "b"), ("R1", "c")])
+        self.assertEqual(storage.get("R1", "a"), "A")
+        self.assertEqual(list(storage._cache), [("R1", "c"), ("R1", "a")])
+        storage.delete("R1", "a")
+        self.assertIsNone(storage.get("R1", "a"))
+        self.assertEqual(storage.keys("R1"), ["b", "c"])
+        storage.close()
+
+    def test_threads(self):
+        storage = SQLiteStorage(self.filename, cache_size=10)
+
+        def worker(namespace):
+            for index in range(50):
+                storage.set(namespace, str(index), index)
+
+        threads = [threading.Thread(target=worker, args=("R{}".format(number),)) for number in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for number in range(4):
+            self.assertEqual(len(storage.keys("R{}".format(number))), 50)
+            self.assertEqual(storage.get("R{}".format(number), "49"), 49)
+        storage.close()
@@ -0,0 +1,152 @@
+# =============================================================================
+# Install watcher tests
+# Copyright (c) 2016, Cisco Systems
+# All rights reserved.
+#
+# # Author: Klaudiusz Staniek
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+# =============================================================================
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from condoor import CommandTimeoutError, ConnectionError
+
+from csmpe.core_plugins.csm_install_operations.watch import InstallWatcher
+from csmpe.history import DurationHistory
+from csmpe.timing import Tracer
+
+
+class FakeContext(object):
+    CommandTimeoutError = CommandTimeoutError
+
+    def __init__(self, events):
+        """
+        :param events: The list of the syslog flags (True if the message arrives while listening)
+            or the exceptions, and the status command outputs.
+        """
+        self.events = list(events)
+        self.commands = []
+        self.listened = []
+        self.status = []
+        self.reconnects = []
+        self._tracer = Tracer()
+
+    def send(self, cmd="", timeout=300, wait_for_string=None, password=False, cache=True):
+        event = self.events.pop(0)
+        if isinstance(event, Exception):
+            raise event
+        if wait_for_string is not None:
+            self.listened.append(timeout)
+            if not event:
+                raise CommandTimeoutError("Timeout waiting for prompt", "host")
+            return ""
+        self.commands.append(cmd)
+        return event
+
+    def trace(self, name, category="plugin", **args):
+        return self._tracer.span(name, category, **args)
+
+    def post_status(self, message):
+        self.status.append(message)
+
+    def info(self, message):
+        pass
+
+    def sleep(self, seconds):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def reconnect(self, **kwargs):
+        self.reconnects.append(kwargs)
+
+
+def watcher(ctx, **kwargs):
+    return InstallWatcher(ctx, 3, "show install request", idle=r"No install operation in progress",
+                          progress=[r"The install \w*?\s?operation 3 is (\d+)% complete"], **kwargs)
+
+
+class TestInstallWatcher(TestCase):
+    def test_syslog(self):
+        ctx = FakeContext([True])
+        completed = []
+        watcher(ctx, on_complete=completed.append).watch()
+        self.assertEqual(ctx.commands, [])
+        self.assertEqual(completed, ['syslog'])
+        self.assertEqual(ctx._tracer.events[-1]['args']['polls'], 0)
+
+    def test_idle(self):
+        ctx = FakeContext([False, "The install add operation 3 is 10% complete",
+                           False, "The install add operation 3 is 10% complete",
+                           False, "No install operation in progress"])
+        progress = []
+        output = watcher(ctx, on_progress=lambda percent, message: progress.append(percent)).watch()
+        self.assertEqual(output, "No install operation in progress")
+        self.assertEqual(ctx.commands, ["show install request"] * 3)
+        self.assertEqual(progress, [10])
+        # the unchanged progress doubles the interval
+        self.assertEqual(ctx.listened, [10, 20, 40])
+
+    def test_next_interval(self):
+        w = watcher(FakeContext([]), max_interval=600)
+        self.assertEqual(w.next_interval(10, None, 10), 20)
+        w.percent = 10
+        # 20% done in 100 seconds, the remaining 80% is estimated to take 400 seconds
+        self.assertEqual(w.next_interval(10, 20, 100), 200)
+        self.assertEqual(w.next_interval(10, 99, 100), 10)
+        self.assertEqual(w.next_interval(500, 10, 100), 600)
+
+    def test_progress_message(self):
+        ctx = FakeContext([False, "The install add operation 3 is 40% complete", True])
+        watcher(ctx).watch()
+        self.assertEqual(len(ctx.status), 1)
+        self.assertTrue(ctx.status[0].endswith("The install add operation 3 is 40% complete"))
+
+    def test_reconnect(self):
+        ctx = FakeContext([ConnectionError("Unexpected device disconnect", "host"), True])
+        watcher(ctx, reconnect=dict(force_discovery=True)).watch()
+        self.assertEqual(ctx.reconnects, [dict(force_discovery=True)])
+
+        ctx = FakeContext([ConnectionError("Unexpected device disconnect", "host")] * 2)
+        with self.assertRaises(ConnectionError):
+            watcher(ctx, retries=1).watch()
+
+    def test_history(self):
+        directory = tempfile.mkdtemp()
+        history = DurationHistory(os.path.join(directory, "history.db"))
+        try:
+            history.record("ASR9K", "ASR-9010", "Activate install", 400)
+            ctx = FakeContext([False, "The install add operation 3 is 40% complete", True])
+            ctx.operation = lambda name: history.operation("ASR9K", "ASR-9010", name)
+            watcher(ctx, operation="Activate install").watch()
+            # the first poll after the quarter of the estimated duration
+            self.assertEqual(ctx.listened[0], 100)
+            self.assertIn("(ETA 6 minute(s)", ctx.status[0])
+            self.assertEqual(len(history.durations("ASR9K", "ASR-9010", "Activate install")), 2)
+        finally:
+            history.close()
+            shutil.rmtree(directory)